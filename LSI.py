@@ -1,10 +1,13 @@
 import os
+import math
 import numpy as np
 import sqlite3
 import pickle
 from scipy.sparse import csr_matrix, load_npz, save_npz
 from scipy.linalg import svd
 from sklearn.cluster import KMeans
+from postings import SegmentedIndex, index_exists
+from inverted_index import INDEX_DIR
 
 # File paths
 DB_PATH = "parliament.db"
@@ -12,6 +15,10 @@ TFIDF_FILE = "tfidf_matrix.npz" # Αραιός πίνακας [ομιλίες ×
 DOC_IDS_FILE = "doc_ids.npy" # Λίστα με doc_id για κάθε γραμμή του πίνακα
 LSI_OUTPUT_FILE = "lsi_projected_docs.npz" # Νέος πίνακας [ομιλίες × 100 διαστάσεις] μετά το SVD
 CLUSTERS_FILE = "final_clustering_results.pkl" # Λεξικό {cluster_id: [doc_ids]} μετά το KMeans
+LSI_TERMS_FILE = "lsi_terms.txt" # Μία λέξη ανά γραμμή: στήλη του TF-IDF πίνακα -> keyword
+LSI_TERM_TOPICS_FILE = "lsi_term_topics.npy" # float32 [λέξεις × K] (V_k), για folding-in ερωτημάτων
+LSI_DOCS_FILE = "lsi_docs.npy" # float32 [ομιλίες × K], μοναδιαίες γραμμές, memory-mapped από το semantic search
+LSI_TERM_IDF_FILE = "lsi_term_idf.npy" # float64 [λέξεις], idf = log(1 + N / df) κάθε στήλης, για το βάρος των ερωτημάτων
 
 
 # Parameters
@@ -19,6 +26,21 @@ K = 100           # Number of LSI dimensions
 CLUSTERS = 100    # Number of clusters
 
 
+def keyword_idf(keywords: list, num_docs_total: int) -> np.ndarray:
+    """
+        IDF of every keyword as used by the speech_keywords scores (part2 / tf_idf):
+        log(1 + N / df), with df from the inverted index (memory-mapped, or the legacy pickle).
+    """
+    if index_exists(INDEX_DIR):
+        index = SegmentedIndex(INDEX_DIR)
+        dfs = [index.doc_freq(kw) for kw in keywords]
+    else:
+        with open("inverse_index.pkl", "rb") as f:
+            inverse_index = pickle.load(f)
+        dfs = [len(inverse_index.get(kw, ())) for kw in keywords]
+    return np.asarray([math.log(1 + num_docs_total / df) if df else 0.0 for df in dfs], dtype=np.float64)
+
+
 def build_tfidf_matrix():
     """Builds a sparse TF-IDF matrix from the speech_keywords table in SQLite."""
     print("Building TF-IDF matrix...")
@@ -38,6 +60,14 @@ def build_tfidf_matrix():
 
     print(f"Keywords: {len(all_keywords)} | Documents: {len(all_doc_ids)}")
 
+    # Same N as part2's TF-IDF scores, for the query weights of semantic search
+    cursor.execute("""
+        SELECT COUNT(*) FROM speeches s
+        JOIN members m ON s.member_id = m.id
+        JOIN parties p ON s.party_id = p.id
+    """)
+    num_docs_total = cursor.fetchone()[0]
+
     # Prepare data for sparse matrix
     data, rows, cols = [], [], []
     cursor.execute("SELECT speech_id, keyword, score FROM speech_keywords")
@@ -57,12 +87,24 @@ def build_tfidf_matrix():
                         dtype=np.float32)
     save_npz(TFIDF_FILE, matrix)
     np.save(DOC_IDS_FILE, np.array(all_doc_ids))
+    with open(LSI_TERMS_FILE, "w", encoding="utf-8") as f:
+        f.write("".join(kw + "\n" for kw in all_keywords))
+    np.save(LSI_TERM_IDF_FILE, keyword_idf(all_keywords, num_docs_total))
     print(f"Saved TF-IDF matrix → '{TFIDF_FILE}' and doc IDs → '{DOC_IDS_FILE}'")
 
 
 def perform_lsi():
-    """Performs LSI by applying SVD on the TF-IDF matrix."""
-    if not os.path.exists(TFIDF_FILE):
+    """
+        Performs LSI by applying SVD on the TF-IDF matrix.
+
+        Besides the projected documents (LSI_OUTPUT_FILE, used by clustering) it stores
+        what semantic search needs:
+          - LSI_TERM_TOPICS_FILE: V_k, so a query vector q folds in as q @ V_k
+          - LSI_DOCS_FILE: the projected documents U_k * S_k as float32 with unit-length
+            rows, so cosine similarity is one matrix product over a memmap
+        (LSI_TERM_IDF_FILE, the idf of every column, is written with the TF-IDF matrix.)
+    """
+    if not os.path.exists(TFIDF_FILE) or not os.path.exists(LSI_TERMS_FILE) or not os.path.exists(LSI_TERM_IDF_FILE):
         build_tfidf_matrix()
 
     print("Loading TF-IDF matrix for LSI...")
@@ -79,6 +121,11 @@ def perform_lsi():
     np.savez_compressed(LSI_OUTPUT_FILE, data=projected_docs)
     print(f"Saved LSI-projected documents to '{LSI_OUTPUT_FILE}'")
 
+    norms = np.linalg.norm(projected_docs, axis=1, keepdims=True)
+    np.save(LSI_DOCS_FILE, (projected_docs / np.where(norms > 0, norms, 1)).astype(np.float32))
+    np.save(LSI_TERM_TOPICS_FILE, Vt[:K].T.astype(np.float32))
+    print(f"Saved LSI search files '{LSI_DOCS_FILE}' and '{LSI_TERM_TOPICS_FILE}'")
+
 
 def clustering_lsi_docs():
     """Performs clustering on LSI-projected documents and saves clusters."""
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from sklearn.cluster import KMeans
+from LSI import LSI_DOCS_FILE
+
+ANN_DIR = "ann_index"  # IVF-PQ index over the rows of LSI_DOCS_FILE
+
+# Build parameters
+N_LISTS = 1024         # coarse (IVF) clusters; capped at N / 39 for small collections
+PQ_M = 20              # sub-quantizers: each codes ceil(K / PQ_M) dimensions of the residual
+PQ_BITS = 8            # 2^PQ_BITS centroids per sub-quantizer (one uint8 code each)
+TRAIN_SAMPLE = 100000  # rows used to train the coarse and PQ codebooks
+BUILD_CHUNK = 65536    # rows assigned / encoded at a time
+
+# Search defaults (recall / latency knobs, see IVFPQIndex.search)
+N_PROBE = 16           # IVF lists scanned per query
+RERANK = 200           # best PQ candidates re-scored with the exact float32 vectors
+
+# Files inside ANN_DIR
+META_FILE = "meta.json"
+CENTROIDS_FILE = "centroids.npy"    # float32 [n_lists, K]
+CODEBOOKS_FILE = "codebooks.npy"    # float32 [PQ_M, 2^PQ_BITS, ceil(K / PQ_M)]
+CODES_FILE = "codes.npy"            # uint8 [N, PQ_M], grouped by list
+ROWS_FILE = "rows.npy"              # int32 [N], LSI row of every code
+LIST_OFFSETS_FILE = "list_offsets.npy"  # int64 [n_lists + 1], list i = codes[offsets[i]:offsets[i + 1]]
+
+
+def ann_index_exists(path: str = ANN_DIR) -> bool:
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def ann_index_is_stale(path: str = ANN_DIR) -> bool:
+    """True if the index is missing or older than the LSI vectors it was built from."""
+    if not ann_index_exists(path) or not os.path.exists(LSI_DOCS_FILE):
+        return True
+    return os.path.getmtime(os.path.join(path, META_FILE)) < os.path.getmtime(LSI_DOCS_FILE)
+
+
+def _kmeans(data: np.ndarray, n_clusters: int) -> np.ndarray:
+    model = KMeans(n_clusters=n_clusters, random_state=42, n_init=1, max_iter=25)
+    model.fit(data)
+    return model.cluster_centers_.astype(np.float32)
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (L2) of every row."""
+    distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * data @ centroids.T
+    return np.argmin(distances, axis=1)
+
+
+def _pad(vectors: np.ndarray, width: int) -> np.ndarray:
+    """Zero-pad the last axis to `width` columns (PQ sub-vectors when PQ_M does not divide K)."""
+    missing = width - vectors.shape[-1]
+    if not missing:
+        return vectors
+    return np.pad(vectors, [(0, 0)] * (vectors.ndim - 1) + [(0, missing)])
+
+
+def build_ann_index(path: str = ANN_DIR, n_lists: int = N_LISTS, pq_m: int = PQ_M):
+    """
+        Build the IVF-PQ index over the unit-length LSI rows (LSI.perform_lsi).
+
+        Steps:
+            1) k-means on a sample -> n_lists coarse centroids (IVF lists).
+            2) Every row goes to the list of its nearest centroid; its residual
+               (row - centroid) is split into pq_m sub-vectors of ceil(K / pq_m)
+               dimensions; if pq_m does not divide K, the residual is zero-padded
+               (padding adds 0 to every inner product).
+            3) One k-means codebook per sub-vector position (trained on sample
+               residuals); a row is stored as pq_m uint8 codes.
+
+        Rows are assigned and encoded BUILD_CHUNK at a time from the memory-mapped
+        LSI matrix. Everything is written to `path`.partial and moved into place.
+    """
+    docs = np.load(LSI_DOCS_FILE, mmap_mode="r")
+    n_rows, dim = docs.shape
+    pq_m = max(1, min(pq_m, dim))
+    sub = -(-dim // pq_m)
+    start_time = time.perf_counter()
+
+    rng = np.random.default_rng(42)
+    sample_rows = np.sort(rng.choice(n_rows, size=min(TRAIN_SAMPLE, n_rows), replace=False))
+    sample = np.asarray(docs[sample_rows], dtype=np.float32)
+    n_lists = max(1, min(n_lists, n_rows // 39))
+    n_codes = min(1 << PQ_BITS, len(sample))
+
+    print(f"Training IVF-PQ ({n_lists} lists, {pq_m} x {n_codes} codes) on {len(sample)} rows...")
+    centroids = _kmeans(sample, n_lists)
+    residuals = _pad(sample - centroids[_nearest(sample, centroids)], pq_m * sub)
+    codebooks = np.stack([_kmeans(residuals[:, m * sub:(m + 1) * sub], n_codes) for m in range(pq_m)])
+
+    lists = np.zeros(n_rows, dtype=np.int32)
+    codes = np.zeros((n_rows, pq_m), dtype=np.uint8)
+    for lo in range(0, n_rows, BUILD_CHUNK):
+        block = np.asarray(docs[lo:lo + BUILD_CHUNK], dtype=np.float32)
+        assigned = _nearest(block, centroids)
+        residual = _pad(block - centroids[assigned], pq_m * sub)
+        lists[lo:lo + len(block)] = assigned
+        for m in range(pq_m):
+            codes[lo:lo + len(block), m] = _nearest(residual[:, m * sub:(m + 1) * sub], codebooks[m])
+
+    order = np.argsort(lists, kind="stable")
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=n_lists)))).astype(np.int64)
+
+    partial = path + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    np.save(os.path.join(partial, CENTROIDS_FILE), centroids)
+    np.save(os.path.join(partial, CODEBOOKS_FILE), codebooks.astype(np.float32))
+    np.save(os.path.join(partial, CODES_FILE), codes[order])
+    np.save(os.path.join(partial, ROWS_FILE), order.astype(np.int32))
+    np.save(os.path.join(partial, LIST_OFFSETS_FILE), offsets)
+    with open(os.path.join(partial, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"n_rows": int(n_rows), "dim": int(dim), "n_lists": int(n_lists), "pq_m": int(pq_m),
+                   "sub": int(sub), "n_codes": int(n_codes)}, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(partial, path)
+    print(f"Saved ANN index to '{path}' in {time.perf_counter() - start_time:.1f}s")
+
+
+class IVFPQIndex:
+    """
+        Read-only, memory-mapped IVF-PQ index (see build_ann_index).
+
+        A query scans the n_probe lists whose centroids are closest to it. Scores of
+        the rows in them are approximated with asymmetric distance computation: with
+        unit-length vectors cosine = inner product, and
+            q · row  ~  q · centroid + sum_m table[m, code_m],  table[m, j] = q_m · codebook[m, j]
+        The `rerank` best approximate rows are then re-scored exactly from the LSI
+        matrix, so the returned scores are exact cosines.
+    """
+
+    def __init__(self, path: str = ANN_DIR):
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.centroids = np.load(os.path.join(path, CENTROIDS_FILE))
+        self.codebooks = np.load(os.path.join(path, CODEBOOKS_FILE))
+        self.codes = np.load(os.path.join(path, CODES_FILE), mmap_mode="r")
+        self.rows = np.load(os.path.join(path, ROWS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, LIST_OFFSETS_FILE))
+        self.docs = np.load(LSI_DOCS_FILE, mmap_mode="r")
+        self.sub = self.meta.get("sub", self.meta["dim"] // self.meta["pq_m"])
+
+    def search(self, query: np.ndarray, k: int = 10, n_probe: int = N_PROBE, rerank: int = RERANK,
+               exclude: int = None) -> tuple:
+        """
+            Approximate top-k rows by cosine to a unit-length query.
+
+            Args:
+                query: float32 [K]
+                n_probe: lists scanned (more = higher recall, slower)
+                rerank: approximate candidates re-scored exactly (>= k)
+                exclude: a row never returned (the query speech itself)
+
+            Returns:
+                (rows, scores): numpy arrays, best first
+        """
+        query = np.asarray(query, dtype=np.float32)
+        coarse = self.centroids @ query
+        n_probe = min(n_probe, len(coarse))
+        probed = np.argpartition(-coarse, n_probe - 1)[:n_probe]
+
+        table = np.einsum("mjd,md->mj", self.codebooks, _pad(query, self.meta["pq_m"] * self.sub).reshape(self.meta["pq_m"], self.sub))
+        m_index = np.arange(self.meta["pq_m"])
+        cand_rows, cand_scores = [], []
+        for lst in probed.tolist():
+            lo, hi = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            if lo == hi:
+                continue
+            codes = np.asarray(self.codes[lo:hi])
+            cand_scores.append(coarse[lst] + table[m_index, codes].sum(axis=1))
+            cand_rows.append(np.asarray(self.rows[lo:hi]))
+        if not cand_rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        rows = np.concatenate(cand_rows).astype(np.int64)
+        scores = np.concatenate(cand_scores)
+        if exclude is not None:
+            keep = rows != exclude
+            rows, scores = rows[keep], scores[keep]
+        rerank = max(rerank, k)
+        if len(rows) > rerank:
+            top = np.argpartition(-scores, rerank - 1)[:rerank]
+            rows = rows[top]
+
+        rows = np.sort(rows)  # ascending rows: sequential reads from the memmap
+        exact = np.asarray(self.docs[rows]) @ query
+        best = np.lexsort((rows, -exact))[:k]
+        return rows[best], exact[best]
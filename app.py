@@ -1,14 +1,27 @@
-from flask import Flask, render_template, request, jsonify
-from tf_idf import load_inverse_index_and_docs
-from query_processing import process_query
-from data_cleaning import process_dataset
-from inverted_index import create_inverse_index_catalogue
+from flask import Flask, Response, render_template, request, jsonify
+from query_processing import parse_query, get_stem_cache
+from data_cleaning import process_dataset_streaming
+from inverted_index import create_inverse_index_catalogue, build_sharded_index, INDEX_DIR, SHARDS_DIR
+from postings import SegmentedIndex, ShardedIndex, index_exists, sharded_index_exists, MANIFEST_FILE, SHARDS_FILE
+from result_cache import ResultCache, artifact_version
 from part2 import run_all_part2_tasks, find_entity_id_by_name
 from part3 import compute_and_store_all_pairs
-from create_database import create_schema, populate_data, is_part2_already_computed, is_part3_already_computed
-from LSI import build_tfidf_matrix, perform_lsi, clustering_lsi_docs
+from create_database import create_schema, create_indexes, populate_data, populate_data_from_corpus, is_part2_already_computed, is_part3_already_computed
+from metadata_index import DocMetadata, period_bounds
+from tf_idf import KeywordSlicer, keyword_weights_exist, build_keyword_weights, KEYWORD_WEIGHTS_DIR, WEIGHTS_TERMS_FILE
+import search_engine
+from corpus import Corpus, corpus_exists
+from snippets import make_snippet
+from fuzzy import StemMatcher
+from LSI import build_tfidf_matrix, perform_lsi, clustering_lsi_docs, LSI_TERM_TOPICS_FILE, LSI_DOCS_FILE, LSI_TERM_IDF_FILE
+from semantic_search import LSISearcher, HYBRID_CANDIDATES, HYBRID_WEIGHT
+from ann_index import IVFPQIndex, build_ann_index, ann_index_is_stale, ANN_DIR, META_FILE as ANN_META_FILE, N_PROBE, RERANK
 import sqlite3
 import os
+import json
+import base64
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 import unicodedata
 import numpy as _np, pickle as _pickle
 from scipy.sparse import load_npz as _load_npz
@@ -17,28 +30,52 @@ from sklearn.metrics.pairwise import cosine_similarity
 # --- File paths for persistent artifacts ---
 DB_NAME = "parliament.db"
 CSV_FILE = "cleaned_data.csv"
+
+# /search paging
+PAGE_SIZE = 10        # results per page when "limit" is not given
+MAX_PAGE_SIZE = 100   # largest accepted "limit"
+MAX_CURSOR_OFFSET = 10000  # deepest result a cursor may point at (deeper results: "stream": true)
+STREAM_BATCH = 200    # results fetched from the DB at a time by the NDJSON export
+
+# /search/batch
+BATCH_MAX_QUERIES = 1000             # queries accepted per request
+BATCH_THREADS = os.cpu_count() or 4  # queries ranked in parallel
+SLICE_MAX_TOP_N = 100                # largest "top_n" of /keywords/slice
+FUZZY_MODES = ("suggest", "expand")  # /search "fuzzy" values
 TFIDF_FILE = "tfidf_matrix.npz"
 DOC_IDS_FILE = "doc_ids.npy"
 LSI_OUTPUT_FILE = "lsi_projected_docs.npz"
 CLUSTERS_FILE = "final_clustering_results.pkl"
 
 # --- One-time data preparation steps ---
-# Create cleaned_data.csv if it does not exist
+# Create cleaned_data.csv if it does not exist (resumes an interrupted ingest)
 if not os.path.isfile(CSV_FILE):
     print("Creating cleaned_data.csv")
-    process_dataset()
+    process_dataset_streaming()
 
-# Create inverse_index.pkl if it does not exist
-if not os.path.isfile("inverse_index.pkl"):
+# Create the inverted index (index/, or inverse_index.pkl without a corpus) if it does not exist
+if not index_exists(INDEX_DIR) and not os.path.isfile("inverse_index.pkl"):
     print("Creating inverse index catalogue")
     create_inverse_index_catalogue()
 
+# Year-sharded copy of the index used by /search (needs the corpus)
+if corpus_exists() and not sharded_index_exists(SHARDS_DIR):
+    print("Creating year-sharded index")
+    build_sharded_index()
+
 # Create db schema if it does not exist
 if not os.path.isfile(DB_NAME):
     print(f"Creating SQLite database '{DB_NAME}'")
     conn = sqlite3.connect(DB_NAME)
     create_schema(conn)
-    populate_data(conn, CSV_FILE)
+    if corpus_exists():
+        populate_data_from_corpus(conn, Corpus())
+    else:
+        populate_data(conn, CSV_FILE)
+    conn.close()
+else:
+    conn = sqlite3.connect(DB_NAME)
+    create_indexes(conn)
     conn.close()
 
 # Compute TF-IDF if it does not exist
@@ -51,6 +88,14 @@ if not is_part2_already_computed():
 else:
     print("Keyword analysis already exists. Skipping part2 processing.")
 
+# Per-speech TF-IDF vectors for /keywords/slice (saved by part2; built here for older databases)
+if not keyword_weights_exist():
+    try:
+        print("Saving per-speech TF-IDF vectors...")
+        build_keyword_weights()
+    except Exception as e:
+        print(f"Error while saving TF-IDF vectors: {e}")
+
 # Compute pairwise member similarities if not already done
 if not is_part3_already_computed():
     try:
@@ -67,17 +112,27 @@ else:
 
 # --- Files needed for LSI pipeline ---
 # TF-IDF matrix
-if not os.path.exists(TFIDF_FILE) or not os.path.exists(DOC_IDS_FILE):
+if not os.path.exists(TFIDF_FILE) or not os.path.exists(DOC_IDS_FILE) or not os.path.exists(LSI_TERM_IDF_FILE):
     build_tfidf_matrix()
 else:
     print("TF-IDF already exists. Skipping...")
 
-# LSI projection (dimensionality reduction)
-if not os.path.exists(LSI_OUTPUT_FILE):
+# LSI projection (dimensionality reduction), plus the term-topic / unit-row files of semantic search
+if not os.path.exists(LSI_OUTPUT_FILE) or not os.path.exists(LSI_TERM_TOPICS_FILE) or not os.path.exists(LSI_DOCS_FILE):
     perform_lsi()
 else:
     print("LSI projection already exists. Skipping...")
 
+# Approximate nearest-neighbour (IVF-PQ) index over the LSI vectors
+if ann_index_is_stale(ANN_DIR):
+    try:
+        build_ann_index(ANN_DIR)
+    except Exception as e:
+        # semantic search falls back to the exact scan (_get_ann_index returns None)
+        print(f"Error while building the ANN index: {e}")
+else:
+    print("ANN index already exists. Skipping...")
+
 # Clustering results
 if not os.path.exists(CLUSTERS_FILE):
     clustering_lsi_docs()
@@ -117,8 +172,34 @@ def find_member_id_fuzzy(conn, name: str):
 # Flask App
 app = Flask(__name__)
 
-# Load data and index
-inverse_index, df, _, _ = load_inverse_index_and_docs()
+# Open the memory-mapped inverted index (no unpickling at startup)
+inverse_index = SegmentedIndex(INDEX_DIR) if index_exists(INDEX_DIR) else None
+# Year shards: searches only read the shards inside the requested year range
+sharded_index = ShardedIndex(SHARDS_DIR) if sharded_index_exists(SHARDS_DIR) else None
+# doc_id -> year / party / member arrays used for search filters
+doc_metadata = DocMetadata(DB_NAME)
+# /search responses by (tokens, clauses, filters), dropped when the DB or index files change
+result_cache = ResultCache()
+# Speech text and token spans for query-aware snippets
+snippet_corpus = Corpus() if corpus_exists() else None
+
+
+def _refresh_search_state():
+    """Reopen the indexes and the metadata arrays after incremental.py added or merged segments."""
+    global inverse_index, sharded_index, doc_metadata, snippet_corpus
+    stale = [idx for idx in (inverse_index, sharded_index) if idx is not None and idx.is_stale()]
+    if not stale:
+        return
+    try:
+        if inverse_index is not None:
+            inverse_index = SegmentedIndex(INDEX_DIR)
+        if sharded_index is not None:
+            sharded_index = ShardedIndex(SHARDS_DIR)
+        doc_metadata = DocMetadata(DB_NAME)
+        if snippet_corpus is not None:
+            snippet_corpus = Corpus()
+    except FileNotFoundError:
+        pass  # a merge swapped segments while reopening; keep serving the old view
 
 @app.route("/")
 def index():
@@ -131,22 +212,613 @@ def search():
     """
         Search endpoint: performs keyword-based retrieval over speeches
         with optional filters (date range, party, member).
+        Quoted phrases ("δημόσιο χρέος") and `a NEAR/k b` are matched with the
+        positional index when it exists.
         Returns top-N matching speeches with snippets.
+
+        With "facets": true in the request the response is
+        {"results": [...], "facets": {...}}: hit counts of the full match set per
+        party, year and top members (see DocMetadata.facet_counts).
+
+        Paging: with "limit" (up to MAX_PAGE_SIZE) and/or "cursor" the response is
+        {"results": [...], "next_cursor": str or null}; send next_cursor back to get
+        the following page. With "stream": true every result is streamed as NDJSON
+        (one result per line, at most "limit" if given; "limit" must then be >= 1).
+
+        Typos: query stems that match no index term (exactly or by prefix) are
+        looked up in the vocabulary n-gram index (fuzzy.StemMatcher). With
+        "fuzzy": "suggest" the response is {"results": [...], "did_you_mean": [...]}
+        with the nearest stems of every unknown token; with "fuzzy": "expand" the
+        unknown tokens are also replaced by their closest stems before ranking.
     """
     data = request.get_json(force=True) or {}
     raw_query = (data.get("query") or "").strip()
     date_range = (data.get("dateRange") or "all").strip().lower()   # "all" ή "YYYY-YYYY"
     party_name = (data.get("party") or "all").strip()
     mp_name    = (data.get("mp") or "all").strip()
+    with_facets = bool(data.get("facets"))
+    stream = bool(data.get("stream"))
+    fuzzy = data.get("fuzzy") or None
+    if fuzzy is not None and fuzzy not in FUZZY_MODES:
+        return jsonify({"error": f"fuzzy must be one of {', '.join(FUZZY_MODES)}"}), 400
+    paged = data.get("limit") is not None or data.get("cursor") is not None
+    try:
+        limit = min(max(int(data.get("limit") or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        after = _decode_cursor(data.get("cursor"))
+        max_results = int(data["limit"]) if stream and data.get("limit") is not None else None
+        if max_results is not None and max_results < 1:
+            raise ValueError("limit must be >= 1")
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid limit or cursor"}), 400
+
+    empty = []
+    if with_facets or paged or fuzzy:
+        empty = {"results": []}
+        if with_facets:
+            empty["facets"] = None
+        if paged:
+            empty["next_cursor"] = None
+        if fuzzy:
+            empty["did_you_mean"] = []
+    if not raw_query:
+        return jsonify(empty)
+
+    # Tokenize and normalize query; phrases and NEAR/k become positional clauses
+    tokens, clauses = parse_query(raw_query)
+    tokens = [t for t in tokens if t]
+    if not tokens and not clauses:
+        return jsonify(empty)
+    corrections = []
+    if fuzzy:
+        tokens, corrections = _correct_tokens(tokens, expand=fuzzy == "expand")
+
+    if stream:
+        return _stream_search(tokens, clauses, date_range, party_name, mp_name, max_results)
+
+    # Same normalized query + filters on the same artifacts -> cached response
+    cache_key = (tuple(tokens), _clauses_key(clauses), date_range, party_name, mp_name)
+    version = _search_version()
+    if paged:
+        results, next_cursor = _search_page(tokens, clauses, date_range, party_name, mp_name, limit, after)
+        response = {"results": results, "next_cursor": next_cursor}
+    else:
+        results = result_cache.get(cache_key, version)
+        if results is None:
+            results = _run_search(tokens, clauses, date_range, party_name, mp_name)
+            result_cache.put(cache_key, version, results)
+        if not (with_facets or fuzzy):
+            return jsonify(results)
+        response = {"results": results}
+    if fuzzy:
+        response["did_you_mean"] = corrections
+
+    if with_facets:
+        facets_key = ("facets",) + cache_key
+        facets = result_cache.get(facets_key, version)
+        if facets is None:
+            facets = _run_facets(tokens, clauses, date_range, party_name, mp_name)
+            result_cache.put(facets_key, version, facets)
+        response["facets"] = facets
+    return jsonify(response)
+
+
+_stem_matcher = None
+
+
+def _get_stem_matcher():
+    """StemMatcher over the vocabulary of the current index (None without an on-disk index)."""
+    global _stem_matcher
+    index = inverse_index if inverse_index is not None else sharded_index
+    if index is None:
+        return None
+    if _stem_matcher is None or _stem_matcher[0] is not index:
+        _stem_matcher = (index, StemMatcher.from_index(index))
+    return _stem_matcher[1]
+
+
+def _correct_tokens(tokens, expand=False):
+    """
+        Suggestions for the query tokens that match no index term.
+
+        Returns:
+            (tokens, corrections): with `expand` every unknown token is replaced by its
+            suggestions at the smallest distance; corrections is
+            [{"token", "suggestions": [{"term", "distance", "df"}, ...]}, ...]
+    """
+    _refresh_search_state()
+    matcher = _get_stem_matcher()
+    if matcher is None:
+        return tokens, []
+    index = inverse_index if inverse_index is not None else sharded_index
+    corrected, corrections = [], []
+    for token in tokens:
+        if index.prefix_terms(token):
+            corrected.append(token)
+            continue
+        suggestions = matcher.suggest(token)
+        if suggestions:
+            corrections.append({"token": token, "suggestions": suggestions})
+        if expand and suggestions:
+            corrected.extend(s["term"] for s in suggestions if s["distance"] == suggestions[0]["distance"])
+        else:
+            corrected.append(token)
+    return corrected, corrections
+
+
+def _clauses_key(clauses):
+    return tuple((c["type"], tuple(c["terms"]), c.get("k")) for c in clauses)
+
+
+def _search_version():
+    """Version of the artifacts /search reads; any change invalidates result_cache."""
+    return artifact_version(DB_NAME, "inverse_index.pkl", os.path.join(INDEX_DIR, MANIFEST_FILE),
+                            os.path.join(SHARDS_DIR, SHARDS_FILE), LSI_DOCS_FILE)
+
+
+def _run_search(tokens, clauses, date_range, party_name, mp_name):
+    """Rank and fetch the /search results (uncached)."""
+    if inverse_index is None and sharded_index is None:
+        tokens = tokens + [term for clause in clauses for term in clause["terms"]]
+        return _keyword_table_search(tokens, date_range, party_name, mp_name)
+
+    top_docs = _rank(tokens, clauses, date_range, party_name, mp_name, PAGE_SIZE)
+    if not top_docs:
+        return []
+    return _build_results(top_docs, _snippet_terms(tokens, clauses))
+
+
+def _rank(tokens, clauses, date_range, party_name, mp_name, k, index=None):
+    """Top-k (doc_id, score) from the inverted index (or from `index`, a view of it)."""
+    # Rank from the inverted index: prefix lookup in the term dictionary + postings by term id
+    if index is None:
+        _refresh_search_state()
+        index = sharded_index if sharded_index is not None else inverse_index
+    filters = doc_metadata.parse_filters(date_range, party_name, mp_name)
+    if hasattr(index, "shards"):
+        # only the year shards inside dateRange are searched, in parallel
+        return search_engine.search_sharded(index, doc_metadata, tokens, filters, k=k, clauses=clauses)
+    return search_engine.search(index, doc_metadata, tokens, filters, k=k, clauses=clauses)
+
+
+def _snippet_terms(tokens, clauses, index=None):
+    """Index terms the snippets highlight: every term the tokens expand to, plus the clause terms."""
+    if index is None:
+        index = sharded_index if sharded_index is not None else inverse_index
+    terms = [term for term, _ in search_engine.query_terms(index, tokens)]
+    return terms + [term for clause in clauses for term in clause["terms"]]
+
+
+def _encode_cursor(score, doc_id, offset):
+    payload = json.dumps({"s": score, "d": doc_id, "o": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    """(score, doc_id, offset) of the last result of the previous page, None for the first page."""
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        after = float(payload["s"]), int(payload["d"]), int(payload["o"])
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not 0 <= after[2] <= MAX_CURSOR_OFFSET:
+        raise ValueError("invalid cursor")
+    return after
+
+
+def _search_page(tokens, clauses, date_range, party_name, mp_name, limit, after):
+    """
+        One page of results after the cursor.
+
+        The cursor holds the (score, doc_id) of the last result already returned, so the
+        page starts right after it even if the ranking shifted meanwhile. The ranked
+        (doc_id, score) list is kept in result_cache with its depth and as doc_id / score
+        arrays (the cursor position is one vectorized count): later pages slice it, and only a page beyond it re-ranks, with a doubled depth (MaxScore top-k
+        stays cheap for a bounded k), so walking n pages ranks O(log n) times. The
+        offset stored in the cursor is only a depth hint: it is trusted up to the
+        depth already cached, and no ranking goes deeper than MAX_CURSOR_OFFSET + limit,
+        so a forged cursor cannot force a full-depth ranking.
+
+        Returns:
+            (results, next_cursor or None)
+    """
+    if inverse_index is None and sharded_index is None:
+        if after is not None:
+            return [], None
+        tokens = tokens + [term for clause in clauses for term in clause["terms"]]
+        return _keyword_table_search(tokens, date_range, party_name, mp_name, k=limit), None
+
+    key = ("ranked", tuple(tokens), _clauses_key(clauses), date_range, party_name, mp_name)
+    version = _search_version()
+    ranked = result_cache.get(key, version)  # (depth, [(doc_id, score), ...], doc_ids, scores)
+    needed = (min(after[2], ranked[0] if ranked else 0) if after else 0) + limit + 1
+    max_depth = MAX_CURSOR_OFFSET + limit + 1
+    while True:
+        if ranked is None or (len(ranked[1]) >= ranked[0] and ranked[0] < min(needed, max_depth)):
+            depth = min(max(needed, 2 * ranked[0] if ranked else 0), max_depth)
+            top_docs = _rank(tokens, clauses, date_range, party_name, mp_name, depth)
+            ranked = (depth, top_docs, _np.fromiter((d for d, _ in top_docs), dtype=_np.int64, count=len(top_docs)),
+                      _np.fromiter((s for _, s in top_docs), dtype=_np.float64, count=len(top_docs)))
+            result_cache.put(key, version, ranked)
+        depth, top_docs, doc_ids, scores = ranked
+        start = search_engine.rank_position(doc_ids, scores, after[:2]) if after else 0
+        if len(top_docs) < depth or start + limit < len(top_docs) or depth >= max_depth:
+            break
+        needed = start + limit + 1  # the ranking shifted since the cursor was issued
+
+    page = top_docs[start:start + limit]
+    next_cursor = None
+    if page and start + limit < len(top_docs) and start + limit <= MAX_CURSOR_OFFSET:
+        doc_id, score = page[-1]
+        next_cursor = _encode_cursor(score, doc_id, start + limit)
+    return _build_results(page, _snippet_terms(tokens, clauses)) if page else [], next_cursor
+
+
+def _stream_search(tokens, clauses, date_range, party_name, mp_name, max_results=None):
+    """
+        NDJSON export of every result in ranking order. The ranking itself is two
+        compact arrays (search_engine.rank_all); speeches are fetched, turned into
+        results and written STREAM_BATCH at a time, so the response is never held
+        in memory.
+    """
+    if inverse_index is None and sharded_index is None:
+        tokens = tokens + [term for clause in clauses for term in clause["terms"]]
+        results = _keyword_table_search(tokens, date_range, party_name, mp_name, k=max_results)
+        lines = (json.dumps(item, ensure_ascii=False) + "\n" for item in results)
+        return Response(lines, mimetype="application/x-ndjson")
+
+    _refresh_search_state()
+    filters = doc_metadata.parse_filters(date_range, party_name, mp_name)
+    index = sharded_index if sharded_index is not None else inverse_index
+    doc_ids, scores = search_engine.rank_all(index, doc_metadata, tokens, filters, clauses)
+    if max_results is not None:
+        doc_ids, scores = doc_ids[:max_results], scores[:max_results]
+    terms = _snippet_terms(tokens, clauses)
+
+    def generate():
+        for start in range(0, len(doc_ids), STREAM_BATCH):
+            batch = list(zip(doc_ids[start:start + STREAM_BATCH].tolist(), scores[start:start + STREAM_BATCH].tolist()))
+            for item in _build_results(batch, terms):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+def _run_facets(tokens, clauses, date_range, party_name, mp_name):
+    """Facet counts of the full match set (None without an on-disk index)."""
+    if inverse_index is None and sharded_index is None:
+        return None
+    _refresh_search_state()
+    filters = doc_metadata.parse_filters(date_range, party_name, mp_name)
+    index = sharded_index if sharded_index is not None else inverse_index
+    return doc_metadata.facet_counts(search_engine.match_set(index, tokens, clauses), filters)
+
+
+def _build_results(top_docs, terms=(), conn=None):
+    """
+        Fetch the speeches of ranked (doc_id, score) pairs and build the /search response.
+        "speech" is a snippet centred on the query `terms` with "highlights" (character
+        spans inside it), read from the corpus; without token spans it falls back to the
+        first 600 characters of the speech from the DB.
+        `conn` reuses an open connection (closed by the caller).
+    """
+    doc_ids = [doc_id for doc_id, _ in top_docs]
+    scores_dict = dict(top_docs)
+
+    snippets = {}
+    if snippet_corpus is not None:
+        term_ids = snippet_corpus.term_ids(terms)
+        document_ids = snippet_corpus.document_id
+        for doc_id in doc_ids:
+            row = int(_np.searchsorted(document_ids, doc_id))
+            if row < len(snippet_corpus) and document_ids[row] == doc_id:
+                snippet = make_snippet(snippet_corpus, row, term_ids)
+                if snippet is not None:
+                    snippets[doc_id] = snippet
+
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    placeholders = ",".join("?" for _ in doc_ids)
+    # the full speech text is only read for documents without a snippet
+    speech_column = "substr(s.speech, 1, 601)" if len(snippets) < len(doc_ids) else "NULL"
+    cursor.execute(f"""
+        SELECT s.doc_id, {speech_column}, s.sitting_date, m.full_name, p.name
+        FROM speeches s
+        JOIN members m ON s.member_id = m.id
+        JOIN parties p ON s.party_id = p.id
+        WHERE s.doc_id IN ({placeholders})
+    """, tuple(doc_ids))
+    rows = cursor.fetchall()
+    if own_conn:
+        conn.close()
+
+    results = []
+    for doc_id, speech, date, member, party in rows:
+        snippet = snippets.get(doc_id)
+        if snippet is None:
+            excerpt = speech[:600] + "..." if len(speech) > 600 else speech
+            snippet = {"text": excerpt, "highlights": []}
+        results.append({
+            "doc_id": doc_id,
+            "score": round(scores_dict.get(doc_id, 0.0), 4),
+            "speech": snippet["text"],
+            "highlights": snippet["highlights"],
+            "member": member,
+            "party": party,
+            "date": date
+        })
+
+    results.sort(key=lambda x: (-x["score"], x["doc_id"]))
+    return results
+
+
+_lsi_searcher = None
+
+
+def _get_lsi_searcher():
+    """LSISearcher over the current LSI files, reopened when perform_lsi() rewrote them."""
+    global _lsi_searcher
+    version = artifact_version(LSI_DOCS_FILE, LSI_TERM_TOPICS_FILE, LSI_TERM_IDF_FILE)
+    if _lsi_searcher is None or _lsi_searcher[0] != version:
+        _lsi_searcher = (version, LSISearcher())
+    return _lsi_searcher[1]
+
+
+_ann_index = None
+
+
+def _get_ann_index():
+    """IVFPQIndex over the current LSI vectors, None if it is missing or out of date."""
+    global _ann_index
+    if ann_index_is_stale(ANN_DIR):
+        return None
+    version = artifact_version(os.path.join(ANN_DIR, ANN_META_FILE))
+    if _ann_index is None or _ann_index[0] != version:
+        _ann_index = (version, IVFPQIndex(ANN_DIR))
+    return _ann_index[1]
+
+
+def _ann_options(args):
+    """ANN recall/latency knobs of a request: n_probe (lists scanned) and rerank (exactly re-scored candidates)."""
+    return {"n_probe": min(max(int(args.get("n_probe") or N_PROBE), 1), 4096),
+            "rerank": min(max(int(args.get("rerank") or RERANK), 1), 100000)}
 
+
+@app.route("/similar/speech", methods=["GET"])
+def similar_speech():
+    """
+        "More like this": the speeches closest to a given speech in the LSI space.
+
+        Query params:
+            id: doc_id of the speech
+            k: number of results (default PAGE_SIZE, max MAX_PAGE_SIZE)
+            dateRange / party / mp: same filters as /search (filtered requests scan
+                                    only the matching rows exactly)
+            n_probe / rerank: ANN knobs (see ann_index.IVFPQIndex.search)
+            exact: "1" to scan every vector instead of using the ANN index
+
+        Returns:
+            {"speech": doc_id, "results": [... /search results, "score" = cosine ...]}
+    """
+    try:
+        doc_id = int(request.args.get("id", ""))
+        k = min(max(int(request.args.get("k") or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        options = _ann_options(request.args)
+    except ValueError:
+        return jsonify({"error": "id, k, n_probe and rerank must be integers"}), 400
+
+    searcher = _get_lsi_searcher()
+    row = searcher.row_of(doc_id)
+    if row is None:
+        return jsonify({"error": f"speech {doc_id} has no LSI vector"}), 404
+
+    _refresh_search_state()
+    filters = doc_metadata.parse_filters((request.args.get("dateRange") or "all").strip().lower(),
+                                         (request.args.get("party") or "all").strip(),
+                                         (request.args.get("mp") or "all").strip())
+    ann = None if request.args.get("exact") == "1" else _get_ann_index()
+    query = _np.asarray(searcher.docs[row], dtype=_np.float32)
+    top_docs = searcher.search_vector(query, doc_metadata, filters, k, exclude_row=row, ann=ann, **options)
+    return jsonify({"speech": doc_id, "results": _build_results(top_docs) if top_docs else []})
+
+
+@app.route("/search/semantic", methods=["POST"])
+def search_semantic():
+    """
+        Semantic search: the processed query is folded into the LSI space (K topics)
+        and speeches are ranked by cosine similarity (see semantic_search.LSISearcher),
+        so speeches about the same topic match without sharing the query words.
+
+        Body: same fields as /search ("query", "dateRange", "party", "mp", "limit"),
+        plus the ANN knobs "n_probe" / "rerank" and "exact": true to scan every vector.
+        Unfiltered queries use the IVF-PQ index when it exists.
+        Returns: the /search result list; "score" is the cosine similarity.
+    """
+    data = request.get_json(force=True) or {}
+    raw_query = (data.get("query") or "").strip()
+    date_range = (data.get("dateRange") or "all").strip().lower()
+    party_name = (data.get("party") or "all").strip()
+    mp_name = (data.get("mp") or "all").strip()
+    try:
+        limit = min(max(int(data.get("limit") or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        options = _ann_options(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid limit, n_probe or rerank"}), 400
+    exact = bool(data.get("exact"))
     if not raw_query:
         return jsonify([])
 
-    # Tokenize and normalize query
-    tokens = [t for t in process_query(raw_query) if t]
+    # Phrase / NEAR syntax has no meaning here: their stems join the bag of words
+    tokens, clauses = parse_query(raw_query)
+    tokens = [t for t in tokens if t] + [term for clause in clauses for term in clause["terms"]]
     if not tokens:
         return jsonify([])
 
+    cache_key = ("semantic", tuple(tokens), date_range, party_name, mp_name, limit, exact,
+                 tuple(sorted(options.items())))
+    version = _search_version()
+    results = result_cache.get(cache_key, version)
+    if results is None:
+        _refresh_search_state()
+        filters = doc_metadata.parse_filters(date_range, party_name, mp_name)
+        ann = None if exact else _get_ann_index()
+        top_docs = _get_lsi_searcher().search(tokens, doc_metadata, filters, k=limit, ann=ann, **options)
+        results = _build_results(top_docs, tokens) if top_docs else []
+        result_cache.put(cache_key, version, results)
+    return jsonify(results)
+
+
+@app.route("/search/hybrid", methods=["POST"])
+def search_hybrid():
+    """
+        Hybrid search: the top "candidates" (default HYBRID_CANDIDATES, max 1000) of the
+        lexical /search ranking are reranked with their LSI cosine to the folded query
+        (semantic_search.LSISearcher.rerank), so exact matches of rare names stay on top
+        while paraphrases of the query move up.
+
+        Body: same fields as /search ("query", "dateRange", "party", "mp", "limit"), plus
+            "fusion": "rrf" (default, reciprocal rank fusion) or "weighted"
+            "weight": LSI share of the weighted fusion (default HYBRID_WEIGHT)
+        Returns: the /search result list; "score" is the fused score.
+    """
+    data = request.get_json(force=True) or {}
+    raw_query = (data.get("query") or "").strip()
+    date_range = (data.get("dateRange") or "all").strip().lower()
+    party_name = (data.get("party") or "all").strip()
+    mp_name = (data.get("mp") or "all").strip()
+    fusion = (data.get("fusion") or "rrf").strip().lower()
+    try:
+        limit = min(max(int(data.get("limit") or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        candidates = min(max(int(data.get("candidates") or HYBRID_CANDIDATES), limit), 1000)
+        weight = min(max(float(data.get("weight", HYBRID_WEIGHT)), 0.0), 1.0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid limit, candidates or weight"}), 400
+    if fusion not in ("rrf", "weighted"):
+        return jsonify({"error": "fusion must be 'rrf' or 'weighted'"}), 400
+    if not raw_query:
+        return jsonify([])
+
+    tokens, clauses = parse_query(raw_query)
+    tokens = [t for t in tokens if t]
+    if not tokens and not clauses:
+        return jsonify([])
+    if inverse_index is None and sharded_index is None:
+        # no on-disk index to draw candidates from: lexical results only
+        all_tokens = tokens + [term for clause in clauses for term in clause["terms"]]
+        return jsonify(_keyword_table_search(all_tokens, date_range, party_name, mp_name, k=limit))
+
+    cache_key = ("hybrid", tuple(tokens), _clauses_key(clauses), date_range, party_name, mp_name,
+                 limit, candidates, fusion, weight if fusion == "weighted" else None)
+    version = _search_version()
+    results = result_cache.get(cache_key, version)
+    if results is None:
+        lexical = _rank(tokens, clauses, date_range, party_name, mp_name, candidates)
+        folded = tokens + [term for clause in clauses for term in clause["terms"]]
+        top_docs = _get_lsi_searcher().rerank(lexical, folded, k=limit, fusion=fusion, weight=weight)
+        results = _build_results(top_docs, _snippet_terms(tokens, clauses)) if top_docs else []
+        result_cache.put(cache_key, version, results)
+    return jsonify(results)
+
+
+_batch_executor = None
+
+
+def _get_batch_executor():
+    global _batch_executor
+    if _batch_executor is None:
+        _batch_executor = ThreadPoolExecutor(max_workers=BATCH_THREADS)
+    return _batch_executor
+
+
+@app.route("/search/batch", methods=["POST"])
+def search_batch():
+    """
+        Run many /search queries in one request.
+
+        Body:
+            {"queries": [{"query", "dateRange", "party", "mp", "limit"}, ...]}
+            (same fields and defaults as /search; "limit" up to MAX_PAGE_SIZE)
+
+        Returns:
+            {"results": [[...], ...]}: the results of every query, in request order
+
+        Notes:
+            - All queries read one search_engine.SharedTermView of the index, so a
+              term's prefix expansion, df and postings are fetched once per batch.
+            - Distinct queries are ranked in parallel on BATCH_THREADS threads; the
+              speeches are then fetched over a single SQLite connection.
+            - Results are shared with result_cache (same entries as /search).
+    """
+    data = request.get_json(force=True) or {}
+    queries = data.get("queries")
+    if not isinstance(queries, list) or len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({"error": f"'queries' must be a list of at most {BATCH_MAX_QUERIES} queries"}), 400
+
+    jobs = []  # (cache key, tokens, clauses, date_range, party_name, mp_name, limit) or None
+    for item in queries:
+        item = item if isinstance(item, dict) else {"query": str(item)}
+        raw_query = (item.get("query") or "").strip()
+        try:
+            limit = min(max(int(item.get("limit") or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return jsonify({"error": "invalid limit"}), 400
+        tokens, clauses = parse_query(raw_query) if raw_query else ([], [])
+        tokens = [t for t in tokens if t]
+        if not tokens and not clauses:
+            jobs.append(None)
+            continue
+        date_range = (item.get("dateRange") or "all").strip().lower()
+        party_name = (item.get("party") or "all").strip()
+        mp_name = (item.get("mp") or "all").strip()
+        key = (tuple(tokens), _clauses_key(clauses), date_range, party_name, mp_name)
+        if limit != PAGE_SIZE:
+            key += (limit,)
+        jobs.append((key, tokens, clauses, date_range, party_name, mp_name, limit))
+
+    version = _search_version()
+    answers = {}
+    pending = {}
+    for job in jobs:
+        if job is None or job[0] in answers or job[0] in pending:
+            continue
+        cached = result_cache.get(job[0], version)
+        if cached is not None:
+            answers[job[0]] = cached
+        else:
+            pending[job[0]] = job
+
+    if pending and inverse_index is None and sharded_index is None:
+        for key, tokens, clauses, date_range, party_name, mp_name, limit in pending.values():
+            tokens = tokens + [term for clause in clauses for term in clause["terms"]]
+            answers[key] = _keyword_table_search(tokens, date_range, party_name, mp_name, k=limit)
+            result_cache.put(key, version, answers[key])
+    elif pending:
+        _refresh_search_state()
+        view = search_engine.SharedTermView(sharded_index if sharded_index is not None else inverse_index)
+        ranked = list(_get_batch_executor().map(
+            lambda job: _rank(job[1], job[2], job[3], job[4], job[5], job[6], index=view), pending.values()))
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            for job, top_docs in zip(pending.values(), ranked):
+                key, tokens, clauses = job[0], job[1], job[2]
+                terms = _snippet_terms(tokens, clauses, view)
+                answers[key] = _build_results(top_docs, terms, conn) if top_docs else []
+                result_cache.put(key, version, answers[key])
+        finally:
+            conn.close()
+
+    return jsonify({"results": [answers[job[0]] if job is not None else [] for job in jobs]})
+
+
+def _keyword_table_search(tokens, date_range, party_name, mp_name, k=PAGE_SIZE):
+    """
+        Fallback search over the speech_keywords table, used when there is no
+        on-disk index (only the legacy inverse_index.pkl). Returns the top k
+        speeches (every match if k is None).
+    """
     # Build dynamic WHERE clause based on filters
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
@@ -198,10 +870,13 @@ def search():
 
     if not scores:
         conn.close()
-        return jsonify([])
+        return []
 
-    # Take top-10 speeches by score
-    top_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:10]
+    # Take the top-k speeches by score (bounded heap instead of sorting every match)
+    if k is None:
+        top_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    else:
+        top_docs = heapq.nlargest(k, scores.items(), key=lambda x: x[1])
     speech_ids = [sid for sid, _ in top_docs]
     scores_dict = dict(top_docs)
 
@@ -230,7 +905,7 @@ def search():
         })
 
     results.sort(key=lambda x: -x["score"])
-    return jsonify(results)
+    return results
 
 
 @app.route("/entities", methods=["GET"])
@@ -353,6 +1028,99 @@ def keywords_by_year():
         return jsonify({"error": f"Database error: {str(e)}"}), 500
 
 
+_keyword_slicer = None
+
+
+def _get_keyword_slicer():
+    """KeywordSlicer over the current per-speech TF-IDF vectors (reopened when they are rebuilt)."""
+    global _keyword_slicer
+    version = artifact_version(os.path.join(KEYWORD_WEIGHTS_DIR, WEIGHTS_TERMS_FILE))
+    if _keyword_slicer is None or _keyword_slicer[0] != version:
+        _keyword_slicer = (version, KeywordSlicer())
+    return _keyword_slicer[1]
+
+
+def _resolve_names(conn, names, ids, table, field):
+    """Ids of the given names: exact match first, then accent/case-insensitive (None if any is unknown)."""
+    resolved = []
+    for name in names:
+        entity_id = ids.get(name)
+        if entity_id is None:
+            entity_id = find_entity_id_by_name(conn, table, field, name)
+        if entity_id is None:
+            return None, name
+        resolved.append(entity_id)
+    return resolved, None
+
+
+@app.route("/keywords/slice", methods=["POST"])
+def keywords_slice():
+    """
+        Top TF-IDF keywords of any slice of the speeches, computed at request time.
+
+        Body (every field optional; an empty body is the whole corpus):
+            "from" / "to": period bounds, "YYYY", "YYYY-Qn", "YYYY-MM" or "YYYY-MM-DD"
+                           (inclusive: {"from": "2011-Q3", "to": "2012-Q2"})
+            "parties":     list of party names (speeches of any of them)
+            "members":     list of member names (speeches of any of them)
+            "top_n":       keywords returned (default 10, max SLICE_MAX_TOP_N)
+
+        Returns:
+            {"speeches": number of speeches in the slice,
+             "keywords": [{"keyword", "score"}, ...]}
+
+        Notes:
+            - The slice is the AND of the date range, the parties and the members,
+              from the metadata bitmaps (DocMetadata.slice_doc_ids).
+            - Scores are sums of per-speech TF-IDF vectors (tf_idf.KeywordSlicer), the
+              same as member_keywords_by_year / party_keywords_by_year for a member-year
+              or party-year slice. Responses are cached in result_cache.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    parties = data.get("parties") or []
+    members = data.get("members") or []
+    if isinstance(parties, str):
+        parties = [parties]
+    if isinstance(members, str):
+        members = [members]
+    try:
+        top_n = min(max(int(data.get("top_n") or 10), 1), SLICE_MAX_TOP_N)
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid top_n"}), 400
+    try:
+        first_day = period_bounds(str(data["from"]))[0] if data.get("from") else None
+        last_day = period_bounds(str(data["to"]))[1] if data.get("to") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not keyword_weights_exist():
+        return jsonify({"error": "Per-speech TF-IDF vectors are not available"}), 503
+
+    _refresh_search_state()
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        party_ids, unknown = _resolve_names(conn, [str(p).strip() for p in parties], doc_metadata.party_ids, "parties", "name")
+        if party_ids is None:
+            return jsonify({"error": f"Party not found: {unknown}"}), 404
+        member_ids, unknown = _resolve_names(conn, [str(m).strip() for m in members], doc_metadata.member_ids, "members", "full_name")
+        if member_ids is None:
+            return jsonify({"error": f"Member not found: {unknown}"}), 404
+    finally:
+        conn.close()
+
+    cache_key = ("keywords_slice", first_day, last_day, tuple(sorted(set(party_ids))), tuple(sorted(set(member_ids))), top_n)
+    version = artifact_version(DB_NAME, os.path.join(KEYWORD_WEIGHTS_DIR, WEIGHTS_TERMS_FILE))
+    result = result_cache.get(cache_key, version)
+    if result is None:
+        doc_ids = doc_metadata.slice_doc_ids(first_day, last_day, party_ids, member_ids)
+        keywords = _get_keyword_slicer().top_keywords(doc_ids, top_n)
+        result = {
+            "speeches": int(len(doc_ids)),
+            "keywords": [{"keyword": word, "score": round(score, 4)} for word, score in keywords],
+        }
+        result_cache.put(cache_key, version, result)
+    return jsonify(result)
+
+
 @app.route("/similarity/member", methods=["GET"])
 def similarity_member_endpoint():
     """
@@ -822,5 +1590,18 @@ def topic_drift():
 
     return jsonify({**result_header, "drifts": drifts})
 
+
+@app.route("/stats/stem_cache", methods=["GET"])
+def stem_cache_stats():
+    """Hit/miss counters of the token -> stem cache used by query processing."""
+    return jsonify(get_stem_cache().stats())
+
+
+@app.route("/stats/result_cache", methods=["GET"])
+def result_cache_stats():
+    """Hit/miss/eviction/invalidation counters of the /search result cache."""
+    return jsonify(result_cache.stats())
+
+
 if __name__ == "__main__":
     app.run(debug=True, use_reloader=False)
@@ -0,0 +1,202 @@
+# Benchmarks for the online (per-request) parts of the app.
+# Run with: python benchmark.py
+
+import time
+import statistics
+
+SAMPLE_QUERIES = [
+    "δημόσιο χρέος",
+    "Ο Πρόεδρος της Βουλής",
+    "νομοσχέδιο για την παιδεία",
+    "ανεργία των νέων",
+    "μεταναστευτικό και προσφυγικό ζήτημα",
+    "φορολογία ακινήτων ΕΝΦΙΑ",
+    "εθνικό σύστημα υγείας",
+    "συντάξεις και ασφαλιστικό",
+]
+
+
+def _time_calls(func, queries, repeat):
+    """Call func(query) `repeat` times per query; return per-call latencies in ms."""
+    latencies = []
+    for _ in range(repeat):
+        for q in queries:
+            start = time.perf_counter()
+            func(q)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    return latencies
+
+
+def _summary(latencies) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+    }
+
+
+def benchmark_query_processing(queries=SAMPLE_QUERIES, repeat: int = 50) -> dict:
+    """
+        Per-query latency of process_query() with the full spaCy pipeline
+        (fast=False, the old behaviour) vs. the tokenizer-only path (fast=True).
+
+        Both modes share the warm stem cache, so the difference is the pipeline cost.
+        The first call of each mode (model loading) is reported separately.
+    """
+    from query_processing import process_query
+
+    results = {}
+    for label, fast in (("full_pipeline", False), ("fast_tokenizer", True)):
+        start = time.perf_counter()
+        process_query(queries[0], fast=fast)
+        first_ms = (time.perf_counter() - start) * 1000.0
+
+        stats = _summary(_time_calls(lambda q: process_query(q, fast=fast), queries, repeat))
+        stats["first_call_ms"] = round(first_ms, 3)
+        results[label] = stats
+        print(f"process_query [{label}]: {stats}")
+
+    return results
+
+
+PHRASE_QUERIES = [
+    '"δημόσιο χρέος"',
+    '"Πρόεδρος της Βουλής"',
+    '"εθνικό σύστημα υγείας"',
+    'ανεργία NEAR/5 νέων',
+    'φορολογία NEAR/3 ακινήτων',
+    '"ασφαλιστικό σύστημα" συντάξεις',
+]
+
+
+def benchmark_phrase_search(queries=PHRASE_QUERIES, repeat: int = 20, k: int = 10) -> dict:
+    """
+        Phrase / NEAR/k queries on the positional index vs. the bag-of-stems path
+        (the same stems scored independently, no positions).
+
+        Reports latency for both and, for the bag-of-stems path, the share of its
+        top-k results that actually contain the phrase / proximity match
+        ("clause_precision"; the positional path is 1.0 by construction).
+    """
+    import search_engine
+    from query_processing import parse_query
+    from postings import SegmentedIndex
+    from inverted_index import INDEX_DIR
+    from metadata_index import DocMetadata
+
+    index = SegmentedIndex(INDEX_DIR)
+    if not index.has_positions:
+        print("The index has no positional layer (build it with STORE_POSITIONS = True).")
+        return {}
+    metadata = DocMetadata()
+    filters = metadata.parse_filters()
+    parsed = {q: parse_query(q) for q in queries}
+
+    def bag(q):
+        tokens, clauses = parsed[q]
+        return search_engine.search(index, metadata, tokens + [t for c in clauses for t in c["terms"]], filters, k)
+
+    def positional(q):
+        tokens, clauses = parsed[q]
+        return search_engine.search(index, metadata, tokens, filters, k, clauses=clauses)
+
+    results = {}
+    for label, func in (("bag_of_stems", bag), ("positional", positional)):
+        stats = _summary(_time_calls(func, queries, repeat))
+        if label == "bag_of_stems":
+            precision = []
+            for q in queries:
+                hits = [doc_id for doc_id, _ in func(q)]
+                if not hits:
+                    continue
+                matching = set(hits)
+                for clause in parsed[q][1]:
+                    matching &= set(search_engine.match_clause(index, clause)[0].tolist())
+                precision.append(len(matching) / len(hits))
+            stats["clause_precision"] = round(statistics.mean(precision), 3) if precision else None
+        results[label] = stats
+        print(f"search [{label}]: {stats}")
+
+    return results
+
+
+def benchmark_ranking(queries=SAMPLE_QUERIES, repeat: int = 20, k: int = 10) -> dict:
+    """
+        BM25 top-k with MaxScore pruning (search_engine.search) vs. scoring every
+        posting of every query term and sorting (exhaustive).
+    """
+    import search_engine
+    from query_processing import process_query
+    from postings import SegmentedIndex
+    from inverted_index import INDEX_DIR
+    from metadata_index import DocMetadata
+
+    index = SegmentedIndex(INDEX_DIR)
+    metadata = DocMetadata()
+    filters = metadata.parse_filters()
+    tokens = {q: process_query(q) for q in queries}
+
+    def exhaustive(q):
+        doc_ids, scores = search_engine.score_documents(index, tokens[q])
+        mask = metadata.filter_mask(doc_ids, filters)
+        return search_engine.top_k(doc_ids[mask], scores[mask], k)
+
+    def maxscore(q):
+        return search_engine.search(index, metadata, tokens[q], filters, k)
+
+    results = {}
+    for label, func in (("exhaustive", exhaustive), ("maxscore", maxscore)):
+        results[label] = _summary(_time_calls(func, queries, repeat))
+        print(f"BM25 top-{k} [{label}]: {results[label]}")
+    return results
+
+
+def benchmark_ann(k: int = 10, n_queries: int = 200, settings=((4, 50), (16, 200), (64, 500))) -> dict:
+    """
+        "More like this" on the IVF-PQ index (ann_index.py) vs. the exact scan over
+        every LSI row, for random speeches as queries.
+
+        For each (n_probe, rerank) setting reports latency and recall@k: the share of
+        the exact top-k that the approximate top-k also returns.
+    """
+    import numpy as np
+    from semantic_search import LSISearcher
+    from ann_index import IVFPQIndex, ann_index_is_stale
+    from metadata_index import DocMetadata
+
+    if ann_index_is_stale():
+        print("The ANN index is missing or older than the LSI vectors (build it with ann_index.build_ann_index).")
+        return {}
+    searcher = LSISearcher()
+    ann = IVFPQIndex()
+    metadata = DocMetadata()
+    filters = metadata.parse_filters()
+    rows = np.random.default_rng(42).choice(len(searcher.doc_ids), size=min(n_queries, len(searcher.doc_ids)),
+                                            replace=False).tolist()
+    queries = {row: np.asarray(searcher.docs[row], dtype=np.float32) for row in rows}
+    exact = {row: {d for d, _ in searcher.search_vector(queries[row], metadata, filters, k, exclude_row=row)}
+             for row in rows}
+
+    results = {"exact": _summary(_time_calls(
+        lambda row: searcher.search_vector(queries[row], metadata, filters, k, exclude_row=row), rows, 1))}
+    print(f"LSI top-{k} [exact]: {results['exact']}")
+    for n_probe, rerank in settings:
+        def approximate(row):
+            return searcher.search_vector(queries[row], metadata, filters, k, exclude_row=row, ann=ann,
+                                          n_probe=n_probe, rerank=rerank)
+
+        stats = _summary(_time_calls(approximate, rows, 1))
+        recall = [len(exact[row] & {d for d, _ in approximate(row)}) / len(exact[row]) for row in rows if exact[row]]
+        stats["recall_at_k"] = round(statistics.mean(recall), 3) if recall else None
+        label = f"n_probe={n_probe}, rerank={rerank}"
+        results[label] = stats
+        print(f"LSI top-{k} [{label}]: {stats}")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_query_processing()
+    benchmark_phrase_search()
+    benchmark_ranking()
+    benchmark_ann()
@@ -0,0 +1,37 @@
+import numpy as np
+
+# Okapi BM25 parameters
+K1 = 1.2    # term-frequency saturation
+B = 0.75    # document-length normalization
+
+BOUND_SLACK = 1e-9  # relative margin added to upper bounds against float rounding
+
+
+def idf(n_docs: int, df: int) -> float:
+    """
+        BM25 inverse document frequency (Lucene variant, never negative):
+            IDF = log(1 + (N - df + 0.5) / (df + 0.5))
+    """
+    return float(np.log1p((n_docs - df + 0.5) / (df + 0.5)))
+
+
+def tf_part(tfs: np.ndarray, doc_lengths: np.ndarray, avgdl: float) -> np.ndarray:
+    """
+        Term-frequency part of BM25 for postings with term frequencies `tfs` in documents
+        of `doc_lengths` tokens:
+            tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / avgdl))
+        The score of a posting is idf * tf_part.
+    """
+    tfs = np.asarray(tfs, dtype=np.float64)
+    norm = K1 * (1 - B + B * np.asarray(doc_lengths, dtype=np.float64) / avgdl)
+    return tfs * (K1 + 1) / (tfs + norm)
+
+
+def scale_bound(bound: float, built_avgdl: float, avgdl: float) -> float:
+    """
+        Upper bound of tf_part under `avgdl` from a bound computed under `built_avgdl`.
+
+        tf_part grows with avgdl, but at most in proportion: for r = built_avgdl / avgdl <= 1
+        every denominator shrinks by a factor >= r, so bounds only need scaling by 1 / r.
+    """
+    return bound * max(1.0, avgdl / built_avgdl) * (1 + BOUND_SLACK) if built_avgdl > 0 else bound
@@ -0,0 +1,333 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, vstack
+
+CORPUS_DIR = "corpus"                    # Columnar, memory-mappable copy of cleaned_data.csv
+PARTIAL_CORPUS_DIR = CORPUS_DIR + ".partial"
+
+# Files inside a corpus directory
+MANIFEST = "manifest.json"   # counts and dtypes; only written once the corpus is complete
+VOCAB = "vocab.txt"          # one stem per line, line number = token id
+LABELS = "labels.json"       # {"member": [...], "party": [...]} code -> name
+COLUMNS = {
+    # name: dtype                 contents (one value per document unless noted)
+    "tokens": np.int32,        # token ids of all documents back to back (one per token)
+    "doc_ends": np.int64,      # end offset of each document in `tokens`
+    "document_id": np.int64,   # document_id of cleaned_data.csv
+    "member": np.int32,        # code into labels["member"], -1 if missing
+    "party": np.int32,         # code into labels["party"], -1 if missing
+    "date": np.int32,          # sitting date as YYYYMMDD, 0 if missing/unparseable
+    "text": np.uint8,          # raw speeches as UTF-8, back to back (one per byte)
+    "text_ends": np.int64,     # end offset of each speech in `text`
+    "span_starts": np.int32,   # per token: byte offset of its source word in the speech, -1 if unknown
+    "span_ends": np.int32,     # per token: byte offset just after that word
+}
+SPAN_COLUMNS = ("span_starts", "span_ends")  # missing in corpora written before token spans were stored
+
+
+def _column_path(path: str, name: str) -> str:
+    return os.path.join(path, name + ".bin")
+
+
+def _date_codes(dates) -> np.ndarray:
+    """Convert dd/mm/yyyy sitting dates to YYYYMMDD integers (0 if unparseable)."""
+    parsed = pd.to_datetime(pd.Series(dates), dayfirst=True, errors="coerce")
+    codes = parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day
+    return codes.fillna(0).astype(np.int32).to_numpy()
+
+
+def _byte_spans(encoded: bytes, spans) -> np.ndarray:
+    """Character (start, end) offsets into a speech -> byte offsets into its UTF-8 encoding."""
+    data = np.frombuffer(encoded, dtype=np.uint8)
+    char_starts = np.append(np.flatnonzero((data & 0xC0) != 0x80), len(data))  # byte offset of every character
+    spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+    return char_starts[np.minimum(spans, len(char_starts) - 1)].astype(np.int32)
+
+
+def _write_atomic(path: str, content: str):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+
+class CorpusWriter:
+    """
+        Appends cleaned documents to a columnar corpus directory.
+
+        Everything is written to PARTIAL_CORPUS_DIR first; close() writes the manifest
+        and moves it to its final place, so an existing corpus is always complete.
+
+        With append=True documents are appended to the existing corpus in place
+        instead. Readers only see the documents counted in the manifest, which
+        close() replaces atomically, so open Corpus objects stay valid.
+
+        Args:
+            path: final corpus directory
+            resume_state: a dict returned by state(); the partial corpus is truncated
+                          back to it instead of being started from scratch
+            append: append to the complete corpus at `path`
+    """
+
+    def __init__(self, path: str = CORPUS_DIR, resume_state: dict = None, append: bool = False):
+        self.path = path
+        self.partial_path = path if append else path + ".partial"
+        self.append = append
+
+        if append:
+            with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+            with open(os.path.join(path, LABELS), encoding="utf-8") as f:
+                labels = json.load(f)
+            resume_state = {"sizes": {name: info["length"] for name, info in manifest["columns"].items()},
+                            "n_terms": manifest["n_terms"],
+                            "n_members": len(labels["member"]), "n_parties": len(labels["party"])}
+            for name in SPAN_COLUMNS:
+                if name not in resume_state["sizes"]:
+                    # older corpus: no spans for the existing tokens
+                    np.full(manifest["n_tokens"], -1, dtype=COLUMNS[name]).tofile(_column_path(path, name))
+                    resume_state["sizes"][name] = manifest["n_tokens"]
+        elif resume_state is None:
+            shutil.rmtree(self.partial_path, ignore_errors=True)
+            os.makedirs(self.partial_path)
+            resume_state = {"sizes": {name: 0 for name in COLUMNS}, "n_terms": 0,
+                            "n_members": 0, "n_parties": 0}
+
+        # Roll every file back to the recorded state
+        for name in COLUMNS:
+            size = resume_state["sizes"][name] * np.dtype(COLUMNS[name]).itemsize
+            with open(_column_path(self.partial_path, name), "ab") as f:
+                f.truncate(size)
+        self.sizes = dict(resume_state["sizes"])
+
+        vocab_file = os.path.join(self.partial_path, VOCAB)
+        self.vocab = []
+        if os.path.isfile(vocab_file):
+            with open(vocab_file, encoding="utf-8") as f:
+                self.vocab = f.read().split("\n")[:resume_state["n_terms"]]
+        _write_atomic(vocab_file, "".join(term + "\n" for term in self.vocab))
+        self.term_ids = {term: i for i, term in enumerate(self.vocab)}
+        self._flushed_terms = len(self.vocab)
+
+        labels_file = os.path.join(self.partial_path, LABELS)
+        labels = {"member": [], "party": []}
+        if os.path.isfile(labels_file):
+            with open(labels_file, encoding="utf-8") as f:
+                labels = json.load(f)
+        self.labels = {"member": labels["member"][:resume_state["n_members"]],
+                       "party": labels["party"][:resume_state["n_parties"]]}
+        self.label_codes = {key: {name: i for i, name in enumerate(names)} for key, names in self.labels.items()}
+
+        self._buffers = {name: [] for name in COLUMNS}
+
+    def _code(self, key: str, name) -> int:
+        if not isinstance(name, str):
+            return -1
+        codes = self.label_codes[key]
+        if name not in codes:
+            codes[name] = len(self.labels[key])
+            self.labels[key].append(name)
+        return codes[name]
+
+    def add_frame(self, df: pd.DataFrame):
+        """
+            Append the documents of a cleaned dataframe (columns of cleaned_data.csv:
+            document_id, cleaned_speech, speech, member_name, political_party, sitting_date).
+            An optional "token_spans" column (data_cleaning.clean_speeches with_spans=True)
+            gives the character offsets of every stem; they are stored as byte offsets.
+        """
+        n_tokens = self.sizes["tokens"] + sum(len(b) for b in self._buffers["tokens"])
+        n_text = self.sizes["text"] + sum(len(b) for b in self._buffers["text"])
+
+        token_ids, doc_ends, text_parts, text_ends = [], [], [], []
+        doc_lengths = []
+        for cleaned in df["cleaned_speech"]:
+            terms = str(cleaned).split()
+            for term in terms:
+                term_id = self.term_ids.get(term)
+                if term_id is None:
+                    term_id = self.term_ids[term] = len(self.vocab)
+                    self.vocab.append(term)
+                token_ids.append(term_id)
+            doc_ends.append(n_tokens + len(token_ids))
+            doc_lengths.append(len(terms))
+        spans_column = df["token_spans"] if "token_spans" in df.columns else [None] * len(df)
+        span_parts = []
+        for speech, spans, length in zip(df["speech"], spans_column, doc_lengths):
+            encoded = str(speech).encode("utf-8")
+            text_parts.append(encoded)
+            n_text += len(encoded)
+            text_ends.append(n_text)
+            if spans is not None and len(spans) == length:
+                span_parts.append(_byte_spans(encoded, spans))
+            else:
+                span_parts.append(np.full((length, 2), -1, dtype=np.int32))
+        spans = np.concatenate(span_parts) if span_parts else np.zeros((0, 2), dtype=np.int32)
+
+        self._buffers["tokens"].append(np.asarray(token_ids, dtype=np.int32))
+        self._buffers["doc_ends"].append(np.asarray(doc_ends, dtype=np.int64))
+        self._buffers["document_id"].append(df["document_id"].to_numpy(dtype=np.int64))
+        self._buffers["member"].append(np.asarray([self._code("member", m) for m in df["member_name"]], dtype=np.int32))
+        self._buffers["party"].append(np.asarray([self._code("party", p) for p in df["political_party"]], dtype=np.int32))
+        self._buffers["date"].append(_date_codes(df["sitting_date"]))
+        self._buffers["text"].append(np.frombuffer(b"".join(text_parts), dtype=np.uint8))
+        self._buffers["text_ends"].append(np.asarray(text_ends, dtype=np.int64))
+        self._buffers["span_starts"].append(spans[:, 0])
+        self._buffers["span_ends"].append(spans[:, 1])
+
+    def flush(self):
+        """Write buffered documents, new vocabulary terms and labels to disk."""
+        for name, buffer in self._buffers.items():
+            with open(_column_path(self.partial_path, name), "ab") as f:
+                for array in buffer:
+                    array.astype(COLUMNS[name], copy=False).tofile(f)
+                    self.sizes[name] += len(array)
+            buffer.clear()
+
+        with open(os.path.join(self.partial_path, VOCAB), "a", encoding="utf-8") as f:
+            f.write("".join(term + "\n" for term in self.vocab[self._flushed_terms:]))
+        self._flushed_terms = len(self.vocab)
+
+        _write_atomic(os.path.join(self.partial_path, LABELS), json.dumps(self.labels, ensure_ascii=False))
+
+    def state(self) -> dict:
+        """Flush and return the sizes needed to resume this writer (see resume_state)."""
+        self.flush()
+        return {"sizes": dict(self.sizes), "n_terms": len(self.vocab),
+                "n_members": len(self.labels["member"]), "n_parties": len(self.labels["party"])}
+
+    def close(self):
+        """Flush, write the manifest and move the corpus into place (in append mode: only swap the manifest)."""
+        self.flush()
+        manifest = {
+            "n_docs": self.sizes["document_id"],
+            "n_tokens": self.sizes["tokens"],
+            "n_terms": len(self.vocab),
+            "columns": {name: {"dtype": np.dtype(dtype).name, "length": self.sizes[name]}
+                        for name, dtype in COLUMNS.items()},
+        }
+        _write_atomic(os.path.join(self.partial_path, MANIFEST), json.dumps(manifest, indent=2))
+
+        if not self.append:
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.replace(self.partial_path, self.path)
+        print(f"Saved columnar corpus to: {self.path} ({manifest['n_docs']} docs, "
+              f"{manifest['n_tokens']} tokens, {manifest['n_terms']} terms)")
+
+
+def corpus_exists(path: str = CORPUS_DIR) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+class Corpus:
+    """
+        Read-only, memory-mapped view of a corpus written by CorpusWriter.
+
+        Attributes (numpy memmaps, one entry per document unless noted):
+            tokens       int32 token ids of all documents (index with offsets)
+            offsets      int64, document i = tokens[offsets[i]:offsets[i + 1]]
+            document_id  int64
+            member/party int32 codes into member_names / party_names (-1 = missing)
+            date         int32 YYYYMMDD (0 = missing)
+            vocab        list[str], token id -> stem
+            span_starts / span_ends
+                         int32 per token, byte range of its word in the speech
+                         (-1 = unknown; None for corpora written without spans)
+    """
+
+    def __init__(self, path: str = CORPUS_DIR):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        for name, info in self.manifest["columns"].items():
+            setattr(self, name, self._open_column(name, info))
+
+        with open(os.path.join(path, VOCAB), encoding="utf-8") as f:
+            self.vocab = f.read().split("\n")[:self.manifest["n_terms"]]
+        with open(os.path.join(path, LABELS), encoding="utf-8") as f:
+            labels = json.load(f)
+        self.member_names = labels["member"]
+        self.party_names = labels["party"]
+
+        for name in SPAN_COLUMNS:
+            if name not in self.manifest["columns"]:
+                setattr(self, name, None)
+
+        self.offsets = np.concatenate(([0], self.doc_ends)).astype(np.int64)
+        self.text_offsets = np.concatenate(([0], self.text_ends)).astype(np.int64)
+        self._years = None
+        self._term_ids = None
+
+    def _open_column(self, name: str, info: dict):
+        dtype = np.dtype(info["dtype"])
+        if info["length"] == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(_column_path(self.path, name), dtype=dtype, mode="r", shape=(info["length"],))
+
+    def __len__(self) -> int:
+        return self.manifest["n_docs"]
+
+    @property
+    def doc_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def years(self) -> np.ndarray:
+        """Sitting year of every document (0 = missing), computed once."""
+        if self._years is None:
+            self._years = (np.asarray(self.date) // 10000).astype(np.int32)
+        return self._years
+
+    def doc_tokens(self, i: int) -> np.ndarray:
+        """Token ids of the i-th document (row position, not document_id)."""
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def term_ids(self, terms) -> np.ndarray:
+        """Vocabulary ids of the given stems (unknown stems are skipped)."""
+        if self._term_ids is None:
+            self._term_ids = {term: i for i, term in enumerate(self.vocab)}
+        return np.asarray([self._term_ids[t] for t in terms if t in self._term_ids], dtype=np.int32)
+
+    def doc_terms(self, i: int) -> list:
+        return [self.vocab[t] for t in self.doc_tokens(i)]
+
+    def speech(self, i: int) -> str:
+        """Raw speech text of the i-th document."""
+        return bytes(self.text[self.text_offsets[i]:self.text_offsets[i + 1]]).decode("utf-8")
+
+    def speech_bytes(self, i: int, start: int, end: int) -> bytes:
+        """Bytes [start, end) of the i-th speech's UTF-8 text (only that range is read)."""
+        base = int(self.text_offsets[i])
+        end = min(base + end, int(self.text_offsets[i + 1]))
+        return bytes(self.text[base + max(start, 0):end])
+
+    def doc_spans(self, i: int) -> np.ndarray:
+        """[n_tokens, 2] byte (start, end) of every token of the i-th document in its speech, None without spans."""
+        if self.span_starts is None:
+            return None
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        return np.stack([self.span_starts[lo:hi], self.span_ends[lo:hi]], axis=1)
+
+    def term_frequency_matrix(self, block_docs: int = 100000) -> csr_matrix:
+        """
+            Build the documents × vocabulary term-frequency matrix straight from the
+            token-id array (no string splitting). Built in blocks of `block_docs`
+            documents to bound the temporary memory.
+        """
+        n_terms = len(self.vocab)
+        blocks = []
+        for start in range(0, len(self), block_docs):
+            end = min(start + block_docs, len(self))
+            lo, hi = self.offsets[start], self.offsets[end]
+            indices = np.array(self.tokens[lo:hi], dtype=np.int32)
+            indptr = self.offsets[start:end + 1] - lo
+            block = csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                               shape=(end - start, n_terms))
+            block.sum_duplicates()
+            blocks.append(block)
+        if not blocks:
+            return csr_matrix((0, n_terms), dtype=np.int32)
+        return vstack(blocks, format="csr")
@@ -1,5 +1,6 @@
 import pandas as pd
 import sqlite3
+from corpus import Corpus
 
 DB_NAME = "parliament.db"
 CSV_FILE = "cleaned_data.csv"
@@ -68,6 +69,19 @@ def create_schema(conn):
     );
     """)
     conn.commit()
+    create_indexes(conn)
+
+
+def create_indexes(conn):
+    """
+        Secondary indexes used by the search path (safe to run on an existing DB).
+          - speeches.doc_id: search results are fetched by doc_id
+          - speeches(year, id): year-range filters of the keyword-table search read
+            one contiguous range per year instead of scanning every speech
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_speeches_doc_id ON speeches(doc_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_speeches_year ON speeches(year, id)")
+    conn.commit()
 
 
 def insert_or_get_id(cursor, table, field, value):
@@ -127,6 +141,48 @@ def populate_data(conn, csv_path):
     print("Data insertion successful")
 
 
+def populate_data_from_corpus(conn, corpus: Corpus, start: int = 0):
+    """
+        Populate the database from the columnar corpus (see corpus.py) instead of the CSV.
+        Same rows as populate_data(): documents with a missing member, party or
+        sitting date are skipped. Members/parties are inserted once per distinct name
+        and cleaned_speech is rebuilt by joining the vocabulary terms.
+
+        `start` skips the first documents of the corpus (used by incremental.py to
+        insert only newly appended speeches).
+    """
+    cursor = conn.cursor()
+    member_ids = [insert_or_get_id(cursor, "members", "full_name", name) for name in corpus.member_names]
+    party_ids = [insert_or_get_id(cursor, "parties", "name", name) for name in corpus.party_names]
+    vocab = corpus.vocab
+
+    def rows():
+        for i in range(start, len(corpus)):
+            member, party, date = int(corpus.member[i]), int(corpus.party[i]), int(corpus.date[i])
+            if member < 0 or party < 0 or date == 0:
+                continue
+            cleaned = " ".join(vocab[t] for t in corpus.doc_tokens(i).tolist())
+            if not cleaned:
+                continue
+            yield (
+                int(corpus.document_id[i]),
+                member_ids[member],
+                party_ids[party],
+                f"{date // 10000:04d}-{date // 100 % 100:02d}-{date % 100:02d}",
+                date // 10000,
+                corpus.speech(i),
+                cleaned
+            )
+
+    cursor.executemany("""
+        INSERT INTO speeches (doc_id, member_id, party_id, sitting_date, year, speech, cleaned_speech)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows())
+
+    conn.commit()
+    print("Data insertion successful")
+
+
 def is_part2_already_computed():
     """
         Check whether Part2 preprocessing (keywords extraction) has already been computed.
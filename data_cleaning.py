@@ -1,9 +1,16 @@
+import numpy as np
 import pandas as pd
 import spacy
 import re
+import os
+import json
+import time
+from multiprocessing import Pool
 from spacy.lang.el.stop_words import STOP_WORDS
 from greek_stemmer import GreekStemmer
 import unicodedata
+from stem_cache import StemCache, STEM_CACHE_DB, format_stats, merge_stats
+from corpus import CorpusWriter, CORPUS_DIR, PARTIAL_CORPUS_DIR
 
 
 stemmer = GreekStemmer()
@@ -11,10 +18,28 @@ stemmer = GreekStemmer()
 FILEPATH = "Greek_Parliament_Proceedings_1989_2020.csv"
 OUTPUT_FILE = "cleaned_data.csv"
 
-try:
-    nlp = spacy.load("el_core_news_sm")
-except:
-    raise RuntimeError("Download: python -m spacy el_core_news_sm")
+# Parallel cleaning settings
+NUM_WORKERS = 1      # worker processes used by process_dataset
+BATCH_SIZE = 64      # speeches per nlp.pipe batch
+SHARD_SIZE = 2000    # speeches per shard handed to a worker
+
+# Streaming ingest settings
+CHUNK_SIZE = 20000                                 # raw CSV rows read per chunk
+PARTIAL_OUTPUT_FILE = OUTPUT_FILE + ".partial"     # output while the ingest is running
+CHECKPOINT_FILE = "cleaned_data.checkpoint.json"   # progress of the streaming ingest
+
+_nlp = None  # el_core_news_sm, loaded on first use so importing this module stays cheap
+
+
+def get_nlp():
+    """Return the el_core_news_sm pipeline, loading it on first use."""
+    global _nlp
+    if _nlp is None:
+        try:
+            _nlp = spacy.load("el_core_news_sm")
+        except OSError:
+            raise RuntimeError("Download: python -m spacy el_core_news_sm")
+    return _nlp
 
 
 def remove_unwanted_pattern(word: str) -> str:
@@ -87,33 +112,56 @@ def stem_word(word: str, pos: str) -> str:
         return ""
 
 
-def clean_text(text: str, dictionary: dict) -> str:
+def clean_doc(doc, dictionary: dict, spans: list = None) -> list:
     """
-    Example:
-        clean_text("Ευχαριστώ κύριε Πρόεδρε!", {}) -> "ευχαριστ προεδρ"
+        Turn a spaCy Doc into its list of normalized stems.
+        `dictionary` caches raw token -> stem so repeated tokens skip stemming
+        (a plain dict or a StemCache). Only context-free results are cached (the
+        GreekStemmer stem, or "" for a dropped token); the spaCy lemma fallback is
+        taken from each occurrence, so cached and uncached runs give the same stems.
+        If `spans` is a list, the (start, end) character offsets of the source token
+        of every kept stem are appended to it (aligned with the returned stems).
     """
-    # Run the text through the spaCy NLP pipeline (tokenization, POS tagging, etc.)
-    doc = nlp(text.replace('\xa0', ' '))
     result = []
 
     for token in doc:
         raw = token.text
-        if raw in dictionary:
-            result.append(dictionary[raw])
+        cached = dictionary.get(raw)
+        if cached is not None:
+            if cached:  # "" marks a token that is dropped (stopword, symbol, ...)
+                result.append(cached)
+                if spans is not None:
+                    spans.append((token.idx, token.idx + len(raw)))
             continue
 
         cleaned = remove_unwanted_pattern(raw)
         if cleaned == "":
+            dictionary[raw] = ""
             continue
 
         stemmed = stem_word(cleaned, token.pos_)
-        if stemmed == "":
+        if stemmed:
+            dictionary[raw] = stemmed  # depends on the token text only
+        else:
+            # the lemma depends on the token's context: used here, never cached
             stemmed = token.lemma_.lower()
 
-        dictionary[raw] = stemmed
-        result.append(stemmed)
+        if stemmed:
+            result.append(stemmed)
+            if spans is not None:
+                spans.append((token.idx, token.idx + len(raw)))
+
+    return result
 
-    cleaned_text = " ".join(result)
+
+def clean_text(text: str, dictionary: dict) -> str:
+    """
+    Example:
+        clean_text("Ευχαριστώ κύριε Πρόεδρε!", {}) -> "ευχαριστ προεδρ"
+    """
+    # Run the text through the spaCy NLP pipeline (tokenization, POS tagging, etc.)
+    doc = get_nlp()(text.replace('\xa0', ' '))
+    cleaned_text = " ".join(clean_doc(doc, dictionary))
 
     # for testing
     if cleaned_text.strip():
@@ -122,26 +170,245 @@ def clean_text(text: str, dictionary: dict) -> str:
     return cleaned_text
 
 
-def process_dataset():
+def clean_texts(texts, dictionary: dict, batch_size: int = BATCH_SIZE, with_spans: bool = False):
+    """
+        Batched version of clean_text: streams the speeches through nlp.pipe
+        and yields the cleaned strings in input order.
+        With with_spans=True it yields (cleaned string, int32 array [n_stems, 2] of
+        character offsets of every stem's token in the speech).
+    """
+    docs = get_nlp().pipe((text.replace('\xa0', ' ') for text in texts), batch_size=batch_size)
+    for doc in docs:
+        if not with_spans:
+            yield " ".join(clean_doc(doc, dictionary))
+            continue
+        spans = []
+        cleaned = " ".join(clean_doc(doc, dictionary, spans))
+        yield cleaned, np.asarray(spans, dtype=np.int32).reshape(-1, 2)
+
+
+_stem_cache = None  # per-process StemCache, opened on first use
+
+
+def get_stem_cache() -> StemCache:
+    """Return this process' persistent stem cache (STEM_CACHE_DB)."""
+    global _stem_cache
+    if _stem_cache is None:
+        _stem_cache = StemCache(STEM_CACHE_DB)
+    return _stem_cache
+
+
+def _clean_shard(args) -> tuple:
+    """
+        Worker entry point: clean one shard of speeches through the persistent stem cache.
+        Returns (cleaned speeches, cache stats for this shard).
+    """
+    texts, batch_size, with_spans = args
+    cache = get_stem_cache()
+    cache.reset_stats()
+    cleaned = list(clean_texts(texts, cache, batch_size, with_spans))
+    cache.flush()
+    return cleaned, cache.stats()
+
+
+def clean_speeches(speeches: list, workers: int = NUM_WORKERS, batch_size: int = BATCH_SIZE,
+                   shard_size: int = SHARD_SIZE, with_spans: bool = False, pool=None):
+    """
+        Clean a list of speeches, optionally across a pool of worker processes.
+
+        Args:
+            speeches: raw speech texts
+            workers: number of worker processes (1 = clean in this process)
+            batch_size: speeches per nlp.pipe batch
+            shard_size: contiguous speeches handed to a worker at a time
+            with_spans: also return the token character offsets of every stem
+            pool: an open multiprocessing Pool to clean with (`workers` is then only
+                  reported); without it a pool is created for this call if workers > 1
+
+        Returns:
+            list[str]: cleaned speeches, aligned with `speeches`
+            with_spans=True: (cleaned speeches, spans), spans[i] an int32 array
+            [n_stems, 2] of (start, end) offsets into speeches[i], aligned with
+            cleaned[i].split() (stored by CorpusWriter for snippets)
+
+        Notes:
+            - Shards are contiguous slices and results are collected in shard
+              order, so the output (and document_id order) never depends on
+              the number of workers or on scheduling.
+            - Stems are looked up in / added to the persistent stem cache
+              (STEM_CACHE_DB), so tokens seen in earlier runs skip GreekStemmer.
+              The cache only holds values that depend on the token text alone
+              (see clean_doc), so its contents (earlier runs, which worker wrote
+              first) never change the output.
+            - Prints a throughput report in speeches/sec and the cache hit rate.
+    """
+    start = time.perf_counter()
+    shards = [(speeches[i:i + shard_size], batch_size, with_spans) for i in range(0, len(speeches), shard_size)]
+
+    cleaned = []
+    shard_stats = []
+    if pool is not None:
+        for result, stats in pool.imap(_clean_shard, shards):
+            cleaned.extend(result)
+            shard_stats.append(stats)
+    elif workers <= 1:
+        for result, stats in map(_clean_shard, shards):
+            cleaned.extend(result)
+            shard_stats.append(stats)
+    else:
+        with Pool(processes=workers) as pool:
+            for result, stats in pool.imap(_clean_shard, shards):
+                cleaned.extend(result)
+                shard_stats.append(stats)
+
+    elapsed = time.perf_counter() - start
+    rate = len(speeches) / elapsed if elapsed > 0 else 0.0
+    print(f"Cleaned {len(speeches)} speeches in {elapsed:.1f}s "
+          f"({rate:.1f} speeches/sec, {workers} worker(s)); {format_stats(merge_stats(shard_stats))}")
+
+    if with_spans:
+        return [text for text, _ in cleaned], [spans for _, spans in cleaned]
+    return cleaned
+
+
+def process_dataset(workers: int = NUM_WORKERS, batch_size: int = BATCH_SIZE):
+    """
+        Clean the raw proceedings CSV and save it to OUTPUT_FILE and to the
+        columnar corpus in CORPUS_DIR.
+
+        Args:
+            workers: number of worker processes used for cleaning
+            batch_size: speeches per nlp.pipe batch
+    """
     df = pd.read_csv(FILEPATH)
     df = df.dropna(subset=["speech"])  # delete empty speeches
     df = df.reset_index(drop=True)
 
     df["document_id"] = df.index  # need for tf-idf
 
-    dictionary = {}  # dictionary for stemming
-    cleaned_speeches = []
-
-    for speech in df["speech"]:
-        cleaned = clean_text(speech, dictionary)
-        cleaned_speeches.append(cleaned)
-
-    df["cleaned_speech"] = cleaned_speeches
+    df["cleaned_speech"], df["token_spans"] = clean_speeches(df["speech"].tolist(), workers=workers,
+                                                             batch_size=batch_size, with_spans=True)
     df = df[df["cleaned_speech"].str.strip() != ""]
 
     df = df.reset_index(drop=True)
     df["document_id"] = df.index
 
-    df.to_csv(OUTPUT_FILE, index=False)
+    df.drop(columns=["token_spans"]).to_csv(OUTPUT_FILE, index=False)
+
+    # Columnar copy (token ids + metadata) for the later pipeline stages
+    corpus = CorpusWriter(CORPUS_DIR)
+    corpus.add_frame(df)
+    corpus.close()
+
+    print(f"Saved cleaned dataset to: {OUTPUT_FILE}")
+
+
+def _load_checkpoint():
+    """Return the saved streaming-ingest progress, or None if there is nothing to resume."""
+    if not os.path.isfile(CHECKPOINT_FILE) or not os.path.isfile(PARTIAL_OUTPUT_FILE):
+        return None
+    with open(CHECKPOINT_FILE, encoding="utf-8") as f:
+        state = json.load(f)
+    if "corpus" not in state or not os.path.isdir(PARTIAL_CORPUS_DIR):
+        return None
+    return state
+
+
+def _save_checkpoint(state: dict):
+    """Atomically write the streaming-ingest progress (write to temp file, then rename)."""
+    tmp_path = CHECKPOINT_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, CHECKPOINT_FILE)
+
+
+def process_dataset_streaming(chunk_size: int = CHUNK_SIZE, workers: int = NUM_WORKERS,
+                              batch_size: int = BATCH_SIZE, resume: bool = True):
+    """
+        Chunked, resumable version of process_dataset.
+
+        Reads FILEPATH in chunks of `chunk_size` rows, cleans each chunk and appends it
+        to PARTIAL_OUTPUT_FILE and to the columnar corpus, then records a checkpoint.
+        Only one chunk is held in memory at a time. When every chunk is done the
+        partial outputs are moved to OUTPUT_FILE / CORPUS_DIR, so those only ever
+        exist complete.
+
+        Args:
+            chunk_size: raw CSV rows per chunk
+            workers: number of worker processes used for cleaning
+            batch_size: speeches per nlp.pipe batch
+            resume: continue after the last finished chunk if a checkpoint exists
+
+        Notes:
+            - The output is the same as process_dataset(): empty speeches are dropped
+              and document_id runs 0..N-1 over the kept rows.
+            - On resume the partial outputs are truncated to the sizes recorded in
+              the checkpoint, so a chunk interrupted mid-write is redone cleanly.
+            - Finished chunks are still parsed on resume (CSV rows can span lines),
+              but they are not cleaned again.
+            - One worker pool serves every chunk, so each worker loads spaCy and opens
+              the stem cache once per run, not once per chunk.
+    """
+    state = _load_checkpoint() if resume else None
+    if state is None:
+        state = {"chunks_done": 0, "rows_written": 0, "output_bytes": 0}
+        open(PARTIAL_OUTPUT_FILE, "w").close()
+        corpus = CorpusWriter(CORPUS_DIR)
+    else:
+        print(f"Resuming after chunk {state['chunks_done']} ({state['rows_written']} speeches written)")
+        with open(PARTIAL_OUTPUT_FILE, "r+b") as f:
+            f.truncate(state["output_bytes"])
+        corpus = CorpusWriter(CORPUS_DIR, resume_state=state["corpus"])
+
+    try:
+        columns = pd.read_csv(FILEPATH, nrows=0).columns.tolist()
+        chunks = pd.read_csv(FILEPATH, chunksize=chunk_size)
+    except pd.errors.EmptyDataError:  # no header either
+        columns, chunks = ["speech"], []
+
+    pool = None  # created with the first chunk that needs cleaning, shared by the rest
+    try:
+        for chunk_no, chunk in enumerate(chunks):
+            if chunk_no < state["chunks_done"]:
+                continue
+            if pool is None and workers > 1:
+                pool = Pool(processes=workers)
+
+            chunk = chunk.dropna(subset=["speech"])  # delete empty speeches
+            chunk = chunk.reset_index(drop=True)
+            chunk["document_id"] = chunk.index
+
+            chunk["cleaned_speech"], chunk["token_spans"] = clean_speeches(
+                chunk["speech"].tolist(), workers=workers, batch_size=batch_size, with_spans=True, pool=pool)
+            chunk = chunk[chunk["cleaned_speech"].astype(str).str.strip() != ""]
+
+            chunk = chunk.reset_index(drop=True)
+            chunk["document_id"] = chunk.index + state["rows_written"]
+
+            chunk.drop(columns=["token_spans"]).to_csv(PARTIAL_OUTPUT_FILE, mode="a",
+                                                       header=(state["output_bytes"] == 0), index=False)
+            corpus.add_frame(chunk)
+
+            state = {
+                "chunks_done": chunk_no + 1,
+                "rows_written": state["rows_written"] + len(chunk),
+                "output_bytes": os.path.getsize(PARTIAL_OUTPUT_FILE),
+                "corpus": corpus.state()
+            }
+            _save_checkpoint(state)
+            print(f"Chunk {chunk_no} done: {state['rows_written']} speeches written")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    corpus.close()
+    if not os.path.isfile(PARTIAL_OUTPUT_FILE) or os.path.getsize(PARTIAL_OUTPUT_FILE) == 0:
+        # nothing was written (empty CSV or only empty speeches): header only
+        header = [c for c in columns if c != "document_id"] + ["document_id", "cleaned_speech"]
+        pd.DataFrame(columns=header).to_csv(PARTIAL_OUTPUT_FILE, index=False)
+    os.replace(PARTIAL_OUTPUT_FILE, OUTPUT_FILE)
+    if os.path.isfile(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
 
     print(f"Saved cleaned dataset to: {OUTPUT_FILE}")
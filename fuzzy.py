@@ -0,0 +1,147 @@
+import numpy as np
+
+NGRAM = 3              # character n-grams of the padded stem ("^" + stem + "$")
+MIN_FUZZY_LENGTH = 3   # shorter tokens are never corrected
+MAX_CANDIDATES = 256   # stems with the most shared n-grams that get an exact edit distance
+MAX_SUGGESTIONS = 3    # suggestions returned per unknown token
+
+
+def _ngrams(word: str) -> set:
+    padded = "^" + word + "$"
+    return {padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))}
+
+
+def max_edits(word: str) -> int:
+    """Edit budget of a token: 1 for short stems (up to 5 characters), 2 otherwise."""
+    return 1 if len(word) <= 5 else 2
+
+
+def edit_distances(word: str, candidates: list) -> np.ndarray:
+    """
+        Optimal string alignment distance (Levenshtein plus adjacent transpositions)
+        from `word` to every candidate.
+
+        The DP runs one row per character of `word`, vectorized over all candidates
+        and columns: deletions, substitutions and transpositions come from the
+        previous rows, and insertions along the row are a running minimum,
+            D[i, j] = j + min_{k <= j} (D'[i, k] - k)
+        (np.minimum.accumulate), so a row is a handful of numpy operations.
+    """
+    if not candidates:
+        return np.zeros(0, dtype=np.int64)
+    lengths = np.fromiter(map(len, candidates), dtype=np.int64, count=len(candidates))
+    width = int(lengths.max())
+    # UTF-32 code points, padded with 0 (never equal to a character of `word`)
+    chars = np.frombuffer("".join(c.ljust(width, "\0") for c in candidates).encode("utf-32-le"),
+                          dtype=np.uint32).reshape(len(candidates), width)
+    target = np.frombuffer(word.encode("utf-32-le"), dtype=np.uint32)
+    columns = np.arange(width + 1)
+
+    previous = np.tile(columns, (len(candidates), 1))
+    before_previous = None
+    for i in range(1, len(target) + 1):
+        current = np.empty_like(previous)
+        current[:, 0] = i
+        cost = (chars != target[i - 1]).astype(np.int64)
+        current[:, 1:] = np.minimum(previous[:, 1:] + 1, previous[:, :-1] + cost)
+        if i > 1 and width > 1:
+            swap = (chars[:, 1:] == target[i - 2]) & (chars[:, :-1] == target[i - 1])
+            current[:, 2:] = np.where(swap, np.minimum(current[:, 2:], before_previous[:, :-2] + 1), current[:, 2:])
+        current = np.minimum.accumulate(current - columns, axis=1) + columns
+        before_previous, previous = previous, current
+    return previous[np.arange(len(candidates)), lengths]
+
+
+class StemMatcher:
+    """
+        Typo-tolerant lookup of query stems in the index vocabulary.
+
+        A character n-gram index (n-gram -> ids of the stems containing it) narrows
+        the vocabulary to the MAX_CANDIDATES stems sharing the most n-grams with the
+        token; their exact edit distances are then computed in one vectorized pass
+        (edit_distances). Suggestions are ranked by distance, then document frequency.
+
+            matcher.suggest("δημοσιοτ")  -> [{"term": "δημοσι", "distance": 2, "df": 41234}, ...]
+
+        Attributes:
+            terms: sorted stems
+            df:    int64 [terms], document frequency of each stem
+    """
+
+    def __init__(self, terms: list, df: np.ndarray):
+        self.terms = list(terms)
+        self.df = np.asarray(df, dtype=np.int64)
+        self.lengths = np.fromiter(map(len, self.terms), dtype=np.int64, count=len(self.terms))
+        self._by_length = np.argsort(self.lengths, kind="stable")  # term ids, shortest stems first
+        self._sorted_lengths = self.lengths[self._by_length]
+        postings = {}
+        for term_id, term in enumerate(self.terms):
+            for gram in _ngrams(term):
+                postings.setdefault(gram, []).append(term_id)
+        self.grams = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    @classmethod
+    def from_index(cls, index) -> "StemMatcher":
+        """Vocabulary and summed document frequencies of an index (segmented or year-sharded)."""
+        leaves, stack = [], [index]
+        while stack:
+            node = stack.pop()
+            if hasattr(node, "shards"):
+                stack.extend(node.shards.values())
+            elif hasattr(node, "segments"):
+                stack.extend(node.segments)
+            else:
+                leaves.append(node)
+        if not leaves:
+            return cls([], np.zeros(0, dtype=np.int64))
+        terms = np.asarray([term for leaf in leaves for term in leaf], dtype=object)
+        df = np.concatenate([np.asarray(leaf.df, dtype=np.int64) for leaf in leaves])
+        unique, inverse = np.unique(terms, return_inverse=True)
+        return cls(unique.tolist(), np.bincount(inverse, weights=df, minlength=len(unique)).astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def suggest(self, token: str, n: int = MAX_SUGGESTIONS, edits: int = None) -> list:
+        """
+            Nearest stems of an unknown token.
+
+            Args:
+                token: a query stem (process_query output)
+                n: suggestions returned
+                edits: edit budget, max_edits(token) if None
+
+            Returns:
+                [{"term", "distance", "df"}, ...], closest first (more frequent first on
+                equal distance); empty for tokens shorter than MIN_FUZZY_LENGTH.
+        """
+        if len(token) < MIN_FUZZY_LENGTH or not self.terms:
+            return []
+        edits = max_edits(token) if edits is None else edits
+        grams = _ngrams(token)
+        lists = [self.grams[gram] for gram in grams if gram in self.grams]
+        ids, overlap = np.unique(np.concatenate(lists or [np.zeros(0, dtype=np.int32)]), return_counts=True)
+        # count filter: one edit (a transposition included) changes at most NGRAM + 1 n-grams
+        min_overlap = len(grams) - (NGRAM + 1) * edits
+        if min_overlap <= 0:
+            # the budget can cover every n-gram of a short token: stems sharing none of
+            # them are candidates too, so start from all stems of a close length
+            counts = np.zeros(len(self.terms), dtype=np.int64)
+            counts[ids] = overlap
+            lo, hi = np.searchsorted(self._sorted_lengths, [len(token) - edits, len(token) + edits + 1])
+            ids = self._by_length[lo:hi]
+            overlap = counts[ids]
+        keep = (overlap >= min_overlap) & (np.abs(self.lengths[ids] - len(token)) <= edits)
+        ids, overlap = ids[keep], overlap[keep]
+        if len(ids) > MAX_CANDIDATES:
+            ids = ids[np.argpartition(-overlap, MAX_CANDIDATES - 1)[:MAX_CANDIDATES]]
+
+        distances = edit_distances(token, [self.terms[i] for i in ids.tolist()])
+        close = distances <= edits
+        ids, distances = ids[close], distances[close]
+        if not len(ids):
+            return []
+        names = np.asarray([self.terms[i] for i in ids.tolist()])
+        order = np.lexsort((names, -self.df[ids], distances))[:n]
+        return [{"term": self.terms[ids[i]], "distance": int(distances[i]), "df": int(self.df[ids[i]])}
+                for i in order]
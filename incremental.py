@@ -0,0 +1,86 @@
+import os
+import sys
+import sqlite3
+import threading
+import pandas as pd
+from data_cleaning import clean_speeches, OUTPUT_FILE, NUM_WORKERS
+from corpus import Corpus, CorpusWriter, CORPUS_DIR
+from inverted_index import add_segment, merge_segments, update_sharded_index, INDEX_DIR, SHARDS_DIR
+from postings import sharded_index_exists
+from create_database import populate_data_from_corpus, DB_NAME
+
+
+def append_speeches(csv_path: str, workers: int = NUM_WORKERS, background_merge: bool = True):
+    """
+        Add new speeches (e.g. a new sitting) without rebuilding the existing artifacts.
+
+        Steps:
+            1) Clean the new speeches (same pipeline as data_cleaning.process_dataset).
+            2) Give them document_ids continuing after the existing corpus.
+            3) Append them to the columnar corpus, parliament.db and cleaned_data.csv.
+            4) Index only the new documents as a new index segment (and a new
+               segment in each year shard they fall into).
+            5) Merge same-size segments (inverted_index.merge_segments), in a
+               background thread so new speeches are searchable right away.
+
+        Args:
+            csv_path: CSV with the columns of the raw proceedings file
+            workers: processes used for cleaning
+            background_merge: merge segments in a background thread (False = merge now)
+
+        Returns:
+            the merge thread, or None
+
+        Notes:
+            - The running app reopens the index when the manifest changes.
+            - TF-IDF keyword tables, LSI and clustering artifacts are not updated;
+              rerun their build steps to include the new speeches.
+    """
+    df = pd.read_csv(csv_path)
+    df = df.dropna(subset=["speech"])
+    df = df.reset_index(drop=True)
+
+    df["cleaned_speech"], df["token_spans"] = clean_speeches(df["speech"].tolist(), workers=workers, with_spans=True)
+    df = df[df["cleaned_speech"].str.strip() != ""]
+    df = df.reset_index(drop=True)
+    if df.empty:
+        print("No speeches to add.")
+        return None
+
+    # document_id continues after the existing documents
+    start = len(Corpus(CORPUS_DIR))
+    df["document_id"] = df.index + start
+
+    writer = CorpusWriter(CORPUS_DIR, append=True)
+    writer.add_frame(df)
+    writer.close()
+
+    conn = sqlite3.connect(DB_NAME)
+    populate_data_from_corpus(conn, Corpus(CORPUS_DIR), start=start)
+    conn.close()
+
+    if os.path.isfile(OUTPUT_FILE):
+        columns = pd.read_csv(OUTPUT_FILE, nrows=0).columns
+        df.reindex(columns=columns).to_csv(OUTPUT_FILE, mode="a", header=False, index=False)
+
+    add_segment(INDEX_DIR, CORPUS_DIR)
+    updated_shards = update_sharded_index(SHARDS_DIR, CORPUS_DIR) if sharded_index_exists(SHARDS_DIR) else []
+    print(f"Added {len(df)} speeches (document_id {start}..{start + len(df) - 1}).")
+
+    def merge_all():
+        for index_dir in [INDEX_DIR] + updated_shards:
+            merge_segments(index_dir, CORPUS_DIR)
+
+    if not background_merge:
+        merge_all()
+        return None
+    thread = threading.Thread(target=merge_all, daemon=False)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python incremental.py <new_speeches.csv>")
+        sys.exit(1)
+    append_speeches(sys.argv[1])
@@ -1,8 +1,26 @@
+import os
+import json
+import math
+import shutil
+import threading
+import numpy as np
 import pandas as pd
 import pickle
+from multiprocessing import Pool
+from corpus import Corpus, corpus_exists, CORPUS_DIR
+from postings import PostingsWriter, InvertedIndex, read_manifest, write_manifest, gather_groups, SHARDS_FILE
+
+INDEX_DIR = "index"              # Compressed on-disk inverted index (see build_inverted_index)
+
+MEMORY_BUDGET_MB = 512           # Memory allowed for one in-memory block / merge window
+BYTES_PER_POSTING = 32           # Rough peak bytes per token while a block is inverted
+NUM_WORKERS = 1                  # Processes building runs in parallel
+STORE_POSITIONS = True           # Also store token positions (phrase and NEAR/k queries)
 
 
 def get_number_of_docs():
+    if corpus_exists():
+        return len(Corpus())
     df = pd.read_csv("cleaned_data.csv")
     return len(df)
 
@@ -11,13 +29,23 @@ def create_inverse_index_catalogue():
     """
     The inverse index catalogue maps words to a list of documents containing the word and their term frequency.
     word → {document_id: term frequency,...}
+
+    When the columnar corpus exists the index is built with build_inverted_index()
+    as the compressed, memory-mapped INDEX_DIR (read with postings.SegmentedIndex)
+    instead of a pickle; otherwise cleaned_data.csv is read into inverse_index.pkl.
+    With STORE_POSITIONS the index also keeps token positions, used by phrase
+    ("...") and NEAR/k queries.
     """
+    if corpus_exists():
+        build_inverted_index()
+        return
+
     df = pd.read_csv("cleaned_data.csv")
     inverse_index = {}
 
-    for idx, row in df.iterrows():
-        doc_id = row.get("document_id")
-        speech = str(row.get("cleaned_speech", "")).strip()
+    for idx, row in enumerate(df.itertuples(index=False)):
+        doc_id = row.document_id
+        speech = str(row.cleaned_speech).strip()
 
         words = speech.split()
 
@@ -30,10 +58,8 @@ def create_inverse_index_catalogue():
                 else:
                     inverse_index[word][doc_id] = 1
 
-        # for testing
-        if idx % 10 == 0 and idx > 0:
+        if idx % 10000 == 0 and idx > 0:
             print(f"Processed {idx} speeches...")
-            print(inverse_index)
 
     # save in pickle to use for tf-idf
     with open("inverse_index.pkl", "wb") as f:
@@ -41,3 +67,415 @@ def create_inverse_index_catalogue():
 
     print(f"Inverted index created with {len(inverse_index)} unique words.")
     print("Saved to inverse_index.pkl.")
+
+
+# --- Block-based (SPIMI-style) builder with external merge ---
+
+_worker_corpus = None  # per-process state set by _init_worker
+_worker_rank = None
+
+
+def _init_worker(corpus_path: str, rank: np.ndarray):
+    global _worker_corpus, _worker_rank
+    _worker_corpus = Corpus(corpus_path)
+    _worker_rank = rank
+
+
+def _invert_block(args) -> str:
+    """
+        Invert documents [start, end) of the corpus in memory and write them as one
+        sorted run: three arrays (term, doc, tf) ordered by (term id, document_id).
+        If `year` is not None only the documents of that year are inverted.
+        With `positions`, a fourth array holds the token positions of every
+        posting (tf of them, ascending), back to back.
+    """
+    start, end, run_path, year, positions = args
+    corpus, rank = _worker_corpus, _worker_rank
+
+    lo, hi = corpus.offsets[start], corpus.offsets[end]
+    terms = rank[np.asarray(corpus.tokens[lo:hi])].astype(np.int64)
+    local_docs = np.repeat(np.arange(end - start, dtype=np.int64), np.diff(corpus.offsets[start:end + 1]))
+    token_positions = np.arange(hi - lo, dtype=np.int64) - (corpus.offsets[start:end] - lo)[local_docs]
+    if year is not None:
+        keep = corpus.years[start:end][local_docs] == year
+        terms, local_docs, token_positions = terms[keep], local_docs[keep], token_positions[keep]
+
+    # One key per (term, doc) pair; np.unique sorts the keys and counts repeats (= tf)
+    keys = terms * (end - start) + local_docs
+    keys_unique, tfs = np.unique(keys, return_counts=True)
+    run_terms = (keys_unique // (end - start)).astype(np.int32)
+    run_docs = np.asarray(corpus.document_id[start:end])[keys_unique % (end - start)].astype(np.int32)
+
+    os.makedirs(run_path)
+    np.save(os.path.join(run_path, "terms.npy"), run_terms)
+    np.save(os.path.join(run_path, "docs.npy"), run_docs)
+    np.save(os.path.join(run_path, "tfs.npy"), tfs.astype(np.int32))
+    if positions:
+        # Stable sort keeps the positions of each (term, doc) pair ascending
+        order = np.argsort(keys, kind="stable")
+        np.save(os.path.join(run_path, "positions.npy"), token_positions[order].astype(np.int32))
+    return run_path
+
+
+def _plan_blocks(offsets: np.ndarray, max_tokens: int) -> list:
+    """Split documents into consecutive [start, end) blocks holding at most max_tokens tokens each."""
+    blocks = []
+    n_docs = len(offsets) - 1
+    start = 0
+    while start < n_docs:
+        end = int(np.searchsorted(offsets, offsets[start] + max_tokens, side="right")) - 1
+        end = min(max(end, start + 1), n_docs)  # always take at least one document
+        blocks.append((start, end))
+        start = end
+    return blocks
+
+
+def build_segment(segment_dir: str, corpus_path: str = CORPUS_DIR, start: int = 0, end: int = None,
+                  memory_budget_mb: int = MEMORY_BUDGET_MB, workers: int = NUM_WORKERS, year: int = None,
+                  positions: bool = STORE_POSITIONS) -> dict:
+    """
+        Build one index segment over the corpus documents [start, end), within a memory budget.
+        With `year`, only the documents of that year (sitting date) are indexed.
+        With `positions`, the positional layer (postings.POSITIONS_FILE) is written too.
+
+        Steps:
+            1) Split the documents into blocks that fit the memory budget.
+            2) Invert every block in memory and flush it to disk as a sorted run
+               (optionally several blocks at once across `workers` processes).
+            3) Merge the runs window by window into the segment.
+
+        Output (segment_dir): compressed postings, see postings.PostingsWriter
+            (varint doc-id gaps and tfs + byte-offset tables, opened with mmap
+            by postings.InvertedIndex).
+
+        Returns:
+            the manifest entry of the segment: {"name", "start", "end", "n_postings"},
+            or None if no document of `year` falls in [start, end)
+
+        Notes:
+            - Term ids follow the sorted vocabulary, so terms sharing a prefix get a
+              contiguous id range. Only terms occurring in [start, end) are kept.
+            - Blocks cover consecutive documents and runs are merged in block order,
+              so every postings list ends up sorted by document_id.
+    """
+    corpus = Corpus(corpus_path)
+    end = len(corpus) if end is None else end
+    rows = np.arange(start, end)
+    if year is not None:
+        rows = start + np.flatnonzero(corpus.years[start:end] == year)
+        if len(rows) == 0:
+            return None
+        start, end = int(rows[0]), int(rows[-1]) + 1
+    n_docs = len(rows)
+    # (doc id, length) of the segment's documents, for BM25; avgdl over the whole corpus
+    doc_lengths = np.stack([np.asarray(corpus.document_id)[rows], corpus.doc_lengths[rows]], axis=1)
+    doc_lengths = doc_lengths[np.argsort(doc_lengths[:, 0], kind="stable")]
+    avgdl = float(corpus.offsets[-1]) / len(corpus)
+    budget_postings = max(1, memory_budget_mb * 1024 * 1024 // BYTES_PER_POSTING)
+
+    # Term ids = position in the sorted vocabulary
+    terms = sorted(corpus.vocab)
+    term_ids = {term: i for i, term in enumerate(terms)}
+    rank = np.asarray([term_ids[term] for term in corpus.vocab], dtype=np.int32)
+
+    # --- 1-2) Sorted runs ---
+    runs_dir = segment_dir + ".runs"
+    shutil.rmtree(runs_dir, ignore_errors=True)
+    os.makedirs(runs_dir)
+    blocks = [(start + b0, start + b1) for b0, b1 in
+              _plan_blocks(corpus.offsets[start:end + 1] - corpus.offsets[start], budget_postings // max(1, workers))]
+    tasks = [(b0, b1, os.path.join(runs_dir, f"run_{i:05d}"), year, positions) for i, (b0, b1) in enumerate(blocks)]
+    print(f"Inverting {n_docs} documents in {len(blocks)} block(s) with {workers} worker(s)...")
+
+    if workers <= 1:
+        _init_worker(corpus_path, rank)
+        run_paths = [_invert_block(task) for task in tasks]
+    else:
+        with Pool(processes=workers, initializer=_init_worker, initargs=(corpus_path, rank)) as pool:
+            run_paths = pool.map(_invert_block, tasks)
+
+    names = ("terms", "docs", "tfs", "positions") if positions else ("terms", "docs", "tfs")
+    runs = [{name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in names}
+            for path in run_paths]
+    if positions:
+        for run in runs:  # where the positions of each posting start
+            run["pos_offsets"] = np.concatenate(([0], np.cumsum(run["tfs"], dtype=np.int64)))
+
+    # --- 3) Merge ---
+    # Postings per term over all runs -> final offsets
+    counts = np.zeros(len(terms), dtype=np.int64)
+    for run in runs:
+        counts += np.bincount(run["terms"], minlength=len(terms))
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    tmp_dir = segment_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    writer = PostingsWriter(tmp_dir, positions=positions, doc_lengths=doc_lengths, avgdl=avgdl)
+
+    # Merge window by window: terms [t0, t1) with about budget_postings postings in total
+    t0 = 0
+    while t0 < len(terms):
+        t1 = int(np.searchsorted(offsets, offsets[t0] + budget_postings, side="right")) - 1
+        t1 = min(max(t1, t0 + 1), len(terms))
+
+        parts_terms, parts_docs, parts_tfs, parts_positions = [], [], [], []
+        for run in runs:  # block order = document order
+            lo, hi = np.searchsorted(run["terms"], [t0, t1])
+            parts_terms.append(run["terms"][lo:hi])
+            parts_docs.append(run["docs"][lo:hi])
+            parts_tfs.append(run["tfs"][lo:hi])
+            if positions:
+                parts_positions.append(run["positions"][run["pos_offsets"][lo]:run["pos_offsets"][hi]])
+
+        # Stable sort by term keeps the run order (and so document order) inside each term
+        order = np.argsort(np.concatenate(parts_terms), kind="stable")
+        window_counts = counts[t0:t1]
+        window_tfs = np.concatenate(parts_tfs).astype(np.int64)
+        window_positions = None
+        if positions:
+            pos_starts = np.cumsum(window_tfs) - window_tfs
+            window_positions = gather_groups(np.concatenate(parts_positions), pos_starts[order], window_tfs[order])
+        writer.add_terms(window_counts[window_counts > 0],
+                         np.concatenate(parts_docs)[order], window_tfs[order], window_positions)
+        t0 = t1
+
+    segment_terms = [term for term, count in zip(terms, counts.tolist()) if count > 0]
+    writer.close(segment_terms, n_docs=n_docs)
+    del runs
+
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    os.replace(tmp_dir, segment_dir)
+    shutil.rmtree(runs_dir, ignore_errors=True)
+
+    return {"name": os.path.basename(segment_dir), "start": start, "end": end, "n_postings": writer.n_postings}
+
+
+def build_inverted_index(index_dir: str = INDEX_DIR, corpus_path: str = CORPUS_DIR,
+                         memory_budget_mb: int = MEMORY_BUDGET_MB, workers: int = NUM_WORKERS,
+                         positions: bool = STORE_POSITIONS):
+    """
+        Build the inverted index from the columnar corpus in one pass, within a memory budget.
+
+        The result is an index directory with a single segment covering the whole corpus
+        (see build_segment) and its manifest, opened with postings.SegmentedIndex.
+        Later documents are added as new segments with add_segment(), with the
+        same positions setting (recorded in the manifest).
+    """
+    corpus = Corpus(corpus_path)
+
+    tmp_dir = index_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    segment = build_segment(os.path.join(tmp_dir, _segment_name(0)), corpus_path, 0, len(corpus),
+                            memory_budget_mb, workers, positions=positions)
+    write_manifest(tmp_dir, {"segments": [segment], "n_docs": len(corpus), "next_segment": 1,
+                             "positions": positions})
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+
+    n_terms = InvertedIndex(os.path.join(index_dir, segment["name"])).n_terms
+    print(f"Inverted index created with {n_terms} terms and {segment['n_postings']} postings.")
+    print(f"Saved to {index_dir}/.")
+
+
+# --- Incremental updates: new documents become new segments, merged in the background ---
+
+MERGE_FACTOR = 4          # Merge this many segments of the same size tier into one
+_manifest_lock = threading.Lock()
+
+
+def _segment_name(number: int) -> str:
+    return f"seg_{number:05d}"
+
+
+def add_segment(index_dir: str = INDEX_DIR, corpus_path: str = CORPUS_DIR,
+                memory_budget_mb: int = MEMORY_BUDGET_MB, workers: int = 1) -> dict:
+    """
+        Index the corpus documents that are not in the index yet as one new segment
+        (for a year shard, only the new documents of its year).
+
+        Only the new documents are inverted; existing segments are left untouched.
+        The segment becomes visible to readers when the manifest is swapped.
+
+        Returns:
+            the new manifest entry, or None if there was nothing to add
+
+        Notes:
+            manifest["n_docs"] counts the corpus documents the index has seen (for a
+            year shard including those of other years), i.e. where the next segment starts.
+    """
+    corpus = Corpus(corpus_path)
+    with _manifest_lock:
+        manifest = read_manifest(index_dir)
+        start, end = manifest["n_docs"], len(corpus)
+        if end <= start:
+            return None
+        number = manifest["next_segment"]
+        manifest["next_segment"] = number + 1
+        write_manifest(index_dir, manifest)  # reserve the segment number
+
+    segment = build_segment(os.path.join(index_dir, _segment_name(number)), corpus_path, start, end,
+                            memory_budget_mb, workers=workers, year=manifest.get("year"),
+                            positions=manifest.get("positions", False))
+
+    with _manifest_lock:
+        manifest = read_manifest(index_dir)
+        if segment is not None:
+            manifest["segments"].append(segment)
+        manifest["n_docs"] = end
+        write_manifest(index_dir, manifest)
+
+    if segment is not None:
+        print(f"Added segment {segment['name']} to {index_dir} with documents [{segment['start']}, {segment['end']}).")
+    return segment
+
+
+def _tier(segment: dict) -> int:
+    """Size tier of a segment: segments within a factor MERGE_FACTOR of each other share a tier."""
+    return int(math.log(max(1, segment["n_postings"]), MERGE_FACTOR))
+
+
+def _pick_merge(segments: list) -> tuple:
+    """First run of MERGE_FACTOR adjacent segments of the same tier, as (i, j), or None."""
+    for i in range(len(segments) - MERGE_FACTOR + 1):
+        tiers = {_tier(segment) for segment in segments[i:i + MERGE_FACTOR]}
+        if len(tiers) == 1:
+            return i, i + MERGE_FACTOR
+    return None
+
+
+def merge_segments(index_dir: str = INDEX_DIR, corpus_path: str = CORPUS_DIR,
+                   memory_budget_mb: int = MEMORY_BUDGET_MB) -> int:
+    """
+        Tiered merge policy: while MERGE_FACTOR adjacent segments fall in the same size
+        tier, replace them by one segment over their (contiguous) document range.
+
+        The merged segment is built next to the live ones; the manifest is then swapped
+        atomically and the old segments deleted, so searches never see a partial state.
+
+        Returns:
+            number of merges done
+    """
+    merges = 0
+    while True:
+        with _manifest_lock:
+            manifest = read_manifest(index_dir)
+            pick = _pick_merge(manifest["segments"])
+            if pick is None:
+                return merges
+            old = manifest["segments"][pick[0]:pick[1]]
+            number = manifest["next_segment"]
+            manifest["next_segment"] = number + 1
+            write_manifest(index_dir, manifest)
+
+        merged = build_segment(os.path.join(index_dir, _segment_name(number)), corpus_path,
+                               old[0]["start"], old[-1]["end"], memory_budget_mb, workers=1,
+                               year=manifest.get("year"), positions=manifest.get("positions", False))
+
+        with _manifest_lock:
+            manifest = read_manifest(index_dir)
+            names = [segment["name"] for segment in manifest["segments"]]
+            i = names.index(old[0]["name"])
+            manifest["segments"][i:i + len(old)] = [merged]
+            write_manifest(index_dir, manifest)
+
+        for segment in old:
+            shutil.rmtree(os.path.join(index_dir, segment["name"]), ignore_errors=True)
+        print(f"Merged {len(old)} segments into {merged['name']} (documents [{merged['start']}, {merged['end']})).")
+        merges += 1
+
+
+# --- Year-sharded index: one segmented index per sitting year ---
+
+SHARDS_DIR = "index_shards"      # One index directory per year + postings.SHARDS_FILE
+
+
+def _shard_path(shards_dir: str, year: int) -> str:
+    return os.path.join(shards_dir, f"year_{year:04d}")
+
+
+def _create_shard(shards_dir: str, year: int, covered: int, positions: bool):
+    """Empty year shard whose next segment starts at corpus document `covered`."""
+    path = _shard_path(shards_dir, year)
+    os.makedirs(path, exist_ok=True)
+    write_manifest(path, {"segments": [], "n_docs": covered, "next_segment": 0, "year": year,
+                          "positions": positions})
+
+
+def _write_shards_file(shards_dir: str, years: list, n_docs: int):
+    shards = [{"year": year, "path": os.path.basename(_shard_path(shards_dir, year))} for year in sorted(years)]
+    tmp_path = os.path.join(shards_dir, SHARDS_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"shards": shards, "n_docs": n_docs}, f, indent=2)
+    os.replace(tmp_path, os.path.join(shards_dir, SHARDS_FILE))
+
+
+def build_sharded_index(shards_dir: str = SHARDS_DIR, corpus_path: str = CORPUS_DIR,
+                        memory_budget_mb: int = MEMORY_BUDGET_MB, workers: int = NUM_WORKERS,
+                        positions: bool = STORE_POSITIONS):
+    """
+        Build one index per sitting year (postings.ShardedIndex), so that searches with
+        a year range only read the shards inside it.
+
+        Every shard is a self-contained segmented index directory (own manifest, term
+        dictionary and postings); SHARDS_FILE only lists them, so shards can later be
+        served from different machines. Documents without a date form year 0; they are
+        never returned by a year-filtered search but still count in the global statistics.
+    """
+    corpus = Corpus(corpus_path)
+    years = np.unique(corpus.years).tolist()
+
+    tmp_dir = shards_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for year in years:
+        _create_shard(tmp_dir, year, 0, positions)
+        add_segment(_shard_path(tmp_dir, year), corpus_path, memory_budget_mb, workers=workers)
+    _write_shards_file(tmp_dir, years, len(corpus))
+
+    shutil.rmtree(shards_dir, ignore_errors=True)
+    os.replace(tmp_dir, shards_dir)
+    print(f"Sharded index created with {len(years)} year shards. Saved to {shards_dir}/.")
+
+
+def update_sharded_index(shards_dir: str = SHARDS_DIR, corpus_path: str = CORPUS_DIR,
+                         memory_budget_mb: int = MEMORY_BUDGET_MB) -> list:
+    """
+        Add the corpus documents appended since the last update to their year shards
+        (one new segment per touched shard, new shards for new years).
+
+        Returns:
+            paths of the shards that received a segment (to be merged with merge_segments)
+    """
+    corpus = Corpus(corpus_path)
+    with open(os.path.join(shards_dir, SHARDS_FILE), encoding="utf-8") as f:
+        covered = json.load(f)["n_docs"]
+    if covered >= len(corpus):
+        return []
+
+    years = [int(os.path.basename(name)[len("year_"):]) for name in os.listdir(shards_dir)
+             if name.startswith("year_")]
+    new_years = np.unique(corpus.years[covered:]).tolist()
+    positions = any(read_manifest(_shard_path(shards_dir, year)).get("positions", False) for year in years)
+    for year in new_years:
+        if year not in years:
+            _create_shard(shards_dir, year, covered, positions)
+            years.append(year)
+
+    updated = []
+    for year in new_years:
+        path = _shard_path(shards_dir, year)
+        if add_segment(path, corpus_path, memory_budget_mb) is not None:
+            updated.append(path)
+    # Shards of other years just move their start past the new documents
+    for year in years:
+        path = _shard_path(shards_dir, year)
+        with _manifest_lock:
+            manifest = read_manifest(path)
+            if manifest["n_docs"] < len(corpus):
+                manifest["n_docs"] = len(corpus)
+                write_manifest(path, manifest)
+
+    _write_shards_file(shards_dir, years, len(corpus))
+    return updated
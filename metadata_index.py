@@ -0,0 +1,396 @@
+import sqlite3
+import calendar
+import threading
+import numpy as np
+from collections import OrderedDict
+
+DB_NAME = "parliament.db"
+FACET_TOP_MEMBERS = 20  # Members listed in the member facet (most hits first)
+FILTER_CACHE_SIZE = 256  # Filter bitmaps kept by DocMetadata.filter_bitmap (least recently used evicted)
+
+# Roaring-style bitmap layout: doc ids are split by their high 16 bits into chunks;
+# a chunk is stored as a sorted uint16 array when sparse, as a 2^16-bit bitmap when dense.
+CHUNK_BITS = 16
+ARRAY_MAX = 4096           # chunks with more documents than this use a bitmap container
+WORDS = (1 << CHUNK_BITS) // 64
+
+
+def _to_container(lows: np.ndarray):
+    """Container for the sorted, unique low 16 bits of one chunk."""
+    if len(lows) <= ARRAY_MAX:
+        return lows.astype(np.uint16)
+    words = np.zeros(WORDS, dtype=np.uint64)
+    np.bitwise_or.at(words, lows >> 6, np.left_shift(np.uint64(1), (lows & 63).astype(np.uint64)))
+    return words
+
+
+def _container_values(container) -> np.ndarray:
+    if container.dtype == np.uint16:
+        return container.astype(np.int64)
+    bits = np.unpackbits(container.view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).astype(np.int64)
+
+
+def _container_contains(container, lows: np.ndarray) -> np.ndarray:
+    if container.dtype == np.uint16:
+        where = np.minimum(np.searchsorted(container, lows), len(container) - 1)
+        return container[where] == lows
+    return ((container[lows >> 6] >> (lows & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+class Bitmap:
+    """
+        Compressed set of doc ids (roaring-style, see CHUNK_BITS / ARRAY_MAX).
+
+            Bitmap(doc_ids)         build from any integer array
+            bitmap.contains(ids)    vectorized membership -> bool array
+            a & b, a | b, a - b     intersection / union / difference, chunk by chunk
+            bitmap.to_array()       sorted doc ids
+            len(bitmap)             number of doc ids
+    """
+
+    def __init__(self, doc_ids=None, containers: dict = None):
+        if containers is None:
+            doc_ids = np.unique(np.asarray(doc_ids if doc_ids is not None else [], dtype=np.int64))
+            highs = doc_ids >> CHUNK_BITS
+            keys, starts = np.unique(highs, return_index=True)
+            ends = np.append(starts[1:], len(doc_ids))
+            containers = {int(key): _to_container(doc_ids[start:end] & ((1 << CHUNK_BITS) - 1))
+                          for key, start, end in zip(keys, starts, ends)}
+        self.containers = containers
+        self._size = sum(len(c) if c.dtype == np.uint16 else int(np.unpackbits(c.view(np.uint8)).sum())
+                         for c in containers.values())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def to_array(self) -> np.ndarray:
+        parts = [(key << CHUNK_BITS) + _container_values(c) for key, c in sorted(self.containers.items())]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def contains(self, doc_ids: np.ndarray) -> np.ndarray:
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        mask = np.zeros(len(doc_ids), dtype=bool)
+        highs = doc_ids >> CHUNK_BITS
+        for key in np.unique(highs).tolist():
+            container = self.containers.get(key)
+            if container is None or len(container) == 0:
+                continue
+            in_chunk = highs == key
+            mask[in_chunk] = _container_contains(container, doc_ids[in_chunk] & ((1 << CHUNK_BITS) - 1))
+        return mask
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        containers = {}
+        for key in self.containers.keys() & other.containers.keys():
+            a, b = self.containers[key], other.containers[key]
+            if a.dtype == np.uint64 and b.dtype == np.uint64:
+                lows = _container_values(a & b)
+            elif a.dtype == np.uint16:
+                lows = a[_container_contains(b, a.astype(np.int64))].astype(np.int64)
+            else:
+                lows = b[_container_contains(a, b.astype(np.int64))].astype(np.int64)
+            if len(lows):
+                containers[key] = _to_container(lows)
+        return Bitmap(containers=containers)
+
+    def __or__(self, other: "Bitmap") -> "Bitmap":
+        containers = dict(self.containers)
+        for key, b in other.containers.items():
+            a = containers.get(key)
+            if a is None:
+                containers[key] = b
+            elif a.dtype == np.uint64 and b.dtype == np.uint64:
+                containers[key] = a | b
+            else:
+                containers[key] = _to_container(np.union1d(_container_values(a), _container_values(b)))
+        return Bitmap(containers=containers)
+
+    def __sub__(self, other: "Bitmap") -> "Bitmap":
+        containers = {}
+        for key, a in self.containers.items():
+            b = other.containers.get(key)
+            if b is None:
+                containers[key] = a
+                continue
+            if a.dtype == np.uint64 and b.dtype == np.uint64:
+                lows = _container_values(a & ~b)
+            else:
+                lows = _container_values(a)
+                lows = lows[~_container_contains(b, lows)]
+            if len(lows):
+                containers[key] = _to_container(lows)
+        return Bitmap(containers=containers)
+
+    @staticmethod
+    def group(doc_ids: np.ndarray, values: np.ndarray) -> dict:
+        """One Bitmap per distinct value: {value: Bitmap of the doc_ids having it}."""
+        order = np.argsort(values, kind="stable")
+        keys, starts = np.unique(values[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        return {int(key): Bitmap(doc_ids[order[start:end]]) for key, start, end in zip(keys, starts, ends)}
+
+
+def period_bounds(text: str) -> tuple:
+    """
+        First and last day of a period as YYYYMMDD integers.
+
+        Accepts "YYYY", "YYYY-Qn" (quarter), "YYYY-MM" and "YYYY-MM-DD":
+            period_bounds("2011-Q3")  -> (20110701, 20110930)
+
+        Raises:
+            ValueError: any other format
+    """
+    parts = text.strip().upper().split("-")
+    try:
+        year = int(parts[0])
+        if len(parts) == 1:
+            return year * 10000 + 101, year * 10000 + 1231
+        if len(parts) == 2 and parts[1].startswith("Q"):
+            quarter = int(parts[1][1:])
+            if not 1 <= quarter <= 4:
+                raise ValueError
+            first, last = 3 * quarter - 2, 3 * quarter
+            return year * 10000 + first * 100 + 1, year * 10000 + last * 100 + calendar.monthrange(year, last)[1]
+        month = int(parts[1])
+        if not 1 <= month <= 12 or len(parts) > 3:
+            raise ValueError
+        if len(parts) == 2:
+            return year * 10000 + month * 100 + 1, year * 10000 + month * 100 + calendar.monthrange(year, month)[1]
+        day = int(parts[2])
+        if not 1 <= day <= calendar.monthrange(year, month)[1]:
+            raise ValueError
+        return (year * 10000 + month * 100 + day,) * 2
+    except (ValueError, IndexError):
+        raise ValueError(f"invalid period '{text}' (expected YYYY, YYYY-Qn, YYYY-MM or YYYY-MM-DD)")
+
+
+class DocMetadata:
+    """
+        Per-document metadata loaded once from parliament.db into arrays indexed by doc_id,
+        so search filters are array lookups instead of SQL joins per query.
+
+        Attributes (numpy arrays of length max(doc_id) + 1, -1 where a doc_id is not in the DB):
+            year, party_id, member_id
+        Plus name -> id maps for parties and members, and compressed doc-id bitmaps
+        per year / party / member that filter_bitmap() combines for a query.
+    """
+
+    def __init__(self, db_path: str = DB_NAME):
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = np.array(conn.execute(
+                "SELECT doc_id, year, party_id, member_id FROM speeches"
+            ).fetchall(), dtype=np.int64).reshape(-1, 4)
+            self.party_ids = {name: pid for pid, name in conn.execute("SELECT id, name FROM parties")}
+            self.member_ids = {name: mid for mid, name in conn.execute("SELECT id, full_name FROM members")}
+        finally:
+            conn.close()
+
+        size = int(rows[:, 0].max()) + 1 if len(rows) else 0
+        self.year = np.full(size, -1, dtype=np.int32)
+        self.party_id = np.full(size, -1, dtype=np.int32)
+        self.member_id = np.full(size, -1, dtype=np.int32)
+        self.year[rows[:, 0]] = rows[:, 1]
+        self.party_id[rows[:, 0]] = rows[:, 2]
+        self.member_id[rows[:, 0]] = rows[:, 3]
+
+        # Filter bitmaps, built once: every document in the DB, and one per year / party / member
+        doc_ids = rows[:, 0]
+        self.all_docs = Bitmap(doc_ids)
+        self.year_bitmaps = Bitmap.group(doc_ids, rows[:, 1])
+        self.party_bitmaps = Bitmap.group(doc_ids, rows[:, 2])
+        self.member_bitmaps = Bitmap.group(doc_ids, rows[:, 3])
+        self._filter_bitmaps = OrderedDict()  # (years, party_id, member_id) -> Bitmap, LRU order
+        self._filter_lock = threading.Lock()
+        dated = [year for year in self.year_bitmaps if year > 0]
+        self.year_span = (int(min(dated)), int(max(dated))) if dated else None
+        self._party_names = None  # id -> name, built on the first facet_counts()
+        self._member_names = None
+        self.db_path = db_path
+        self._date = None  # YYYYMMDD per doc_id, loaded on the first slice_doc_ids()
+
+    def __len__(self) -> int:
+        return len(self.year)
+
+    def parse_filters(self, date_range: str = "all", party: str = "all", member: str = "all") -> dict:
+        """
+            Turn the /search filter strings into ids.
+
+            Args:
+                date_range: "all" or "YYYY-YYYY"
+                party / member: "all" or an exact party / member name
+
+            Returns:
+                { "years": (y1, y2) or None, "party_id": int or None, "member_id": int or None }
+                An unknown party/member name maps to id -1, which matches no document.
+        """
+        filters = {"years": None, "party_id": None, "member_id": None}
+
+        if date_range and date_range != "all":
+            try:
+                y1, y2 = date_range.split("-")
+                filters["years"] = (int(y1), int(y2))
+            except Exception:
+                pass
+
+        if party and party.lower() != "all":
+            filters["party_id"] = self.party_ids.get(party, -1)
+        if member and member.lower() != "all":
+            filters["member_id"] = self.member_ids.get(member, -1)
+
+        return filters
+
+    def filter_bitmap(self, filters: dict) -> Bitmap:
+        """
+            Documents in the DB that pass the filters, as a Bitmap: the OR of the year
+            bitmaps in range, AND the party bitmap, AND the member bitmap.
+            The year range is first clamped to the years of the collection, so equivalent
+            ranges share an entry; the last FILTER_CACHE_SIZE combinations are cached.
+        """
+        years = self._clamp_years(filters.get("years"))
+        key = (years, filters.get("party_id"), filters.get("member_id"))
+        with self._filter_lock:
+            bitmap = self._filter_bitmaps.get(key)
+            if bitmap is not None:
+                self._filter_bitmaps.move_to_end(key)
+                return bitmap
+
+        bitmap = self.all_docs
+        if years is not None:
+            y1, y2 = years
+            in_range = Bitmap()
+            for year, year_bitmap in self.year_bitmaps.items():
+                if y1 <= year <= y2:
+                    in_range = in_range | year_bitmap
+            bitmap = bitmap & in_range
+        if filters.get("party_id") is not None:
+            bitmap = bitmap & self.party_bitmaps.get(filters["party_id"], Bitmap())
+        if filters.get("member_id") is not None:
+            bitmap = bitmap & self.member_bitmaps.get(filters["member_id"], Bitmap())
+
+        with self._filter_lock:
+            self._filter_bitmaps[key] = bitmap
+            self._filter_bitmaps.move_to_end(key)
+            if len(self._filter_bitmaps) > FILTER_CACHE_SIZE:
+                self._filter_bitmaps.popitem(last=False)
+        return bitmap
+
+    def _clamp_years(self, years):
+        """(y1, y2) clamped to year_span; (0, -1) for a range without any dated speech."""
+        if years is None:
+            return None
+        if self.year_span is None:
+            return 0, -1
+        y1, y2 = max(years[0], self.year_span[0]), min(years[1], self.year_span[1])
+        return (y1, y2) if y1 <= y2 else (0, -1)
+
+    @property
+    def date(self) -> np.ndarray:
+        """Sitting date of every doc_id as YYYYMMDD (0 if not in the DB)."""
+        if self._date is None:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                # sitting_date is stored as YYYY-MM-DD
+                rows = np.array(conn.execute(
+                    "SELECT doc_id, CAST(REPLACE(sitting_date, '-', '') AS INTEGER) FROM speeches"
+                ).fetchall(), dtype=np.int64).reshape(-1, 2)
+            finally:
+                conn.close()
+            self._date = np.zeros(len(self.year), dtype=np.int32)
+            self._date[rows[:, 0]] = rows[:, 1]
+        return self._date
+
+    def slice_doc_ids(self, first_day: int = None, last_day: int = None, party_ids=(), member_ids=()) -> np.ndarray:
+        """
+            Doc ids (ascending) of an arbitrary slice: sitting date within
+            [first_day, last_day] (YYYYMMDD, see period_bounds), AND any of `party_ids`,
+            AND any of `member_ids` (empty = no restriction).
+
+            The year / party / member bitmaps are combined first; only the documents
+            left in the first and last year are checked against their exact dates.
+        """
+        bitmap = self.all_docs
+        if first_day is not None or last_day is not None:
+            y1 = first_day // 10000 if first_day is not None else -1
+            y2 = last_day // 10000 if last_day is not None else 1 << 30
+            bitmap = bitmap & self.filter_bitmap({"years": (y1, y2)})
+        if party_ids:
+            parties = Bitmap()
+            for party_id in party_ids:
+                parties = parties | self.party_bitmaps.get(party_id, Bitmap())
+            bitmap = bitmap & parties
+        if member_ids:
+            members = Bitmap()
+            for member_id in member_ids:
+                members = members | self.member_bitmaps.get(member_id, Bitmap())
+            bitmap = bitmap & members
+
+        doc_ids = bitmap.to_array().astype(np.int64)
+        if first_day is not None or last_day is not None:
+            dates = self.date[doc_ids]
+            keep = np.ones(len(doc_ids), dtype=bool)
+            if first_day is not None:
+                keep &= dates >= first_day
+            if last_day is not None:
+                keep &= dates <= last_day
+            doc_ids = doc_ids[keep]
+        return doc_ids
+
+    def filter_mask(self, doc_ids: np.ndarray, filters: dict) -> np.ndarray:
+        """Boolean mask over `doc_ids`: True for documents in the DB that pass the filters."""
+        return self.filter_bitmap(filters).contains(doc_ids)
+
+    def facet_counts(self, doc_ids: np.ndarray, filters: dict, top_members: int = FACET_TOP_MEMBERS) -> dict:
+        """
+            Hit counts per party, year and member for the documents matching a query.
+
+            One pass over the matching doc ids: their year / party / member are read from
+            the arrays once and each facet is a bincount. Every facet applies the other
+            filters but not its own, so the counts are what selecting that value would
+            return (e.g. the party counts for the current year range and member).
+
+            Args:
+                doc_ids: every document matching the query (see search_engine.match_set)
+                filters: output of parse_filters
+
+            Returns:
+                {
+                  "total": hits passing all filters,
+                  "party":  [{"name", "count"}, ...],
+                  "year":   [{"year", "count"}, ...],
+                  "member": [{"name", "count"}, ...]   (top `top_members`)
+                }
+                Lists are ordered by count descending (years ascending).
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        doc_ids = doc_ids[doc_ids < len(self.year)]
+        year, party, member = self.year[doc_ids], self.party_id[doc_ids], self.member_id[doc_ids]
+        in_db = year >= 0
+        year, party, member = year[in_db], party[in_db], member[in_db]
+
+        ok_year = np.ones(len(year), dtype=bool)
+        if filters.get("years") is not None:
+            y1, y2 = filters["years"]
+            ok_year = (year >= y1) & (year <= y2)
+        ok_party = party == filters["party_id"] if filters.get("party_id") is not None else np.ones(len(year), bool)
+        ok_member = member == filters["member_id"] if filters.get("member_id") is not None else np.ones(len(year), bool)
+
+        if self._party_names is None:
+            self._party_names = {pid: name for name, pid in self.party_ids.items()}
+            self._member_names = {mid: name for name, mid in self.member_ids.items()}
+
+        def counted(values, names, limit=None):
+            counts = np.bincount(values) if len(values) else np.zeros(0, dtype=np.int64)
+            ids = np.flatnonzero(counts)
+            ids = ids[np.lexsort((ids, -counts[ids]))][:limit]
+            return [{"name": names.get(int(i), str(i)), "count": int(counts[i])} for i in ids]
+
+        years = year[ok_party & ok_member]
+        year_values, year_counts = np.unique(years, return_counts=True)
+        return {
+            "total": int(np.count_nonzero(ok_year & ok_party & ok_member)),
+            "party": counted(party[ok_year & ok_member], self._party_names),
+            "year": [{"year": int(y), "count": int(c)} for y, c in zip(year_values, year_counts)],
+            "member": counted(member[ok_year & ok_party], self._member_names, top_members),
+        }
@@ -1,7 +1,7 @@
 import pandas as pd
 import unidecode
 import sqlite3
-from tf_idf import load_inverse_index_and_docs, compute_tf_idf_keywords_subset
+from tf_idf import load_inverse_index_and_docs, build_tf_idf_weight_matrix, top_keywords_per_row, compute_tf_idf_keywords_grouped, save_tf_idf_weight_matrix
 
 
 def normalize(text):
@@ -90,56 +90,50 @@ def run_all_part2_tasks():
              - per speech (top 5)
              - per member per year (top 10)
              - per party per year (top 10)
-          3) Store all three snapshots into DB.
+          3) Store all three snapshots into DB, and the per-speech TF-IDF
+             vectors into KEYWORD_WEIGHTS_DIR (slices on demand).
 
         Data assumptions:
           - df has columns: sitting_date, member_name, political_party
-          - tf_idf functions accept doc_id lists (row indices of df)
+          - row i of df is the speech with doc_id i in the index
+          - all keywords come from one sparse TF-IDF matrix; groups are
+            aggregated with tf_idf.compute_tf_idf_keywords_grouped
     """
 
     inverse_index, df, _, _ = load_inverse_index_and_docs()
     df["year"] = pd.to_datetime(df["sitting_date"], dayfirst=True).dt.year
 
+    # One sparse doc × term TF-IDF matrix, shared by the speech and group keywords
+    weights, terms = build_tf_idf_weight_matrix(inverse_index, len(df))
+    save_tf_idf_weight_matrix(weights, terms)  # per-speech vectors for /keywords/slice
+
     # Compute keywords per speech
     print("[...] Computing keywords per speech")
-    speech_keywords = {}
-    for doc_id in range(len(df)):
-        keywords = compute_tf_idf_keywords_subset(inverse_index, df, [doc_id], top_n=5, return_scores=True)
-        speech_keywords[doc_id] = keywords
+    speech_keywords = dict(enumerate(top_keywords_per_row(weights, terms, top_n=5)))
+
+    # Name -> id maps, resolved once (the first row of a repeated name, like a lookup by name)
+    with sqlite3.connect("parliament.db") as conn:
+        member_ids, party_ids = {}, {}
+        for member_id, full_name in conn.execute("SELECT id, full_name FROM members ORDER BY rowid"):
+            member_ids.setdefault(full_name, member_id)
+        for party_id, name in conn.execute("SELECT id, name FROM parties ORDER BY rowid"):
+            party_ids.setdefault(name, party_id)
 
     # Compute member keywords per year
     print("[...] Computing keywords per member by year")
     member_keywords = {}
-    for (member, year), group in df.groupby(["member_name", "year"]):
-        doc_ids = group.index.tolist()
-        if not doc_ids:
-            continue
-        keywords = compute_tf_idf_keywords_subset(inverse_index, df, doc_ids, top_n=10, return_scores=True)
-
-        with sqlite3.connect("parliament.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM members WHERE full_name = ?", (member,))
-            result = cursor.fetchone()
-            if result:
-                member_id = result[0]
-                member_keywords[(member_id, year)] = keywords
+    grouped = compute_tf_idf_keywords_grouped(weights, terms, df, ["member_name", "year"], top_n=10)
+    for (member, year), keywords in grouped.items():
+        if member in member_ids:
+            member_keywords[(member_ids[member], year)] = keywords
 
     # Compute party keywords per year
     print("[...] Computing keywords per party by year")
     party_keywords = {}
-    for (party, year), group in df.groupby(["political_party", "year"]):
-        doc_ids = group.index.tolist()
-        if not doc_ids:
-            continue
-        keywords = compute_tf_idf_keywords_subset(inverse_index, df, doc_ids, top_n=10, return_scores=True)
-
-        with sqlite3.connect("parliament.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM parties WHERE name = ?", (party,))
-            result = cursor.fetchone()
-            if result:
-                party_id = result[0]
-                party_keywords[(party_id, year)] = keywords
+    grouped = compute_tf_idf_keywords_grouped(weights, terms, df, ["political_party", "year"], top_n=10)
+    for (party, year), keywords in grouped.items():
+        if party in party_ids:
+            party_keywords[(party_ids[party], year)] = keywords
 
     # Save all to DB
     with sqlite3.connect("parliament.db") as conn:
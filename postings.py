@@ -0,0 +1,653 @@
+import os
+import json
+from bisect import bisect_left
+from functools import lru_cache
+import numpy as np
+import bm25
+
+# Files of a compressed index directory
+TERMS_FILE = "terms.bin"                 # sorted terms as UTF-8, back to back
+TERM_OFFSETS_FILE = "term_offsets.npy"   # int64 [n_terms + 1] byte offsets into terms.bin
+DF_FILE = "df.npy"                       # int32 [n_terms] document frequency per term
+DOCS_FILE = "docs.bin"                   # varint doc-id gaps, per term (first value = doc id)
+DOC_OFFSETS_FILE = "doc_offsets.npy"     # int64 [n_terms + 1] byte offsets into docs.bin
+TFS_FILE = "tfs.bin"                     # varint term frequencies, aligned with docs.bin
+TF_OFFSETS_FILE = "tf_offsets.npy"       # int64 [n_terms + 1] byte offsets into tfs.bin
+META_FILE = "meta.json"                  # n_docs, n_terms, n_postings, positions, skip_interval, n_tokens, avgdl
+# Skip list: postings are cut in blocks of SKIP_INTERVAL, so a lookup decodes only the blocks it needs
+SKIPS_FILE = "skips.npy"                 # int64 [n_blocks, 3] last doc id, docs.bin / tfs.bin offset of each block
+SKIP_OFFSETS_FILE = "skip_offsets.npy"   # int64 [n_terms + 1] first block of each term
+BOUNDS_FILE = "max_score.npy"            # float64 [n_terms] max BM25 tf part over the term's postings
+DOC_LENGTHS_FILE = "doc_lengths.npy"     # int64 [n_docs, 2] (doc id, number of tokens) of the segment
+# Optional positional layer (positions of every occurrence, aligned with the postings)
+POSITIONS_FILE = "positions.bin"         # varint position gaps, per posting (first value = position)
+POS_OFFSETS_FILE = "pos_offsets.npy"     # int64 [n_terms + 1] byte offsets into positions.bin
+
+# An index directory holds one or more segments (each one a directory in the format
+# above, covering a contiguous range of documents) listed in a manifest.
+MANIFEST_FILE = "manifest.json"          # {"segments": [...], "n_docs": int, "next_segment": int}
+
+# A sharded index is a directory of segmented indexes, one per sitting year.
+SHARDS_FILE = "shards.json"              # {"shards": [{"year": int, "path": str}], "n_docs": int}
+
+SKIP_INTERVAL = 128  # postings per skip block
+POSTINGS_DICT_CACHE = 4096  # decoded postings dicts kept per InvertedIndex (mapping interface)
+
+
+# --- Varint codec (7 bits per byte, high bit = "more bytes follow"), vectorized ---
+
+def varint_lengths(values: np.ndarray) -> np.ndarray:
+    """Number of bytes each non-negative value takes as a varint."""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+    return lengths
+
+
+def varint_encode(values: np.ndarray) -> np.ndarray:
+    """Encode non-negative integers as a uint8 array of varints."""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = varint_lengths(values)
+    starts = np.cumsum(lengths) - lengths
+    out = np.empty(int(lengths.sum()), dtype=np.uint8)
+
+    for k in range(int(lengths.max()) if len(values) else 0):
+        has_byte = lengths > k
+        byte = (values[has_byte] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        byte |= np.where(lengths[has_byte] > k + 1, np.uint64(0x80), np.uint64(0))
+        out[starts[has_byte] + k] = byte.astype(np.uint8)
+    return out
+
+
+def varint_decode(buf: np.ndarray) -> np.ndarray:
+    """Decode a uint8 array of varints back into int64 values."""
+    buf = np.asarray(buf, dtype=np.uint8)
+    if len(buf) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    is_last = (buf & 0x80) == 0
+    starts = np.flatnonzero(np.concatenate(([True], is_last[:-1])))
+    value_of_byte = np.cumsum(np.concatenate(([0], is_last[:-1].astype(np.int64))))
+    shifts = (7 * (np.arange(len(buf)) - starts[value_of_byte])).astype(np.uint64)
+    parts = (buf & 0x7F).astype(np.uint64) << shifts
+    return np.bitwise_or.reduceat(parts, starts).astype(np.int64)
+
+
+# --- Writer ---
+
+class PostingsWriter:
+    """
+        Writes a compressed index, term by term in term-id order.
+        Doc ids are stored as gaps (first posting = doc id itself) and, like the
+        term frequencies, as varints. Every SKIP_INTERVAL postings a skip entry
+        records where the block starts.
+
+        With `doc_lengths` ((doc id, length) rows of the documents of this index,
+        sorted by doc id) and `avgdl`, the per-term BM25 upper bounds (BOUNDS_FILE)
+        and the document lengths are written too.
+    """
+
+    def __init__(self, path: str, positions: bool = False, doc_lengths: np.ndarray = None, avgdl: float = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._docs = open(os.path.join(path, DOCS_FILE), "wb")
+        self._tfs = open(os.path.join(path, TFS_FILE), "wb")
+        self._doc_offsets = [np.zeros(1, dtype=np.int64)]
+        self._tf_offsets = [np.zeros(1, dtype=np.int64)]
+        self._df = []
+        self._doc_bytes = 0
+        self._tf_bytes = 0
+        self.n_postings = 0
+        self._skips = []
+        self._skip_offsets = [np.zeros(1, dtype=np.int64)]
+        self._n_blocks = 0
+
+        self.doc_lengths = doc_lengths
+        self.avgdl = avgdl
+        self._bounds = []
+
+        self.positions = positions
+        if positions:
+            self._positions = open(os.path.join(path, POSITIONS_FILE), "wb")
+            self._pos_offsets = [np.zeros(1, dtype=np.int64)]
+            self._pos_bytes = 0
+
+    def add_terms(self, counts: np.ndarray, docs: np.ndarray, tfs: np.ndarray, positions: np.ndarray = None):
+        """
+            Append the postings of a run of consecutive terms.
+
+            Args:
+                counts: number of postings of each term (may be 0)
+                docs: doc ids of all these terms, ascending within each term
+                tfs: term frequencies aligned with docs
+                positions: (positional writer only) tfs[i] ascending token positions
+                           for every posting, back to back
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        docs = np.asarray(docs, dtype=np.int64)
+        term_starts = np.cumsum(counts) - counts
+
+        gaps = docs.copy()
+        gaps[1:] -= docs[:-1]
+        nonempty = term_starts[counts > 0]
+        gaps[nonempty] = docs[nonempty]  # every term restarts from its first doc id
+
+        doc_bytes = varint_encode(gaps)
+        tf_bytes = varint_encode(tfs)
+
+        # Byte offset where each term ends = bytes of all postings up to its last one
+        posting_ends = np.cumsum(counts)
+        doc_ends = np.concatenate(([0], np.cumsum(varint_lengths(gaps))))[posting_ends]
+        tf_ends = np.concatenate(([0], np.cumsum(varint_lengths(tfs))))[posting_ends]
+        self._doc_offsets.append(self._doc_bytes + doc_ends)
+        self._tf_offsets.append(self._tf_bytes + tf_ends)
+
+        self._add_skips(counts, docs, gaps, tfs)
+        if self.doc_lengths is not None:
+            self._add_bounds(counts, docs, tfs)
+
+        doc_bytes.tofile(self._docs)
+        tf_bytes.tofile(self._tfs)
+        self._doc_bytes += len(doc_bytes)
+        self._tf_bytes += len(tf_bytes)
+        self._df.append(counts.astype(np.int32))
+        self.n_postings += len(docs)
+
+        if self.positions:
+            self._add_positions(posting_ends, np.asarray(tfs, dtype=np.int64), np.asarray(positions, dtype=np.int64))
+
+    def _add_skips(self, counts: np.ndarray, docs: np.ndarray, gaps: np.ndarray, tfs: np.ndarray):
+        # Position of every posting inside its term -> block starts / ends
+        local = np.arange(len(docs)) - np.repeat(np.cumsum(counts) - counts, counts)
+        block_start = local % SKIP_INTERVAL == 0
+        block_end = ((local + 1) % SKIP_INTERVAL == 0) | (local == np.repeat(counts, counts) - 1)
+
+        doc_starts = self._doc_bytes + np.cumsum(varint_lengths(gaps)) - varint_lengths(gaps)
+        tf_starts = self._tf_bytes + np.cumsum(varint_lengths(tfs)) - varint_lengths(tfs)
+        self._skips.append(np.stack([docs[block_end], doc_starts[block_start], tf_starts[block_start]], axis=1))
+
+        blocks = (counts + SKIP_INTERVAL - 1) // SKIP_INTERVAL
+        self._skip_offsets.append(self._n_blocks + np.cumsum(blocks))
+        self._n_blocks += int(blocks.sum())
+
+    def _add_bounds(self, counts: np.ndarray, docs: np.ndarray, tfs: np.ndarray):
+        lengths = self.doc_lengths[np.searchsorted(self.doc_lengths[:, 0], docs), 1]
+        parts = bm25.tf_part(tfs, lengths, self.avgdl)
+        bounds = np.zeros(len(counts), dtype=np.float64)
+        nonempty = counts > 0
+        if len(docs):
+            bounds[nonempty] = np.maximum.reduceat(parts, (np.cumsum(counts) - counts)[nonempty])
+        self._bounds.append(bounds)
+
+    def _add_positions(self, posting_ends: np.ndarray, tfs: np.ndarray, positions: np.ndarray):
+        # Gaps inside each posting; every posting restarts from its first position
+        gaps = positions.copy()
+        gaps[1:] -= positions[:-1]
+        posting_starts = np.cumsum(tfs) - tfs
+        gaps[posting_starts[tfs > 0]] = positions[posting_starts[tfs > 0]]
+
+        pos_bytes = varint_encode(gaps)
+        position_ends = np.concatenate(([0], np.cumsum(tfs)))[posting_ends]
+        byte_ends = np.concatenate(([0], np.cumsum(varint_lengths(gaps))))[position_ends]
+        self._pos_offsets.append(self._pos_bytes + byte_ends)
+        pos_bytes.tofile(self._positions)
+        self._pos_bytes += len(pos_bytes)
+
+    def close(self, terms: list, n_docs: int):
+        """Write the term list, offset tables and metadata."""
+        self._docs.close()
+        self._tfs.close()
+        if self.positions:
+            self._positions.close()
+            np.save(os.path.join(self.path, POS_OFFSETS_FILE), np.concatenate(self._pos_offsets))
+
+        encoded = [term.encode("utf-8") for term in terms]
+        with open(os.path.join(self.path, TERMS_FILE), "wb") as f:
+            f.write(b"".join(encoded))
+        term_offsets = np.concatenate(([0], np.cumsum([len(t) for t in encoded]))).astype(np.int64)
+
+        np.save(os.path.join(self.path, TERM_OFFSETS_FILE), term_offsets)
+        np.save(os.path.join(self.path, DOC_OFFSETS_FILE), np.concatenate(self._doc_offsets))
+        np.save(os.path.join(self.path, TF_OFFSETS_FILE), np.concatenate(self._tf_offsets))
+        np.save(os.path.join(self.path, DF_FILE),
+                np.concatenate(self._df) if self._df else np.zeros(0, dtype=np.int32))
+        np.save(os.path.join(self.path, SKIPS_FILE),
+                np.concatenate(self._skips) if self._skips else np.zeros((0, 3), dtype=np.int64))
+        np.save(os.path.join(self.path, SKIP_OFFSETS_FILE), np.concatenate(self._skip_offsets))
+
+        meta_extra = {}
+        if self.doc_lengths is not None:
+            np.save(os.path.join(self.path, BOUNDS_FILE),
+                    np.concatenate(self._bounds) if self._bounds else np.zeros(0, dtype=np.float64))
+            np.save(os.path.join(self.path, DOC_LENGTHS_FILE), self.doc_lengths.astype(np.int64))
+            meta_extra = {"n_tokens": int(self.doc_lengths[:, 1].sum()), "avgdl": self.avgdl}
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"n_docs": n_docs, "n_terms": len(terms), "n_postings": self.n_postings,
+                       "positions": self.positions, "skip_interval": SKIP_INTERVAL, **meta_extra}, f, indent=2)
+
+
+# --- Reader ---
+
+def gather_groups(values: np.ndarray, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenate values[starts[i]:starts[i] + lengths[i]] for every i, vectorized."""
+    new_starts = np.cumsum(lengths) - lengths
+    return values[np.repeat(starts - new_starts, lengths) + np.arange(int(lengths.sum()))]
+
+
+def _restart_cumsum(gaps: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Cumulative sum of `gaps` restarting at every group of `lengths` values."""
+    totals = np.cumsum(gaps)
+    group_starts = np.cumsum(lengths) - lengths
+    nonempty = group_starts[lengths > 0]
+    base = np.repeat(totals[nonempty] - gaps[nonempty], lengths[lengths > 0])
+    return totals - base
+
+
+def _map_bytes(path: str) -> np.ndarray:
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+class TermList:
+    """Sorted terms read lazily from terms.bin; supports len(), [i] and bisect."""
+
+    def __init__(self, path: str):
+        self._bytes = _map_bytes(os.path.join(path, TERMS_FILE))
+        self._offsets = np.load(os.path.join(path, TERM_OFFSETS_FILE), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self._bytes[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+
+class TermDictionary:
+    """
+        Sorted in-memory term dictionary. Because term ids follow the sorted order,
+        every prefix maps to one contiguous term-id range found with two binary searches.
+
+            dictionary.term_id("προεδρ")      -> 2385 or None
+            dictionary.prefix_range("προεδ")  -> (lo, hi), term ids lo..hi-1
+    """
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def term_id(self, term: str):
+        i = bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def prefix_range(self, prefix: str) -> tuple:
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + "\U0010FFFF", lo)
+        return lo, hi
+
+
+def index_exists(path: str) -> bool:
+    """True if `path` is a complete (segmented) index directory."""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(path: str, manifest: dict):
+    """Atomically replace the manifest (readers see the old or the new segment list, never half)."""
+    tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))
+
+
+class InvertedIndex:
+    """
+        Memory-mapped, compressed inverted index (written by PostingsWriter).
+
+        Opening only maps the files, so startup is immediate and only the postings
+        that are actually read are paged in.
+
+            index.term_id("προεδρ")  -> int or None
+            index.postings(term_id)  -> (doc_ids int64 array, tfs int64 array)
+            index.df[term_id]        -> document frequency
+
+        For code written against the old pickled dict it also behaves like a
+        read-only mapping word -> {doc_id: tf}.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.n_docs = meta["n_docs"]
+        self.n_terms = meta["n_terms"]
+        self.n_postings = meta["n_postings"]
+
+        self.terms = TermList(path)
+        self._dictionary = None
+        self.df = np.load(os.path.join(path, DF_FILE), mmap_mode="r")
+        self._docs = _map_bytes(os.path.join(path, DOCS_FILE))
+        self._tfs = _map_bytes(os.path.join(path, TFS_FILE))
+        self._doc_offsets = np.load(os.path.join(path, DOC_OFFSETS_FILE), mmap_mode="r")
+        self._tf_offsets = np.load(os.path.join(path, TF_OFFSETS_FILE), mmap_mode="r")
+
+        self._skips = np.load(os.path.join(path, SKIPS_FILE), mmap_mode="r")
+        self._skip_offsets = np.load(os.path.join(path, SKIP_OFFSETS_FILE), mmap_mode="r")
+        self.skip_interval = meta["skip_interval"]
+
+        # BM25 statistics
+        self.avgdl = meta.get("avgdl")
+        self.n_tokens = meta.get("n_tokens", 0)
+        self.bounds = None
+        self.doc_lengths = np.zeros((0, 2), dtype=np.int64)
+        if self.avgdl is not None:
+            self.bounds = np.load(os.path.join(path, BOUNDS_FILE), mmap_mode="r")
+            self.doc_lengths = np.load(os.path.join(path, DOC_LENGTHS_FILE))
+
+        self.has_positions = meta.get("positions", False)
+        # per-instance LRU of decoded {doc_id: tf} dicts (mapping interface); dropped with the index
+        self._postings_dict = lru_cache(maxsize=POSTINGS_DICT_CACHE)(self._build_postings_dict)
+        if self.has_positions:
+            self._positions = _map_bytes(os.path.join(path, POSITIONS_FILE))
+            self._pos_offsets = np.load(os.path.join(path, POS_OFFSETS_FILE), mmap_mode="r")
+
+    @property
+    def dictionary(self) -> TermDictionary:
+        """In-memory TermDictionary over the terms, loaded on first use."""
+        if self._dictionary is None:
+            self._dictionary = TermDictionary(self.terms[i] for i in range(self.n_terms))
+        return self._dictionary
+
+    def term_id(self, term: str):
+        """Id of `term`, or None if unknown."""
+        if self._dictionary is not None:
+            return self._dictionary.term_id(term)
+        i = bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def prefix_range(self, prefix: str) -> tuple:
+        """Contiguous term-id range (lo, hi) of all terms starting with `prefix`."""
+        return self.dictionary.prefix_range(prefix)
+
+    def postings(self, term_id: int) -> tuple:
+        """Decode the postings of one term: (doc_ids, tfs), doc_ids ascending."""
+        gaps = varint_decode(self._docs[self._doc_offsets[term_id]:self._doc_offsets[term_id + 1]])
+        tfs = varint_decode(self._tfs[self._tf_offsets[term_id]:self._tf_offsets[term_id + 1]])
+        return np.cumsum(gaps), tfs
+
+    def positions(self, term_id: int, tfs: np.ndarray) -> np.ndarray:
+        """
+            Token positions of one term (positional index only): for the i-th posting,
+            tfs[i] ascending positions, back to back (tfs as returned by postings()).
+        """
+        gaps = varint_decode(self._positions[self._pos_offsets[term_id]:self._pos_offsets[term_id + 1]])
+        return _restart_cumsum(gaps, tfs)
+
+    def lookup(self, term_id: int, doc_ids: np.ndarray) -> np.ndarray:
+        """
+            Term frequencies of one term in the given (ascending) documents, 0 where
+            the term does not occur. Only the skip blocks that can hold one of the
+            documents are decoded.
+        """
+        b0, b1 = int(self._skip_offsets[term_id]), int(self._skip_offsets[term_id + 1])
+        skips = np.asarray(self._skips[b0:b1])
+        result = np.zeros(len(doc_ids), dtype=np.int64)
+        block_of = np.searchsorted(skips[:, 0], doc_ids, side="left")
+        needed = np.unique(block_of[block_of < len(skips)])
+        if len(needed) == 0:
+            return result
+
+        df = int(self.df[term_id])
+        doc_ends = np.append(skips[1:, 1], self._doc_offsets[term_id + 1])
+        tf_ends = np.append(skips[1:, 2], self._tf_offsets[term_id + 1])
+        sizes = np.minimum(self.skip_interval, df - needed * self.skip_interval)  # postings per block
+
+        gaps = varint_decode(gather_groups(self._docs, skips[needed, 1], doc_ends[needed] - skips[needed, 1]))
+        tfs = varint_decode(gather_groups(self._tfs, skips[needed, 2], tf_ends[needed] - skips[needed, 2]))
+        # A block continues from the last doc id of the previous block (block 0 starts from 0)
+        bases = np.where(needed > 0, skips[np.maximum(needed - 1, 0), 0], 0)
+        docs = _restart_cumsum(gaps, sizes) + np.repeat(bases, sizes)
+
+        where = np.minimum(np.searchsorted(docs, doc_ids), len(docs) - 1)
+        found = docs[where] == doc_ids
+        result[found] = tfs[where[found]]
+        return result
+
+    def bound(self, term_id: int, avgdl: float) -> float:
+        """Upper bound of the BM25 tf part of the term's postings under `avgdl`."""
+        return bm25.scale_bound(float(self.bounds[term_id]), self.avgdl, avgdl)
+
+    # --- Term-string API (shared with SegmentedIndex) ---
+
+    def prefix_terms(self, prefix: str) -> list:
+        """All terms starting with `prefix`, sorted."""
+        lo, hi = self.prefix_range(prefix)
+        return self.dictionary.terms[lo:hi]
+
+    def doc_freq(self, term: str) -> int:
+        term_id = self.term_id(term)
+        return 0 if term_id is None else int(self.df[term_id])
+
+    def term_postings(self, term: str) -> tuple:
+        """(doc_ids, tfs) of `term`; empty arrays if the term is unknown."""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return self.postings(term_id)
+
+    def term_lookup(self, term: str, doc_ids: np.ndarray) -> np.ndarray:
+        """lookup() by term string."""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return np.zeros(len(doc_ids), dtype=np.int64)
+        return self.lookup(term_id, doc_ids)
+
+    def term_bound(self, term: str, avgdl: float) -> float:
+        term_id = self.term_id(term)
+        return 0.0 if term_id is None else self.bound(term_id, avgdl)
+
+    def term_positions(self, term: str) -> tuple:
+        """(doc_ids, tfs, positions) of `term`, see positions(); empty arrays if unknown."""
+        term_id = self.term_id(term)
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        docs, tfs = self.postings(term_id)
+        return docs, tfs, self.positions(term_id, tfs)
+
+    # --- Mapping interface (word -> {doc_id: tf}) ---
+
+    def __len__(self) -> int:
+        return self.n_terms
+
+    def __iter__(self):
+        for i in range(self.n_terms):
+            yield self.terms[i]
+
+    def keys(self):
+        return iter(self)
+
+    def __contains__(self, term) -> bool:
+        return self.term_id(term) is not None
+
+    def __getitem__(self, term: str) -> dict:
+        term_id = self.term_id(term)
+        if term_id is None:
+            raise KeyError(term)
+        return self._postings_dict(term_id)
+
+    def get(self, term: str, default=None):
+        term_id = self.term_id(term)
+        return default if term_id is None else self._postings_dict(term_id)
+
+    def _build_postings_dict(self, term_id: int) -> dict:
+        docs, tfs = self.postings(term_id)
+        return dict(zip(docs.tolist(), tfs.tolist()))
+
+
+class SegmentedIndex:
+    """
+        An index made of several InvertedIndex segments (see MANIFEST_FILE).
+
+        Segments cover disjoint, increasing document ranges, so a term's postings are
+        the concatenation of its postings in every segment, still sorted by doc id.
+        Collection statistics (n_docs, document frequency) are summed over segments.
+
+        Exposes the same term-string API as InvertedIndex (prefix_terms, doc_freq,
+        term_postings) and the same read-only mapping interface word -> {doc_id: tf}.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = os.stat(os.path.join(path, MANIFEST_FILE)).st_mtime_ns
+        manifest = read_manifest(path)
+        self.segment_info = manifest["segments"]
+        self.segments = [InvertedIndex(os.path.join(path, seg["name"])) for seg in self.segment_info]
+        self.n_docs = sum(seg.n_docs for seg in self.segments)
+        self.n_postings = sum(seg.n_postings for seg in self.segments)
+        self.n_tokens = sum(seg.n_tokens for seg in self.segments)
+        self.avgdl = self.n_tokens / self.n_docs if self.n_docs else 0.0
+        self._doc_length = None
+
+    def is_stale(self) -> bool:
+        """True if the manifest changed on disk since this index was opened."""
+        try:
+            return os.stat(os.path.join(self.path, MANIFEST_FILE)).st_mtime_ns != self.version
+        except OSError:
+            return False
+
+    def prefix_terms(self, prefix: str) -> list:
+        if len(self.segments) == 1:
+            return self.segments[0].prefix_terms(prefix)
+        return sorted(set().union(*(seg.prefix_terms(prefix) for seg in self.segments)))
+
+    def doc_freq(self, term: str) -> int:
+        return sum(seg.doc_freq(term) for seg in self.segments)
+
+    def term_postings(self, term: str) -> tuple:
+        parts = [seg.term_postings(term) for seg in self.segments]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([docs for docs, _ in parts]), np.concatenate([tfs for _, tfs in parts])
+
+    @property
+    def has_positions(self) -> bool:
+        return bool(self.segments) and all(seg.has_positions for seg in self.segments)
+
+    @property
+    def doc_length(self) -> np.ndarray:
+        """Number of tokens of every document, indexed by doc id (0 if not in the index)."""
+        if self._doc_length is None:
+            table = np.concatenate([seg.doc_lengths for seg in self.segments] or [np.zeros((0, 2), dtype=np.int64)])
+            self._doc_length = np.zeros(int(table[:, 0].max()) + 1 if len(table) else 0, dtype=np.int64)
+            self._doc_length[table[:, 0]] = table[:, 1]
+        return self._doc_length
+
+    def term_lookup(self, term: str, doc_ids: np.ndarray) -> np.ndarray:
+        """Term frequencies in the given ascending documents (segments hold disjoint documents)."""
+        result = np.zeros(len(doc_ids), dtype=np.int64)
+        for seg in self.segments:
+            result += seg.term_lookup(term, doc_ids)
+        return result
+
+    def term_bound(self, term: str, avgdl: float) -> float:
+        return max((seg.term_bound(term, avgdl) for seg in self.segments), default=0.0)
+
+    def term_positions(self, term: str) -> tuple:
+        parts = [seg.term_positions(term) for seg in self.segments]
+        if len(parts) == 1:
+            return parts[0]
+        return tuple(np.concatenate([part[i] for part in parts]) for i in range(3))
+
+    # --- Mapping interface (word -> {doc_id: tf}) ---
+
+    def __contains__(self, term) -> bool:
+        return any(term in seg for seg in self.segments)
+
+    def __getitem__(self, term: str) -> dict:
+        if term not in self:
+            raise KeyError(term)
+        result = {}
+        for seg in self.segments:
+            result.update(seg.get(term, {}))
+        return result
+
+    def get(self, term: str, default=None):
+        return self[term] if term in self else default
+
+    def __iter__(self):
+        if len(self.segments) == 1:
+            return iter(self.segments[0])
+        return iter(sorted(set().union(*(set(seg) for seg in self.segments))))
+
+    def keys(self):
+        return iter(self)
+
+    def __len__(self) -> int:
+        if len(self.segments) == 1:
+            return len(self.segments[0])
+        return sum(1 for _ in self)
+
+
+def sharded_index_exists(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, SHARDS_FILE))
+
+
+class ShardedIndex:
+    """
+        Year-sharded index: one SegmentedIndex per sitting year (see SHARDS_FILE).
+
+        Term statistics (prefix_terms, doc_freq, n_docs) are global, i.e. over all
+        shards, so scores do not depend on which shards a query reads; select()
+        returns the shards a year range has to read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = os.stat(os.path.join(path, SHARDS_FILE)).st_mtime_ns
+        with open(os.path.join(path, SHARDS_FILE), encoding="utf-8") as f:
+            listing = json.load(f)
+        self.shards = {info["year"]: SegmentedIndex(os.path.join(path, info["path"])) for info in listing["shards"]}
+        self.n_docs = sum(shard.n_docs for shard in self.shards.values())
+        self.n_tokens = sum(shard.n_tokens for shard in self.shards.values())
+        self.avgdl = self.n_tokens / self.n_docs if self.n_docs else 0.0
+
+    def is_stale(self) -> bool:
+        try:
+            if os.stat(os.path.join(self.path, SHARDS_FILE)).st_mtime_ns != self.version:
+                return True
+        except OSError:
+            return False
+        return any(shard.is_stale() for shard in self.shards.values())
+
+    def select(self, years: tuple = None) -> list:
+        """
+            Years of the shards covering the (first, last) year range. Every shard if None,
+            the undated one (year 0) included, like an unfiltered unsharded search; a year
+            range only selects dated shards.
+        """
+        if years is None:
+            return sorted(self.shards)
+        return [year for year in sorted(self.shards) if year > 0 and years[0] <= year <= years[1]]
+
+    def prefix_terms(self, prefix: str) -> list:
+        return sorted(set().union(*(shard.prefix_terms(prefix) for shard in self.shards.values())))
+
+    def doc_freq(self, term: str) -> int:
+        return sum(shard.doc_freq(term) for shard in self.shards.values())
+
+    @property
+    def has_positions(self) -> bool:
+        return all(shard.has_positions for shard in self.shards.values() if shard.segments)
@@ -3,13 +3,46 @@ import unicodedata
 from greek_stemmer import GreekStemmer
 import spacy
 from spacy.lang.el.stop_words import STOP_WORDS
+from stem_cache import StemCache, STEM_CACHE_DB
 
 stemmer = GreekStemmer()
 
-try:
-    nlp = spacy.load("el_core_news_sm")
-except:
-    raise RuntimeError("Download: python -m spacy el_core_news_sm")
+# Shared token -> stem cache built by data_cleaning. Queries read it (read-only) but never
+# write to disk; stems of unseen tokens are only kept in its in-memory LRU layer.
+_stem_cache = None  # opened on the first query, so importing this module touches no file
+
+_tokenizer = None  # blank Greek pipeline (tokenizer only), created on first query
+_nlp = None        # full el_core_news_sm pipeline, loaded only when really needed
+
+
+def get_stem_cache() -> StemCache:
+    """Return the query-side read-only StemCache (STEM_CACHE_DB), opened on first use."""
+    global _stem_cache
+    if _stem_cache is None:
+        _stem_cache = StemCache(STEM_CACHE_DB, readonly=True)
+    return _stem_cache
+
+
+def get_tokenizer():
+    """
+        Return a tokenizer-only Greek pipeline. It uses the same language
+        tokenization rules as el_core_news_sm but no tagger/parser/NER.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        _tokenizer = spacy.blank("el")
+    return _tokenizer
+
+
+def get_nlp():
+    """Return the full el_core_news_sm pipeline, loading it on first use."""
+    global _nlp
+    if _nlp is None:
+        try:
+            _nlp = spacy.load("el_core_news_sm")
+        except OSError:
+            raise RuntimeError("Download: python -m spacy el_core_news_sm")
+    return _nlp
 
 
 def remove_accents(word: str) -> str:
@@ -80,16 +113,20 @@ def stem_query_word(word: str, pos: str) -> str:
         return ""
 
 
-def process_query(text: str) -> list:
+def process_query(text: str, fast: bool = True) -> list:
     """
         Full query preprocessing pipeline:
           - tokenize input text with spaCy
-          - clean each token
-          - try to stem, else fallback to lemma
+          - reuse the cached stem of tokens seen before (stem_cache)
+          - otherwise clean each token and try to stem, else fallback to lemma
+            (only stems and dropped tokens are cached: the lemma depends on context)
           - return list of normalized tokens
 
         Args:
             text: raw query string
+            fast: if True, tokenize only (no tagger/parser/NER). The full model is
+                  loaded and run only if a token cannot be stemmed and needs its lemma.
+                  If False, run the full el_core_news_sm pipeline on every query.
 
         Returns:
             List[str]: processed token list
@@ -97,18 +134,82 @@ def process_query(text: str) -> list:
         Example:
             process_query("Ο Πρόεδρος αγοράζει βιβλία") -> ["προεδρ", "αγοραζ", "βιβλι"]
     """
-    doc = nlp(text.replace('\xa0', ' '))
+    text = text.replace('\xa0', ' ')
+    doc = get_tokenizer()(text) if fast else get_nlp()(text)
+    lemmas = None  # char offset -> lemma, from the full pipeline (fast mode fallback)
     tokens = []
+    stem_cache = get_stem_cache()
 
     for token in doc:
         raw = token.text
+        cached = stem_cache.get(raw)
+        if cached is not None:
+            if cached:  # "" marks a token that is dropped (stopword, symbol, ...)
+                tokens.append(cached)
+            continue
+
         cleaned = clean_query_word(raw)
         if not cleaned:
+            stem_cache[raw] = ""
             continue
 
         stemmed = stem_query_word(cleaned, token.pos_)
-        if not stemmed:
-            stemmed = token.lemma_.lower()
-        tokens.append(stemmed)
+        if stemmed:
+            stem_cache[raw] = stemmed  # depends on the token text only
+        else:
+            # the lemma depends on the token's context (and the full pipeline may split
+            # the text differently): used for this query only, never cached
+            if fast:
+                if lemmas is None:
+                    lemmas = {t.idx: t.lemma_ for t in get_nlp()(text)}
+                stemmed = lemmas.get(token.idx, "").lower()
+            else:
+                stemmed = token.lemma_.lower()
+        if stemmed:
+            tokens.append(stemmed)
 
     return tokens
+
+
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+NEAR_PATTERN = re.compile(r'(\S+)\s+NEAR/(\d+)\s+(\S+)')
+
+
+def parse_query(text: str, fast: bool = True) -> tuple:
+    """
+        Split a query into free-text tokens and positional clauses.
+
+        Supported syntax:
+            "δημόσιο χρέος"         phrase: the stems must appear consecutively
+                                    (stopwords do not count, they are not indexed)
+            ανεργία NEAR/5 νέων     both words within 5 indexed tokens, any order
+        Everything else is processed with process_query as before.
+
+        Returns:
+            (tokens, clauses):
+                tokens:  List[str], stems of the free text
+                clauses: List[dict], {"type": "phrase", "terms": [stems]} or
+                         {"type": "near", "terms": [stem_a, stem_b], "k": int}
+
+        Example:
+            parse_query('"δημόσιο χρέος" ανεργία')
+                -> (["ανεργ"], [{"type": "phrase", "terms": ["δημοσ", "χρε"]}])
+    """
+    clauses = []
+
+    def take_phrase(match):
+        terms = process_query(match.group(1), fast=fast)
+        if terms:
+            clauses.append({"type": "phrase", "terms": terms})
+        return " "
+
+    def take_near(match):
+        left = process_query(match.group(1), fast=fast)
+        right = process_query(match.group(3), fast=fast)
+        if left and right:
+            clauses.append({"type": "near", "terms": [left[0], right[0]], "k": int(match.group(2))})
+        return " "
+
+    text = PHRASE_PATTERN.sub(take_phrase, text)
+    text = NEAR_PATTERN.sub(take_near, text)
+    return process_query(text, fast=fast), clauses
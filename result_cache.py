@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 2048    # Max cached queries
+TTL_SECONDS = 600     # Entries older than this are recomputed
+
+
+def artifact_version(*paths) -> tuple:
+    """
+        Version stamp of on-disk artifacts: (path, mtime_ns, size) of every path that exists.
+        Any rebuild, append or merge of the DB / index files changes it.
+    """
+    version = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            version.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append((path, None, None))
+    return tuple(version)
+
+
+class ResultCache:
+    """
+        In-process cache of query results with LRU + TTL eviction.
+
+            cache.get(key, version)          -> value or None
+            cache.put(key, version, value)
+
+        `version` describes the artifacts the results were computed from (see
+        artifact_version); when it differs from the cached one every entry is dropped.
+
+        Args:
+            max_items: max entries kept (least recently used are evicted first)
+            ttl: seconds an entry stays valid
+    """
+
+    def __init__(self, max_items: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (time stored, value)
+        self._version = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the counters."""
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored, value = entry
+            if time.monotonic() - stored > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "lookups": lookups,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_items,
+            "ttl_seconds": self.ttl,
+        }
@@ -0,0 +1,535 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import bm25
+from postings import SegmentedIndex, ShardedIndex
+from metadata_index import DocMetadata, Bitmap
+
+MAX_PREFIX_TERMS = 100  # Max vocabulary terms a query token expands to by prefix
+FILTER_DRIVEN_RATIO = 8  # Score the filtered documents directly when the query postings outnumber them this much
+
+
+def resolve_terms(index: SegmentedIndex, token: str) -> list:
+    """
+        Terms matched by a query token: the token itself and every term it is a
+        prefix of (what `keyword = ? OR keyword LIKE 'tok%'` used to match).
+        The prefix range comes from the sorted term dictionary. Very short tokens can
+        match thousands of terms, so only the MAX_PREFIX_TERMS most frequent are kept
+        (an exact match is always kept).
+    """
+    terms = index.prefix_terms(token)
+    if len(terms) > MAX_PREFIX_TERMS:
+        df = np.asarray([index.doc_freq(term) for term in terms])
+        by_df = [terms[i] for i in np.argsort(-df, kind="stable")]
+        kept = by_df[:MAX_PREFIX_TERMS]
+        if token in terms and token not in kept:
+            kept[-1] = token
+        terms = kept
+    return terms
+
+
+def query_terms(index, tokens: list) -> list:
+    """
+        Weighted terms of a query: [(term, idf), ...] for every term matched by every
+        token, with the BM25 IDF (bm25.idf) from the collection statistics of `index`.
+    """
+    weighted = []
+    for token in tokens:
+        for term in resolve_terms(index, token):
+            weighted.append((term, bm25.idf(index.n_docs, index.doc_freq(term))))
+    return weighted
+
+
+def score_terms(index: SegmentedIndex, weighted_terms: list, avgdl: float, bitmap: Bitmap = None) -> tuple:
+    """
+        Exhaustive BM25: sum idf * bm25.tf_part over every posting of the weighted terms.
+        With a filter `bitmap` the postings outside it are dropped before scoring.
+
+        Returns:
+            (doc_ids, scores): numpy arrays, doc_ids ascending
+    """
+    all_docs, all_weights = [], []
+    for term, idf in weighted_terms:
+        docs, tfs = index.term_postings(term)
+        if bitmap is not None and len(docs):
+            keep = bitmap.contains(docs)
+            docs, tfs = docs[keep], tfs[keep]
+        if len(docs):
+            all_docs.append(docs)
+            all_weights.append(idf * bm25.tf_part(tfs, index.doc_length[docs], avgdl))
+
+    if not all_docs:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    doc_ids, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(all_weights))
+    return doc_ids, scores
+
+
+def score_documents(index: SegmentedIndex, tokens: list) -> tuple:
+    """
+        BM25 score of every document matching at least one query token, summed over
+        all matched terms of all tokens. N, df and avgdl are taken over all segments
+        of the index.
+
+        Returns:
+            (doc_ids, scores): numpy arrays, doc_ids ascending
+    """
+    return score_terms(index, query_terms(index, tokens), index.avgdl)
+
+
+def _kth_score(scores: np.ndarray, k: int) -> float:
+    """k-th largest score, -inf while there are fewer than k."""
+    if len(scores) < k:
+        return -np.inf
+    return float(np.partition(scores, len(scores) - k)[len(scores) - k])
+
+
+def maxscore_top_k(index: SegmentedIndex, metadata: DocMetadata, weighted_terms: list, filters: dict, k: int,
+                   avgdl: float) -> list:
+    """
+        BM25 top-k with MaxScore dynamic pruning.
+
+        Every term has an upper bound on its score (idf * its max tf part, stored per
+        term in the index). Terms are processed from the highest bound down while
+        keeping the k-th best partial score theta (a lower bound of the final k-th score):
+            1) While the bounds of the unprocessed terms sum to at least theta, a document
+               not seen yet could still reach the top k: decode the whole postings list.
+            2) Afterwards no new document can: drop the candidates whose partial score plus
+               the remaining bounds is below theta, and look up only the survivors in the
+               remaining (low-idf, long) lists through their skip blocks.
+        Postings are intersected with the filter bitmap (DocMetadata.filter_bitmap) before
+        scoring, so theta stays a valid bound. When the filter keeps far fewer documents
+        than the query postings hold (FILTER_DRIVEN_RATIO), e.g. a single MP, phase 1 is
+        skipped: the filtered documents of the index are the candidates from the start.
+
+        Returns:
+            list of (doc_id, score), best first (same ranking as exhaustive scoring)
+    """
+    terms = sorted(((term, idf, idf * index.term_bound(term, avgdl)) for term, idf in weighted_terms),
+                   key=lambda t: -t[2])
+    remaining = np.cumsum([bound for _, _, bound in terms][::-1])[::-1]  # bounds of terms i..end
+    doc_length = index.doc_length
+    bitmap = metadata.filter_bitmap(filters)
+
+    cand_docs = np.zeros(0, dtype=np.int64)
+    cand_scores = np.zeros(0, dtype=np.float64)
+    theta = -np.inf
+    i = 0
+    filter_driven = len(bitmap) * FILTER_DRIVEN_RATIO < sum(index.doc_freq(term) for term, _, _ in terms)
+    if filter_driven:
+        cand_docs = bitmap.to_array()
+        cand_docs = cand_docs[cand_docs < len(doc_length)]
+        cand_docs = cand_docs[doc_length[cand_docs] > 0]
+        cand_scores = np.zeros(len(cand_docs), dtype=np.float64)
+        matched = np.zeros(len(cand_docs), dtype=bool)
+        theta = _kth_score(cand_scores, k)
+
+    while not filter_driven and i < len(terms) and remaining[i] >= theta:
+        term, idf, _ = terms[i]
+        docs, tfs = index.term_postings(term)
+        keep = bitmap.contains(docs)
+        docs, tfs = docs[keep], tfs[keep]
+        weights = idf * bm25.tf_part(tfs, doc_length[docs], avgdl)
+        cand_docs, inverse = np.unique(np.concatenate((cand_docs, docs)), return_inverse=True)
+        cand_scores = np.bincount(inverse, weights=np.concatenate((cand_scores, weights)), minlength=len(cand_docs))
+        theta = _kth_score(cand_scores, k)
+        i += 1
+
+    while i < len(terms):
+        term, idf, _ = terms[i]
+        keep = cand_scores + remaining[i] >= theta
+        cand_docs, cand_scores = cand_docs[keep], cand_scores[keep]
+        tfs = index.term_lookup(term, cand_docs)
+        hit = tfs > 0
+        cand_scores[hit] += idf * bm25.tf_part(tfs[hit], doc_length[cand_docs[hit]], avgdl)
+        if filter_driven:
+            matched = matched[keep] | hit
+        theta = _kth_score(cand_scores, k)
+        i += 1
+
+    if filter_driven:  # filtered documents without any query term are not results
+        cand_docs, cand_scores = cand_docs[matched], cand_scores[matched]
+    return top_k(cand_docs, cand_scores, k)
+
+
+def top_k(doc_ids: np.ndarray, scores: np.ndarray, k: int) -> list:
+    """The k best (doc_id, score) pairs, by score descending then doc_id ascending."""
+    if len(doc_ids) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        # include every document tied with the k-th score so the doc_id tie-break is exact
+        keep = np.flatnonzero(scores >= scores[keep].min())
+        doc_ids, scores = doc_ids[keep], scores[keep]
+    order = np.lexsort((doc_ids, -scores))[:k]
+    return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+
+def search(index: SegmentedIndex, metadata: DocMetadata, tokens: list, filters: dict, k: int = 10,
+           clauses: list = None) -> list:
+    """
+        Rank documents for the processed query tokens.
+
+        Args:
+            index: the memory-mapped (segmented) inverted index
+            metadata: per-document year/party/member arrays
+            tokens: output of query_processing.process_query
+            filters: output of DocMetadata.parse_filters
+            k: number of results
+            clauses: phrase / NEAR clauses from query_processing.parse_query; every
+                     result must match all of them (see score_clauses)
+
+        Returns:
+            list of (doc_id, score), best first
+
+        Notes:
+            Ranked by BM25 (bm25.py). Without clauses the top k comes from
+            maxscore_top_k, which skips most postings of frequent terms.
+    """
+    tokens, clauses = positional_fallback(index, tokens, clauses)
+    weighted_terms = query_terms(index, tokens)
+    if not clauses:
+        return maxscore_top_k(index, metadata, weighted_terms, filters, k, index.avgdl)
+
+    # Clauses restrict the results to their matches: score those exhaustively
+    matches = [match_clause(index, clause) for clause in clauses]
+    idfs = clause_idfs(index.n_docs, [len(docs) for docs, _ in matches])
+    doc_ids, scores = score_all(index, weighted_terms, index.avgdl, metadata.filter_bitmap(filters), matches, idfs)
+    return top_k(doc_ids, scores, k)
+
+
+def score_all(index: SegmentedIndex, weighted_terms: list, avgdl: float, bitmap: Bitmap, matches: list = None,
+              idfs: list = None) -> tuple:
+    """
+        Exhaustive scores of every result inside the filter `bitmap`: the free-text
+        BM25 scores, restricted to and completed by the clause matches if there are any.
+
+        Returns:
+            (doc_ids, scores): numpy arrays, doc_ids ascending
+    """
+    doc_ids, scores = score_terms(index, weighted_terms, avgdl, bitmap)
+    if matches:
+        doc_ids, scores = score_clauses(index, doc_ids, scores, matches, idfs, avgdl, bitmap)
+    return doc_ids, scores
+
+
+# --- Phrase and proximity queries over the positional layer ---
+
+POSITION_STRIDE = 1 << 32  # key = doc_id * POSITION_STRIDE + position
+
+
+def positional_fallback(index, tokens: list, clauses: list) -> tuple:
+    """Without a positional layer, clauses degrade to their stems as free-text tokens."""
+    if not clauses or index.has_positions:
+        return tokens, clauses or []
+    return tokens + [term for clause in clauses for term in clause["terms"]], []
+
+
+def _position_keys(postings: tuple, docs: np.ndarray, shift: int = 0) -> np.ndarray:
+    """doc_id * POSITION_STRIDE + position - shift for every position of the postings in `docs`."""
+    doc_ids, tfs, positions = postings
+    keep = np.repeat(np.isin(doc_ids, docs, assume_unique=True), tfs)
+    return np.repeat(doc_ids, tfs)[keep] * POSITION_STRIDE + positions[keep] - shift
+
+
+def match_phrase(index, terms: list) -> tuple:
+    """
+        Documents where `terms` occur consecutively.
+
+        The document lists are intersected first; then, inside the remaining documents,
+        a position p of terms[i] is shifted to p - i, so an occurrence of the phrase is
+        a key present in the position lists of all terms.
+
+        Returns:
+            (doc_ids, counts): matching documents (ascending) and phrase occurrences in each
+    """
+    postings = [index.term_positions(term) for term in terms]
+    docs = postings[0][0]
+    for doc_ids, _, _ in postings[1:]:
+        docs = np.intersect1d(docs, doc_ids, assume_unique=True)
+    if len(terms) == 1:
+        return postings[0][0], postings[0][1]
+    if len(docs) == 0:
+        return docs, np.zeros(0, dtype=np.int64)
+
+    keys = _position_keys(postings[0], docs)
+    for i, term_postings in enumerate(postings[1:], start=1):
+        keys = np.intersect1d(keys, _position_keys(term_postings, docs, shift=i), assume_unique=True)
+    return np.unique(keys // POSITION_STRIDE, return_counts=True)
+
+
+def match_near(index, term_a: str, term_b: str, k: int) -> tuple:
+    """
+        Documents where `term_a` and `term_b` occur at most k positions apart (any order).
+
+        For every position of term_a the positions of term_b in [p - k, p + k] are
+        counted with two binary searches over the sorted term_b keys.
+
+        Returns:
+            (doc_ids, counts): matching documents (ascending) and the number of
+            term_a occurrences with term_b nearby
+    """
+    postings_a, postings_b = index.term_positions(term_a), index.term_positions(term_b)
+    docs = np.intersect1d(postings_a[0], postings_b[0], assume_unique=True)
+    if len(docs) == 0:
+        return docs, np.zeros(0, dtype=np.int64)
+    keys_a, keys_b = _position_keys(postings_a, docs), _position_keys(postings_b, docs)
+    near = np.searchsorted(keys_b, keys_a + k, side="right") - np.searchsorted(keys_b, keys_a - k, side="left")
+    if term_a == term_b:
+        near -= 1  # an occurrence is not near itself
+    return np.unique(keys_a[near > 0] // POSITION_STRIDE, return_counts=True)
+
+
+def match_clause(index, clause: dict) -> tuple:
+    """(doc_ids, counts) of a clause from query_processing.parse_query."""
+    if clause["type"] == "near":
+        return match_near(index, clause["terms"][0], clause["terms"][1], clause["k"])
+    return match_phrase(index, clause["terms"])
+
+
+def clause_idfs(n_docs: int, dfs: list) -> list:
+    """BM25 IDF of every clause, with df = number of matching documents (None if it matches nothing)."""
+    return [bm25.idf(n_docs, df) if df else None for df in dfs]
+
+
+def score_clauses(index: SegmentedIndex, doc_ids: np.ndarray, scores: np.ndarray, matches: list, idfs: list,
+                  avgdl: float, bitmap: Bitmap = None) -> tuple:
+    """
+        Restrict the free-text scores to the documents matching every clause (and the
+        filter `bitmap`, if given) and add the clause scores, weighted like a term with
+        tf = number of occurrences.
+    """
+    if any(idf is None for idf in idfs):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    required = matches[0][0]
+    for clause_docs, _ in matches[1:]:
+        required = np.intersect1d(required, clause_docs, assume_unique=True)
+    if bitmap is not None:
+        required = required[bitmap.contains(required)]
+
+    total = np.zeros(len(required), dtype=np.float64)
+    where = np.searchsorted(doc_ids, required)
+    found = where < len(doc_ids)
+    found[found] = doc_ids[where[found]] == required[found]
+    total[found] += scores[where[found]]
+    lengths = index.doc_length[required]
+    for (clause_docs, counts), idf in zip(matches, idfs):
+        total += idf * bm25.tf_part(counts[np.searchsorted(clause_docs, required)], lengths, avgdl)
+    return required, total
+
+
+# --- Year-sharded search: fan out to the shards of the year range, merge the top-k lists ---
+
+SEARCH_THREADS = 8  # Shards searched in parallel
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS)
+    return _executor
+
+
+def search_shard(shard: SegmentedIndex, metadata: DocMetadata, weighted_terms: list, filters: dict, k: int,
+                 avgdl: float, matches: list = None, idfs: list = None) -> list:
+    """
+        Top-k of one shard for already weighted query terms and clause matches, under
+        the global avgdl (the unit of work of a fan-out).
+    """
+    if not matches:
+        return maxscore_top_k(shard, metadata, weighted_terms, filters, k, avgdl)
+    doc_ids, scores = score_all(shard, weighted_terms, avgdl, metadata.filter_bitmap(filters), matches, idfs)
+    return top_k(doc_ids, scores, k)
+
+
+def search_sharded(index: ShardedIndex, metadata: DocMetadata, tokens: list, filters: dict, k: int = 10,
+                   clauses: list = None) -> list:
+    """
+        Same ranking as search(), over a year-sharded index.
+
+        Query terms and IDF weights come from the global statistics, only the shards
+        inside filters["years"] are read, in parallel, and their partial top-k lists
+        are merged. Every document lives in exactly one shard and keeps its exact
+        score, so the merged top-k equals the unsharded one.
+
+        Clauses need their global document frequency, so they are matched on every
+        shard (in parallel); the shards outside the year range only contribute counts.
+    """
+    tokens, clauses = positional_fallback(index, tokens, clauses)
+    weighted_terms = query_terms(index, tokens)
+    if not weighted_terms and not clauses:
+        return []
+    executor = _get_executor()
+    matches, idfs = sharded_matches(index, clauses)
+
+    partial = list(executor.map(
+        lambda year: search_shard(index.shards[year], metadata, weighted_terms, filters, k, index.avgdl,
+                                   matches[year], idfs),
+        index.select(filters.get("years"))))
+
+    merged = [hit for hits in partial for hit in hits]
+    if not merged:
+        return []
+    doc_ids = np.asarray([doc_id for doc_id, _ in merged], dtype=np.int64)
+    scores = np.asarray([score for _, score in merged], dtype=np.float64)
+    return top_k(doc_ids, scores, k)
+
+
+def sharded_matches(index: ShardedIndex, clauses: list) -> tuple:
+    """
+        Clause matches of every shard (in parallel) and the clause IDFs from their
+        global document frequency: ({year: matches or None}, idfs or None).
+    """
+    if not clauses:
+        return {year: None for year in index.shards}, None
+    years = list(index.shards)
+    matched = _get_executor().map(lambda year: [match_clause(index.shards[year], clause) for clause in clauses], years)
+    matches = dict(zip(years, matched))
+    dfs = [sum(len(matches[year][c][0]) for year in years) for c in range(len(clauses))]
+    return matches, clause_idfs(index.n_docs, dfs)
+
+
+# --- Deep pages and exports ---
+
+def rank_all(index, metadata: DocMetadata, tokens: list, filters: dict, clauses: list = None) -> tuple:
+    """
+        Every result of the query, with the scores and order of search() / search_sharded()
+        (score descending, then doc_id ascending). Exhaustive: used for exports, where
+        the whole ranking is needed anyway.
+
+        Returns:
+            (doc_ids, scores): numpy arrays in ranking order
+    """
+    tokens, clauses = positional_fallback(index, tokens, clauses)
+    weighted_terms = query_terms(index, tokens)
+    bitmap = metadata.filter_bitmap(filters)
+    if hasattr(index, "shards"):  # ShardedIndex or a SharedTermView of one
+        matches, idfs = sharded_matches(index, clauses)
+        parts = list(_get_executor().map(
+            lambda year: score_all(index.shards[year], weighted_terms, index.avgdl, bitmap, matches[year], idfs),
+            index.select(filters.get("years"))))
+    else:
+        matches = [match_clause(index, clause) for clause in clauses]
+        idfs = clause_idfs(index.n_docs, [len(docs) for docs, _ in matches])
+        parts = [score_all(index, weighted_terms, index.avgdl, bitmap, matches, idfs)]
+
+    if not parts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+    doc_ids = np.concatenate([docs for docs, _ in parts]).astype(np.int64)
+    scores = np.concatenate([part_scores for _, part_scores in parts])
+    order = np.lexsort((doc_ids, -scores))
+    return doc_ids[order], scores[order]
+
+
+def rank_position(doc_ids: np.ndarray, scores: np.ndarray, after: tuple) -> int:
+    """
+        Number of ranked results placed at or before the cursor `after` = (score, doc_id)
+        under the (score descending, doc_id ascending) order of top_k, i.e. where the
+        page after the cursor starts. One vectorized count over the ranking arrays.
+    """
+    score, doc_id = after
+    return int(np.count_nonzero((scores > score) | ((scores == score) & (doc_ids <= doc_id))))
+
+
+# --- Facets: the full match set of a query, unranked ---
+
+def match_set(index, tokens: list, clauses: list = None) -> np.ndarray:
+    """
+        Every document search() could return for the query, ignoring filters and k:
+        the documents matching all clauses if there are any, otherwise those matching
+        at least one query term. Over a year-sharded index every shard is read (the
+        year facet covers all years). Input of DocMetadata.facet_counts.
+
+        Returns:
+            doc_ids, ascending
+    """
+    tokens, clauses = positional_fallback(index, tokens, clauses)
+    if hasattr(index, "shards"):  # ShardedIndex or a SharedTermView of one
+        weighted_terms = query_terms(index, tokens)
+        parts = list(_get_executor().map(lambda shard: _shard_match_set(shard, weighted_terms, clauses),
+                                         index.shards.values()))
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+    return _shard_match_set(index, query_terms(index, tokens), clauses)
+
+
+def _shard_match_set(index: SegmentedIndex, weighted_terms: list, clauses: list) -> np.ndarray:
+    if clauses:
+        matches = [match_clause(index, clause)[0] for clause in clauses]
+        docs = matches[0]
+        for clause_docs in matches[1:]:
+            docs = np.intersect1d(docs, clause_docs, assume_unique=True)
+        return docs.astype(np.int64)
+    lists = [index.term_postings(term)[0] for term, _ in weighted_terms]
+    return np.unique(np.concatenate(lists)).astype(np.int64) if lists else np.zeros(0, dtype=np.int64)
+
+
+# --- Batches: one view of the index shared by many queries ---
+
+class SharedTermView:
+    """
+        Read-through view of a SegmentedIndex (or ShardedIndex) shared by the queries of
+        one batch: prefix expansion, document frequencies and decoded postings are
+        computed once per term and reused by every query that needs them. Skip-block
+        lookups of a term whose postings are already decoded become binary searches.
+        Everything else is delegated to the wrapped index.
+
+        The memo dicts are filled from several threads; two threads may decode the same
+        term once each, which only costs time.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        if hasattr(index, "shards"):
+            self.shards = {year: SharedTermView(shard) for year, shard in index.shards.items()}
+        self._prefix_terms = {}
+        self._doc_freq = {}
+        self._postings = {}
+        self._sorted = {}
+        self._positions = {}
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+    def prefix_terms(self, prefix: str) -> list:
+        terms = self._prefix_terms.get(prefix)
+        if terms is None:
+            terms = self._prefix_terms[prefix] = self.index.prefix_terms(prefix)
+        return terms
+
+    def doc_freq(self, term: str) -> int:
+        df = self._doc_freq.get(term)
+        if df is None:
+            df = self._doc_freq[term] = self.index.doc_freq(term)
+        return df
+
+    def term_postings(self, term: str) -> tuple:
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings[term] = self.index.term_postings(term)
+        return postings
+
+    def term_lookup(self, term: str, doc_ids: np.ndarray) -> np.ndarray:
+        postings = self._postings.get(term)
+        if postings is None or not self._ascending(term):
+            return self.index.term_lookup(term, doc_ids)
+        docs, tfs = postings
+        result = np.zeros(len(doc_ids), dtype=np.int64)
+        if len(docs):
+            where = np.minimum(np.searchsorted(docs, doc_ids), len(docs) - 1)
+            found = docs[where] == doc_ids
+            result[found] = tfs[where[found]]
+        return result
+
+    def _ascending(self, term: str) -> bool:
+        """Whether the memoized postings of `term` are in doc_id order (segments concatenated in order)."""
+        ascending = self._sorted.get(term)
+        if ascending is None:
+            docs = self._postings[term][0]
+            ascending = self._sorted[term] = bool(np.all(docs[1:] > docs[:-1]))
+        return ascending
+
+    def term_positions(self, term: str) -> tuple:
+        positions = self._positions.get(term)
+        if positions is None:
+            positions = self._positions[term] = self.index.term_positions(term)
+        return positions
@@ -0,0 +1,173 @@
+import bisect
+import numpy as np
+from LSI import DOC_IDS_FILE, LSI_TERMS_FILE, LSI_TERM_TOPICS_FILE, LSI_DOCS_FILE, LSI_TERM_IDF_FILE
+from metadata_index import DocMetadata
+from search_engine import top_k, MAX_PREFIX_TERMS
+
+CHUNK_ROWS = 65536  # LSI rows multiplied per step (65536 × K=100 float32 = 25 MB)
+
+# Hybrid search (LSISearcher.rerank)
+HYBRID_CANDIDATES = 200  # lexical (BM25) candidates reranked with the LSI cosine
+RRF_K = 60               # reciprocal rank fusion: score = sum 1 / (RRF_K + rank)
+HYBRID_WEIGHT = 0.5      # weighted fusion: (1 - w) * BM25 / max BM25 + w * cosine
+
+
+class LSISearcher:
+    """
+        Semantic search in the LSI space (see LSI.perform_lsi).
+
+        A processed query is a bag of stems, weighted like the speech rows of the
+        TF-IDF matrix ((1 + log tf) * idf, see tf_idf) into a vector q that is folded in
+        as q @ V_k, the same map that takes a TF-IDF row to its LSI row (U_k * S_k), and
+        speeches are ranked by cosine similarity to it.
+
+        Attributes:
+            terms:       TF-IDF column -> keyword
+            idf:         float64 [terms], log(1 + N / df) of every keyword
+            term_topics: float32 [terms × K], V_k (memory-mapped)
+            docs:        float32 [speeches × K], unit-length LSI rows (memory-mapped)
+            doc_ids:     row -> doc_id
+    """
+
+    def __init__(self):
+        with open(LSI_TERMS_FILE, encoding="utf-8") as f:
+            self.terms = f.read().split("\n")[:-1]
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.idf = np.load(LSI_TERM_IDF_FILE)
+        self.term_topics = np.load(LSI_TERM_TOPICS_FILE, mmap_mode="r")
+        self.docs = np.load(LSI_DOCS_FILE, mmap_mode="r")
+        self.doc_ids = np.load(DOC_IDS_FILE).astype(np.int64)
+
+    def query_term_ids(self, tokens: list) -> list:
+        """
+            LSI columns of the query stems: the stem itself if it is a keyword, otherwise
+            the keywords it is a prefix of, like /search (search_engine.resolve_terms):
+            at most MAX_PREFIX_TERMS, the most frequent ones (lowest idf) first.
+        """
+        ids = []
+        for token in tokens:
+            if token in self.term_ids:
+                ids.append(self.term_ids[token])
+                continue
+            lo = bisect.bisect_left(self.terms, token)
+            hi = bisect.bisect_left(self.terms, token + "\U0010FFFF")
+            if hi - lo > MAX_PREFIX_TERMS:
+                ids.extend((lo + np.argsort(self.idf[lo:hi], kind="stable")[:MAX_PREFIX_TERMS]).tolist())
+            else:
+                ids.extend(range(lo, hi))
+        return ids
+
+    def fold_query(self, tokens: list) -> np.ndarray:
+        """Unit-length K-dim query vector (float32), None if no token is in the LSI vocabulary."""
+        ids = self.query_term_ids(tokens)
+        if not ids:
+            return None
+        columns, counts = np.unique(ids, return_counts=True)
+        weights = ((1 + np.log(counts)) * self.idf[columns]).astype(np.float32)
+        vector = weights @ np.asarray(self.term_topics[columns])
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def search(self, tokens: list, metadata: DocMetadata, filters: dict, k: int = 10, ann=None, **ann_options) -> list:
+        """
+            Top-k speeches by cosine similarity to the folded query.
+
+            The memory-mapped LSI matrix is read CHUNK_ROWS rows at a time and each
+            chunk is one float32 matrix-vector product. With year / party / member
+            filters only the rows of matching speeches are read (DocMetadata.filter_bitmap).
+            Without filters, an `ann` index (ann_index.IVFPQIndex) answers instead of
+            the full scan; `ann_options` (n_probe, rerank) go to its search().
+
+            Returns:
+                list of (doc_id, cosine), best first
+        """
+        query = self.fold_query(tokens)
+        if query is None:
+            return []
+        return self.search_vector(query, metadata, filters, k, ann=ann, **ann_options)
+
+    def row_of(self, doc_id: int):
+        """LSI row of a doc_id, None if the speech has no LSI vector."""
+        row = int(np.searchsorted(self.doc_ids, doc_id))
+        return row if row < len(self.doc_ids) and self.doc_ids[row] == doc_id else None
+
+    def rerank(self, candidates: list, tokens: list, k: int = 10, fusion: str = "rrf",
+               weight: float = HYBRID_WEIGHT) -> list:
+        """
+            Hybrid ranking: lexical candidates re-scored with their LSI cosine to the folded query.
+
+            The candidates' rows are gathered from the memory-mapped LSI matrix in one
+            sorted fancy-index read and scored with one matrix-vector product.
+
+            Args:
+                candidates: (doc_id, BM25) pairs, best first (e.g. the /search top HYBRID_CANDIDATES)
+                tokens: query stems, folded with fold_query
+                fusion: "rrf"      -> 1 / (RRF_K + lexical rank) + 1 / (RRF_K + LSI rank)
+                        "weighted" -> (1 - weight) * BM25 / max BM25 + weight * max(cosine, 0)
+                weight: LSI share of the weighted fusion, in [0, 1]
+
+            Returns:
+                list of (doc_id, fused score), best first; speeches without an LSI
+                vector rank last on the LSI side. Without a foldable query the
+                lexical order is kept.
+        """
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"unknown fusion '{fusion}'")
+        query = self.fold_query(tokens)
+        if query is None or not candidates:
+            return candidates[:k]
+
+        doc_ids = np.fromiter((doc_id for doc_id, _ in candidates), dtype=np.int64, count=len(candidates))
+        lexical = np.fromiter((score for _, score in candidates), dtype=np.float64, count=len(candidates))
+        rows = np.minimum(np.searchsorted(self.doc_ids, doc_ids), len(self.doc_ids) - 1)
+        has_vector = self.doc_ids[rows] == doc_ids
+
+        cosine = np.full(len(doc_ids), -1.0)
+        present = np.flatnonzero(has_vector)
+        order = present[np.argsort(rows[present], kind="stable")]  # ascending rows: sequential memmap reads
+        cosine[order] = np.asarray(self.docs[rows[order]]) @ query
+
+        if fusion == "rrf":
+            lexical_rank = np.arange(len(doc_ids))
+            lsi_rank = np.empty(len(doc_ids), dtype=np.int64)
+            lsi_rank[np.lexsort((doc_ids, -cosine))] = np.arange(len(doc_ids))
+            fused = 1.0 / (RRF_K + 1 + lexical_rank) + 1.0 / (RRF_K + 1 + lsi_rank)
+        else:
+            top = lexical.max()
+            fused = (1.0 - weight) * (lexical / top if top > 0 else lexical) + weight * np.maximum(cosine, 0.0)
+        return top_k(doc_ids, fused, k)
+
+    def search_vector(self, query: np.ndarray, metadata: DocMetadata, filters: dict, k: int = 10,
+                      exclude_row: int = None, ann=None, **ann_options) -> list:
+        """search() for a unit-length LSI vector (e.g. a speech's own row, see row_of)."""
+        filtered = any(filters.get(name) is not None for name in ("years", "party_id", "member_id"))
+        if ann is not None and not filtered:
+            rows, scores = ann.search(query, k, exclude=exclude_row, **ann_options)
+            return [(int(self.doc_ids[row]), float(score)) for row, score in zip(rows, scores)]
+
+        rows = np.flatnonzero(metadata.filter_mask(self.doc_ids, filters)) if filtered else None
+
+        n_rows = len(self.doc_ids) if rows is None else len(rows)
+        best_rows, best_scores = [], []
+        for start in range(0, n_rows, CHUNK_ROWS):
+            if rows is None:
+                chunk_rows = np.arange(start, min(start + CHUNK_ROWS, n_rows))
+                block = np.asarray(self.docs[start:start + CHUNK_ROWS])
+            else:
+                chunk_rows = rows[start:start + CHUNK_ROWS]
+                block = np.asarray(self.docs[chunk_rows])
+            scores = block @ query
+            if exclude_row is not None:
+                keep = chunk_rows != exclude_row
+                chunk_rows, scores = chunk_rows[keep], scores[keep]
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k - 1)[:k]
+                keep = np.flatnonzero(scores >= scores[keep].min())  # keep ties for the doc_id tie-break
+                chunk_rows, scores = chunk_rows[keep], scores[keep]
+            best_rows.append(chunk_rows)
+            best_scores.append(scores)
+
+        if not best_rows:
+            return []
+        rows = np.concatenate(best_rows)
+        return top_k(self.doc_ids[rows], np.concatenate(best_scores).astype(np.float64), k)
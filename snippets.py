@@ -0,0 +1,74 @@
+import numpy as np
+from corpus import Corpus
+
+SNIPPET_BYTES = 1000   # UTF-8 bytes read per snippet (~500 Greek characters, like the old 600-char excerpt)
+WINDOW_TOKENS = 30     # indexed tokens in the window that has to cover the query terms
+MAX_HITS = 2000        # query-term occurrences considered per speech when picking the window
+
+
+def _char_offsets(data: bytes, byte_offsets: np.ndarray) -> np.ndarray:
+    """Byte offsets into UTF-8 `data` -> character offsets into data.decode()."""
+    is_start = (np.frombuffer(data, dtype=np.uint8) & 0xC0) != 0x80
+    chars_before = np.concatenate(([0], np.cumsum(is_start)))
+    return chars_before[np.clip(byte_offsets, 0, len(data))]
+
+
+def best_window(hit_positions: np.ndarray, hit_terms: np.ndarray, window: int = WINDOW_TOKENS) -> tuple:
+    """
+        Token window [first, last] with the most distinct query terms, then the most
+        occurrences (earliest on ties), among windows starting at a query-term occurrence.
+    """
+    best, best_key = (int(hit_positions[0]), int(hit_positions[0])), (-1, -1)
+    ends = np.searchsorted(hit_positions, hit_positions + window, side="left")
+    for i, end in enumerate(ends.tolist()):
+        key = (len(np.unique(hit_terms[i:end])), end - i)
+        if key > best_key:
+            best_key, best = key, (int(hit_positions[i]), int(hit_positions[end - 1]))
+    return best
+
+
+def make_snippet(corpus: Corpus, row: int, term_ids: np.ndarray, max_bytes: int = SNIPPET_BYTES) -> dict:
+    """
+        Query-aware excerpt of one speech.
+
+        The token window covering the most query terms is located in the stored token
+        ids, mapped to its byte range through the token spans (Corpus.doc_spans), and
+        only `max_bytes` of text around its centre are read from the corpus.
+
+        Args:
+            corpus: the columnar corpus
+            row: row of the speech in the corpus
+            term_ids: vocabulary ids of the query terms (after prefix expansion)
+
+        Returns:
+            {"text": excerpt, "highlights": [[start, end], ...]} with character offsets
+            of the query-term occurrences inside "text"; None if the corpus has no
+            spans for this speech (the caller falls back to the start of the speech).
+    """
+    spans = corpus.doc_spans(row)
+    if spans is None or (len(spans) and spans[0, 0] < 0):
+        return None
+    text_length = int(corpus.text_offsets[row + 1] - corpus.text_offsets[row])
+
+    tokens = np.asarray(corpus.doc_tokens(row))
+    hits = np.flatnonzero(np.isin(tokens, term_ids))[:MAX_HITS]
+    if len(hits):
+        first, last = best_window(hits, tokens[hits])
+        centre = (int(spans[first, 0]) + int(spans[last, 1])) // 2
+    else:
+        centre = 0
+    start = max(0, min(centre - max_bytes // 2, text_length - max_bytes))
+    end = min(text_length, start + max_bytes)
+
+    # Characters cut at either end of the range are dropped by the decoder; _char_offsets
+    # only counts UTF-8 lead bytes, so the highlight offsets agree with the decoded text.
+    data = corpus.speech_bytes(row, start, end)
+
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if end < text_length else ""
+    inside = hits[(spans[hits, 0] >= start) & (spans[hits, 1] <= end)]
+    offsets = _char_offsets(data, spans[inside].astype(np.int64) - start) + len(prefix)
+    return {
+        "text": prefix + data.decode("utf-8", errors="ignore") + suffix,
+        "highlights": offsets.tolist(),
+    }
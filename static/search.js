@@ -18,6 +18,20 @@ document.addEventListener('DOMContentLoaded', function () {
     return text.replace(rx, "<mark>$1</mark>");
   }
 
+  function escapeHtml(str){
+    return String(str).replace(/[&<>"']/g, c => ({"&":"&amp;","<":"&lt;",">":"&gt;",'"':"&quot;","'":"&#39;"}[c]));
+  }
+  // Mark the [start, end) character spans sent by the server (query terms inside the snippet)
+  function highlightSpans(text, spans){
+    let html = "", last = 0;
+    for (const [start, end] of spans) {
+      if (start < last) continue;
+      html += escapeHtml(text.slice(last, start)) + "<mark>" + escapeHtml(text.slice(start, end)) + "</mark>";
+      last = end;
+    }
+    return html + escapeHtml(text.slice(last));
+  }
+
   async function populateSelect(selectEl, url, allLabel) {
     try {
       const res = await fetch(url);
@@ -110,7 +124,8 @@ document.addEventListener('DOMContentLoaded', function () {
             <span style="opacity:.7;">– ${item.date}</span>
             <span style="margin-left:auto; font-size:.9rem; opacity:.8;">Score: ${item.score}</span>
           </div>
-          <p style="margin-top:8px;">${highlight(item.speech, query)}</p>
+          <p style="margin-top:8px;">${Array.isArray(item.highlights) && item.highlights.length
+            ? highlightSpans(item.speech, item.highlights) : highlight(item.speech, query)}</p>
         `;
         searchResults.appendChild(card);
       }
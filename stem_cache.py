@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+STEM_CACHE_DB = "stem_cache.db"  # Persistent raw token -> stem map, shared by cleaning and queries
+STEM_TABLE = "token_stems"       # context-free stems only (the older "stems" table also held lemma fallbacks)
+LRU_SIZE = 200000                # Max tokens kept in memory
+FLUSH_EVERY = 5000               # New entries buffered before they are written to disk
+
+
+class StemCache:
+    """
+        Persistent raw token -> normalized stem cache with a bounded in-memory LRU layer.
+
+        Behaves like the plain `dictionary` that clean_text() used to receive:
+            cache.get(token)      -> stem or None
+            cache[token] = stem
+
+        Lookups go memory (LRU) -> SQLite file -> miss. New stems are buffered and
+        written in batches; call flush() (or close()) to persist the remainder.
+
+        Callers must only store values that depend on the token text alone (not on
+        its sentence context): entries are shared by every process and run, and the
+        first write of a token wins (INSERT OR IGNORE).
+
+        Args:
+            path: SQLite file holding the cache
+            max_items: size of the in-memory LRU layer
+            readonly: if True, new stems are only kept in memory (used by the query path);
+                      the file is opened read-only and never created, and without it
+                      the cache is the in-memory LRU alone
+    """
+
+    def __init__(self, path: str = STEM_CACHE_DB, max_items: int = LRU_SIZE, readonly: bool = False):
+        self.path = path
+        self.max_items = max_items
+        self.readonly = readonly
+
+        if readonly:
+            self._conn = None
+            if os.path.isfile(path):
+                self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+                if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                      (STEM_TABLE,)).fetchone() is None:
+                    self._conn.close()  # written before STEM_TABLE existed: nothing to read
+                    self._conn = None
+        else:
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {STEM_TABLE} (token TEXT PRIMARY KEY, stem TEXT NOT NULL)")
+            self._conn.commit()
+
+        self._lru = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the hit/miss counters."""
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, token: str, stem: str):
+        self._lru[token] = stem
+        self._lru.move_to_end(token)
+        if len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def get(self, token: str, default=None):
+        with self._lock:
+            stem = self._lru.get(token)
+            if stem is not None:
+                self._lru.move_to_end(token)
+                self.memory_hits += 1
+                return stem
+
+            row = None
+            if self._conn is not None:
+                row = self._conn.execute(f"SELECT stem FROM {STEM_TABLE} WHERE token = ?", (token,)).fetchone()
+            if row is not None:
+                self._remember(token, row[0])
+                self.disk_hits += 1
+                return row[0]
+
+            self.misses += 1
+            return default
+
+    def __setitem__(self, token: str, stem: str):
+        with self._lock:
+            self._remember(token, stem)
+            if self.readonly:
+                return
+            self._pending[token] = stem
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush_pending()
+
+    def _flush_pending(self):
+        if not self._pending:
+            return
+        self._conn.executemany(f"INSERT OR IGNORE INTO {STEM_TABLE} (token, stem) VALUES (?, ?)",
+                               list(self._pending.items()))
+        self._conn.commit()
+        self._pending.clear()
+
+    def flush(self):
+        """Write buffered new stems to disk."""
+        with self._lock:
+            self._flush_pending()
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        """
+            Return the cache counters since the last reset_stats():
+                { memory_hits, disk_hits, misses, lookups, hit_rate, memory_items }
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "lookups": lookups,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "memory_items": len(self._lru)
+        }
+
+
+def format_stats(stats: dict) -> str:
+    """One-line human readable version of StemCache.stats()."""
+    return (f"stem cache: {stats['hit_rate']:.1%} hit rate "
+            f"({stats['memory_hits']} memory, {stats['disk_hits']} disk, {stats['misses']} misses)")
+
+
+def merge_stats(stats_list) -> dict:
+    """Add up the counters of several stats() snapshots (e.g. one per worker shard)."""
+    total = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+    for stats in stats_list:
+        for key in total:
+            total[key] += stats[key]
+    lookups = sum(total.values())
+    total["lookups"] = lookups
+    total["hit_rate"] = round((total["memory_hits"] + total["disk_hits"]) / lookups, 4) if lookups else 0.0
+    return total
@@ -0,0 +1,86 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from corpus import Corpus, CorpusWriter
+
+FRAME = pd.DataFrame({
+    "document_id": [0, 1, 2, 3],
+    "speech": ["Ευχαριστώ κύριε Πρόεδρε!", "Το δημόσιο χρέος", "", "Κύριε Πρόεδρε, το χρέος"],
+    "cleaned_speech": ["ευχαριστ προεδρ", "δημοσ χρε", "", "προεδρ χρε"],
+    "member_name": ["member a", None, "member b", "member a"],
+    "political_party": ["party a", "party b", None, "party a"],
+    "sitting_date": ["24/07/2020", "01/02/1999", "not a date", None],
+})
+
+
+def _label(name):
+    return name if isinstance(name, str) else None  # missing labels are NaN in the frame
+
+
+def _assert_matches_frame(corpus, df):
+    assert len(corpus) == len(df)
+    assert corpus.document_id.tolist() == df["document_id"].tolist()
+    for i, row in enumerate(df.itertuples()):
+        assert corpus.doc_terms(i) == row.cleaned_speech.split()
+        assert corpus.speech(i) == row.speech
+        member, party = corpus.member[i], corpus.party[i]
+        assert (corpus.member_names[member] if member >= 0 else None) == _label(row.member_name)
+        assert (corpus.party_names[party] if party >= 0 else None) == _label(row.political_party)
+    assert corpus.doc_lengths.tolist() == [len(s.split()) for s in df["cleaned_speech"]]
+
+
+def test_corpus_round_trip(tmp_path):
+    path = str(tmp_path / "corpus")
+    writer = CorpusWriter(path)
+    writer.add_frame(FRAME.iloc[:2])
+    writer.add_frame(FRAME.iloc[2:])
+    writer.close()
+
+    corpus = Corpus(path)
+    _assert_matches_frame(corpus, FRAME)
+    assert corpus.date.tolist() == [20200724, 19990201, 0, 0]
+    assert corpus.years.tolist() == [2020, 1999, 0, 0]
+    assert corpus.speech_bytes(1, 3, 10) == "Το δημόσιο χρέος".encode("utf-8")[3:10]
+
+    matrix = corpus.term_frequency_matrix(block_docs=3)
+    for i, cleaned in enumerate(FRAME["cleaned_speech"]):
+        row = matrix.getrow(i)
+        assert {corpus.vocab[t]: n for t, n in zip(row.indices, row.data)} == Counter(cleaned.split())
+
+
+def test_corpus_stores_token_spans_as_byte_offsets(tmp_path):
+    path = str(tmp_path / "corpus")
+    df = FRAME.iloc[:2].copy()
+    df["token_spans"] = [np.array([[0, 9], [16, 23]]), np.array([[3, 10], [11, 16]])]
+    writer = CorpusWriter(path)
+    writer.add_frame(df)
+    writer.close()
+
+    corpus = Corpus(path)
+    for i, spans in enumerate(df["token_spans"]):
+        speech = df["speech"].iloc[i]
+        words = [speech[start:end] for start, end in spans]
+        assert [corpus.speech_bytes(i, start, end).decode("utf-8") for start, end in corpus.doc_spans(i)] == words
+
+
+def test_writer_resumes_from_state_and_appends(tmp_path):
+    path = str(tmp_path / "corpus")
+    writer = CorpusWriter(path)
+    writer.add_frame(FRAME.iloc[:2])
+    state = writer.state()
+    writer.add_frame(FRAME.iloc[2:3])  # lost in a crash after a flush
+    writer.flush()
+
+    writer = CorpusWriter(path, resume_state=state)
+    writer.add_frame(FRAME.iloc[2:3])
+    writer.close()
+    _assert_matches_frame(Corpus(path), FRAME.iloc[:3])
+
+    reader = Corpus(path)
+    writer = CorpusWriter(path, append=True)
+    writer.add_frame(FRAME.iloc[3:])
+    writer.close()
+    assert len(reader) == 3  # open readers keep their view
+    _assert_matches_frame(Corpus(path), FRAME)
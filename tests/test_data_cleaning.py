@@ -0,0 +1,86 @@
+import multiprocessing.pool
+import os
+
+import pandas as pd
+import pytest
+
+import data_cleaning
+from corpus import Corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CSV = os.path.join(ROOT, "Greek_Parliament_Proceedings_1989_2020_DataSample.csv")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the ingest in an empty directory on the first 25 speeches of the bundled sample."""
+    pd.read_csv(SAMPLE_CSV, nrows=25).to_csv(tmp_path / "raw.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_cleaning, "FILEPATH", "raw.csv")
+    monkeypatch.setattr(data_cleaning, "_stem_cache", None)
+    return tmp_path
+
+
+def _corpus_docs(path):
+    corpus = Corpus(path)
+    return [corpus.doc_terms(i) for i in range(len(corpus))]
+
+
+def test_streaming_ingest_resumes_after_a_crash(workdir, monkeypatch):
+    data_cleaning.process_dataset_streaming(chunk_size=8, workers=1, resume=False)
+    expected = pd.read_csv(data_cleaning.OUTPUT_FILE)
+    expected_docs = _corpus_docs(data_cleaning.CORPUS_DIR)
+    os.remove(data_cleaning.OUTPUT_FILE)
+
+    clean_speeches = data_cleaning.clean_speeches
+    calls = []
+
+    def crash_on_third_chunk(speeches, **kwargs):
+        calls.append(len(speeches))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return clean_speeches(speeches, **kwargs)
+
+    monkeypatch.setattr(data_cleaning, "clean_speeches", crash_on_third_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        data_cleaning.process_dataset_streaming(chunk_size=8, workers=1)
+    assert not os.path.exists(data_cleaning.OUTPUT_FILE)
+    assert os.path.exists(data_cleaning.CHECKPOINT_FILE)
+
+    calls.clear()
+    data_cleaning.process_dataset_streaming(chunk_size=8, workers=1)
+    assert calls == [8, 1]  # only the unfinished chunks are cleaned again
+    pd.testing.assert_frame_equal(pd.read_csv(data_cleaning.OUTPUT_FILE), expected)
+    assert _corpus_docs(data_cleaning.CORPUS_DIR) == expected_docs
+    assert not os.path.exists(data_cleaning.CHECKPOINT_FILE)
+
+
+def test_streaming_ingest_without_speeches_writes_header_only(workdir):
+    raw = pd.read_csv("raw.csv")
+    raw["speech"] = None
+    raw.to_csv("raw.csv", index=False)
+    data_cleaning.process_dataset_streaming(chunk_size=8, workers=1, resume=False)
+
+    cleaned = pd.read_csv(data_cleaning.OUTPUT_FILE)
+    assert cleaned.empty
+    assert cleaned.columns[-2:].tolist() == ["document_id", "cleaned_speech"]
+    assert not os.path.exists(data_cleaning.CHECKPOINT_FILE)
+
+
+def test_streaming_ingest_shares_one_pool(workdir, monkeypatch):
+    data_cleaning.process_dataset_streaming(chunk_size=8, workers=1, resume=False)
+    expected = pd.read_csv(data_cleaning.OUTPUT_FILE)
+
+    created = []
+
+    class CountingPool(multiprocessing.pool.Pool):
+        def __init__(self, *args, **kwargs):
+            created.append(kwargs.get("processes"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(data_cleaning, "Pool", CountingPool)
+    data_cleaning.process_dataset_streaming(chunk_size=8, workers=2, resume=False)
+
+    assert created == [2]  # 4 chunks, one pool
+    pd.testing.assert_frame_equal(pd.read_csv(data_cleaning.OUTPUT_FILE), expected)
+    assert not os.path.exists(data_cleaning.CHECKPOINT_FILE)
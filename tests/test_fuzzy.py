@@ -0,0 +1,124 @@
+import random
+
+import numpy as np
+import pytest
+
+import fuzzy
+from fuzzy import MIN_FUZZY_LENGTH, StemMatcher, edit_distances, max_edits
+
+LETTERS = "αβγδεζηθικλμνξοπρστυφχψω"
+
+
+def _osa(a, b):
+    """Reference optimal string alignment distance (textbook DP)."""
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+def _typo(rng, word):
+    """One random substitution, insertion, deletion or adjacent transposition."""
+    i = rng.randrange(len(word))
+    kind = rng.choice(["sub", "ins", "del", "swap"])
+    if kind == "sub":
+        return word[:i] + rng.choice(LETTERS) + word[i + 1:]
+    if kind == "ins":
+        return word[:i] + rng.choice(LETTERS) + word[i:]
+    if kind == "del" or i == len(word) - 1:
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+@pytest.mark.parametrize("alphabet", ["ab", "abc", LETTERS])
+def test_edit_distances_match_reference(alphabet):
+    rng = random.Random(len(alphabet))
+    for _ in range(30):
+        word = "".join(rng.choices(alphabet, k=rng.randint(0, 8)))
+        candidates = ["".join(rng.choices(alphabet, k=rng.randint(0, 9))) for _ in range(40)] + [word[::-1], ""]
+        assert edit_distances(word, candidates).tolist() == [_osa(word, c) for c in candidates]
+    assert edit_distances("αβγ", []).tolist() == []
+    assert edit_distances("πολιτ", ["πολιτ", "ποιλτ", "πολτι", "λοπιτ"]).tolist() == [0, 1, 1, 2]
+
+
+@pytest.fixture(scope="module")
+def vocabulary():
+    rng = random.Random(22)
+    terms = sorted({"".join(rng.choices(LETTERS[:12], k=rng.randint(3, 9))) for _ in range(1000)})
+    df = np.asarray([rng.randint(1, 50) for _ in terms])
+    return terms, df, StemMatcher(terms, df)
+
+
+def _brute_force(terms, df, token):
+    """Every stem within the edit budget as (distance, -df, term), best first."""
+    if len(token) < MIN_FUZZY_LENGTH:
+        return []
+    edits = max_edits(token)
+    close = [(_osa(token, term), -int(n), term) for term, n in zip(terms, df)
+             if abs(len(term) - len(token)) <= edits]  # the distance is at least the length difference
+    return sorted(item for item in close if item[0] <= edits)
+
+
+def _typo_tokens(terms, seed):
+    rng = random.Random(seed)
+    return [_typo(rng, _typo(rng, term)) for term in rng.sample(terms, 80)] + rng.sample(terms, 10)
+
+
+def test_suggest_matches_brute_force(vocabulary, monkeypatch):
+    terms, df, matcher = vocabulary
+    monkeypatch.setattr(fuzzy, "MAX_CANDIDATES", len(terms))  # exact: every stem passing the filters is scored
+    suggested = 0
+    for token in _typo_tokens(terms, 5):
+        got = matcher.suggest(token)
+        assert [(s["distance"], -s["df"], s["term"]) for s in got] == _brute_force(terms, df, token)[:3]
+        suggested += bool(got)
+    assert suggested > 50
+    # short tokens: stems sharing none of the padded n-grams are still found
+    assert [s["term"] for s in StemMatcher(["ζλβ", "ζβλμν"], [1, 1]).suggest("ζβλ")] == ["ζλβ"]
+
+
+def test_suggest_with_candidate_cap_finds_the_closest_stems(vocabulary):
+    terms, df, matcher = vocabulary
+    found = total = 0
+    for token in _typo_tokens(terms, 6):
+        expected = _brute_force(terms, df, token)
+        got = matcher.suggest(token)
+        assert all(s["distance"] == _osa(token, s["term"]) <= max_edits(token) for s in got)
+        if expected:
+            total += 1
+            found += bool(got) and got[0]["distance"] == expected[0][0]
+    assert found >= 0.95 * total
+
+
+def test_suggest_budget_and_short_tokens(vocabulary):
+    matcher = StemMatcher(["δημοσ", "δημοσι", "χρε", "πολιτ"], [40, 10, 5, 7])
+    assert [s["term"] for s in matcher.suggest("δημοσ")] == ["δημοσ", "δημοσι"]
+    assert matcher.suggest("δημοσ", edits=0) == [{"term": "δημοσ", "distance": 0, "df": 40}]
+    assert [s["term"] for s in matcher.suggest("πολτι")] == ["πολιτ"]  # one transposition
+    assert matcher.suggest("χρ") == []  # shorter than MIN_FUZZY_LENGTH
+    assert StemMatcher([], []).suggest("δημοσ") == []
+
+
+def test_from_index_sums_document_frequencies():
+    class Leaf(list):
+        def __init__(self, terms, df):
+            super().__init__(terms)
+            self.df = np.asarray(df)
+
+    class Segmented:
+        def __init__(self, *segments):
+            self.segments = list(segments)
+
+    class Sharded:
+        def __init__(self, **shards):
+            self.shards = shards
+
+    index = Sharded(a=Segmented(Leaf(["βουλ", "χρε"], [3, 1]), Leaf(["βουλ"], [2])),
+                    b=Segmented(Leaf(["αγροτ", "χρε"], [4, 6])))
+    matcher = StemMatcher.from_index(index)
+    assert matcher.terms == ["αγροτ", "βουλ", "χρε"]
+    assert matcher.df.tolist() == [4, 5, 7]
+    assert len(StemMatcher.from_index(Sharded())) == 0
@@ -0,0 +1,157 @@
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+import metadata_index
+from metadata_index import ARRAY_MAX, Bitmap, DocMetadata
+
+YEARS = [2001, 2002, 2003, 2004]
+MEMBERS = [f"member {i}" for i in range(8)]
+PARTIES = ["party A", "party B", "party C"]
+
+
+@pytest.fixture
+def metadata(tmp_path):
+    """DocMetadata over a DB of 500 speeches (doc_ids with gaps, random year / member)."""
+    rng = random.Random(5)
+    rows = []
+    for doc_id in sorted(rng.sample(range(200000), 500)):  # spans several bitmap chunks
+        member = rng.randrange(len(MEMBERS))
+        rows.append((doc_id, rng.choice(YEARS), member % len(PARTIES), member))
+    db_path = str(tmp_path / "parliament.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE parties (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE members (id INTEGER PRIMARY KEY, full_name TEXT)")
+        conn.execute("CREATE TABLE speeches (doc_id INTEGER PRIMARY KEY, year INTEGER, party_id INTEGER, "
+                     "member_id INTEGER)")
+        conn.executemany("INSERT INTO parties VALUES (?, ?)", enumerate(PARTIES))
+        conn.executemany("INSERT INTO members VALUES (?, ?)", enumerate(MEMBERS))
+        conn.executemany("INSERT INTO speeches VALUES (?, ?, ?, ?)", rows)
+    return DocMetadata(db_path), rows
+
+
+def _filtered(rows, years=None, party_id=None, member_id=None):
+    return sorted(doc_id for doc_id, year, party, member in rows
+                  if (years is None or years[0] <= year <= years[1])
+                  and (party_id is None or party == party_id) and (member_id is None or member == member_id))
+
+
+def test_filter_bitmap_matches_rows(metadata):
+    meta, rows = metadata
+    for years in [None, (2002, 2003), (1990, 2002), (2004, 2050), (1950, 1960)]:
+        for party_id in [None, 0, 2, -1]:
+            filters = {"years": years, "party_id": party_id, "member_id": None}
+            assert meta.filter_bitmap(filters).to_array().tolist() == _filtered(rows, years, party_id)
+
+
+def test_filter_bitmap_cache_is_bounded_and_clamped(metadata, monkeypatch):
+    meta, rows = metadata
+    monkeypatch.setattr(metadata_index, "FILTER_CACHE_SIZE", 4)
+
+    # equivalent ranges (clamped to 2001-2004) share one entry
+    first = meta.filter_bitmap({"years": (1900, 2002), "party_id": None, "member_id": None})
+    assert meta.filter_bitmap({"years": (2001, 2002), "party_id": None, "member_id": None}) is first
+    assert meta.filter_bitmap({"years": (1, 2002), "party_id": None, "member_id": None}) is first
+    assert len(meta._filter_bitmaps) == 1
+
+    # ranges without any speech all map to the same empty entry
+    assert len(meta.filter_bitmap({"years": (1800, 1900), "party_id": None, "member_id": None})) == 0
+    assert len(meta.filter_bitmap({"years": (2100, 2200), "party_id": None, "member_id": None})) == 0
+    assert len(meta._filter_bitmaps) == 2
+
+    # many distinct combinations: only the last FILTER_CACHE_SIZE are kept
+    for member_id in range(len(MEMBERS)):
+        meta.filter_bitmap({"years": (2002, 2004), "party_id": None, "member_id": member_id})
+    assert len(meta._filter_bitmaps) == 4
+    assert list(meta._filter_bitmaps)[-1] == ((2002, 2004), None, len(MEMBERS) - 1)
+    assert meta.filter_bitmap({"years": (2002, 2004), "party_id": None, "member_id": 0}).to_array().tolist() == \
+        _filtered(rows, (2002, 2004), member_id=0)
+
+
+def _random_ids(rng, chunks, dense):
+    """Doc ids over the given 2^16 chunks: a few per chunk, or more than ARRAY_MAX (bitmap containers)."""
+    per_chunk = 3 * ARRAY_MAX if dense else 50
+    return np.concatenate([chunk * 65536 + rng.choice(65536, per_chunk, replace=False) for chunk in chunks])
+
+
+@pytest.mark.parametrize("dense_a, dense_b", [(False, False), (True, False), (False, True), (True, True)])
+def test_bitmap_set_operations_match_python_sets(dense_a, dense_b):
+    rng = np.random.default_rng(int(dense_a) * 2 + int(dense_b))
+    ids_a = _random_ids(rng, [0, 1, 3, 7], dense_a)
+    ids_b = np.concatenate([_random_ids(rng, [1, 3, 5], dense_b), ids_a[::3]])  # some overlap in every chunk
+    a, b = Bitmap(ids_a), Bitmap(ids_b)
+    set_a, set_b = set(ids_a.tolist()), set(ids_b.tolist())
+
+    assert a.to_array().tolist() == sorted(set_a) and len(a) == len(set_a)
+    for got, expected in [(a & b, set_a & set_b), (a | b, set_a | set_b), (a - b, set_a - set_b),
+                          (b - a, set_b - set_a), (a - a, set())]:
+        assert got.to_array().tolist() == sorted(expected)
+        assert len(got) == len(expected)
+
+    probe = np.concatenate([ids_a[:100], ids_b[-100:], rng.integers(0, 9 * 65536, 1000)])
+    difference = set_a - set_b
+    assert (a - b).contains(probe).tolist() == [doc_id in difference for doc_id in probe.tolist()]
+    assert Bitmap([]).to_array().tolist() == [] and len(Bitmap([]) | Bitmap([])) == 0
+
+
+def test_group_builds_one_bitmap_per_value():
+    doc_ids = np.arange(0, 300000, 7)
+    values = doc_ids % 5
+    groups = Bitmap.group(doc_ids, values)
+    assert sorted(groups) == [0, 1, 2, 3, 4]
+    for value, bitmap in groups.items():
+        assert bitmap.to_array().tolist() == doc_ids[values == value].tolist()
+
+
+def _facets(rows, doc_ids, filters):
+    """facet_counts by brute force: each facet applies every filter except its own."""
+    wanted = set(doc_ids)
+    hits = [row for row in rows if row[0] in wanted]
+
+    def passes(row, skip):
+        _, year, party, member = row
+        years = filters["years"]
+        return ((skip == "year" or years is None or years[0] <= year <= years[1])
+                and (skip == "party" or filters["party_id"] is None or party == filters["party_id"])
+                and (skip == "member" or filters["member_id"] is None or member == filters["member_id"]))
+
+    def counted(column, skip):
+        counts = {}
+        for row in hits:
+            if passes(row, skip):
+                counts[row[column]] = counts.get(row[column], 0) + 1
+        return counts
+
+    return {
+        "total": sum(passes(row, None) for row in hits),
+        "party": counted(2, "party"),
+        "year": counted(1, "year"),
+        "member": counted(3, "member"),
+    }
+
+
+@pytest.mark.parametrize("filters", [
+    {"years": None, "party_id": None, "member_id": None},
+    {"years": (2002, 2003), "party_id": None, "member_id": None},
+    {"years": None, "party_id": 1, "member_id": None},
+    {"years": (2001, 2001), "party_id": 0, "member_id": 3},
+    {"years": (1950, 1960), "party_id": None, "member_id": None},
+])
+def test_facet_counts_match_brute_force(metadata, filters):
+    meta, rows = metadata
+    rng = random.Random(7)
+    doc_ids = sorted(rng.sample([row[0] for row in rows], 300)) + [200001, 10 ** 7]  # the last two are not in the DB
+    expected = _facets(rows, doc_ids, filters)
+
+    facets = meta.facet_counts(np.asarray(doc_ids), filters, top_members=3)
+    assert facets["total"] == expected["total"]
+    assert {entry["name"]: entry["count"] for entry in facets["party"]} == \
+        {PARTIES[party]: n for party, n in expected["party"].items()}
+    assert [(entry["year"], entry["count"]) for entry in facets["year"]] == sorted(expected["year"].items())
+    top = sorted(expected["member"].items(), key=lambda item: (-item[1], item[0]))[:3]
+    assert [(entry["name"], entry["count"]) for entry in facets["member"]] == \
+        [(MEMBERS[member], n) for member, n in top]
+    counts = [entry["count"] for entry in facets["party"]]
+    assert counts == sorted(counts, reverse=True)
@@ -0,0 +1,120 @@
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from corpus import CorpusWriter
+import inverted_index
+from inverted_index import add_segment, build_inverted_index, merge_segments
+from postings import SKIP_INTERVAL, SegmentedIndex, varint_decode, varint_encode
+
+WORDS = ["βουλ", "κυβερνησ", "νομοσχεδ", "υπουργ", "πολιτ", "οικονομ", "δημοσ", "χρε", "ανεργ", "εξωτερ"]
+DOC_ID_STEP = 37  # document_ids with gaps, so most gaps take more than one varint byte
+
+
+def _write_corpus(path, speeches, first_doc=0, append=False):
+    writer = CorpusWriter(path, append=append)
+    writer.add_frame(pd.DataFrame({
+        "document_id": [(first_doc + i) * DOC_ID_STEP for i in range(len(speeches))],
+        "cleaned_speech": [" ".join(tokens) for tokens in speeches],
+        "speech": [" ".join(tokens) for tokens in speeches],
+        "member_name": "member", "political_party": "party", "sitting_date": "01/01/2001",
+    }))
+    writer.close()
+
+
+def _random_speeches(rng, n):
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    return [rng.choices(WORDS, weights=weights, k=rng.randint(1, 40)) for _ in range(n)]
+
+
+def _brute_force(speeches):
+    """term -> {doc_id: [positions]}"""
+    index = {}
+    for i, tokens in enumerate(speeches):
+        for position, term in enumerate(tokens):
+            index.setdefault(term, {}).setdefault(i * DOC_ID_STEP, []).append(position)
+    return index
+
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    """1500 random speeches (frequent terms span many skip blocks) in a positional index."""
+    speeches = _random_speeches(random.Random(4), 1500)
+    root = tmp_path_factory.mktemp("postings")
+    _write_corpus(str(root / "corpus"), speeches)
+    build_inverted_index(str(root / "index"), str(root / "corpus"), positions=True)
+    return speeches, SegmentedIndex(str(root / "index"))
+
+
+def test_varint_round_trip():
+    values = np.array([0, 1, 127, 128, 16383, 16384, 2 ** 31 - 1, 2 ** 40, 5], dtype=np.int64)
+    assert varint_decode(varint_encode(values)).tolist() == values.tolist()
+
+
+def test_postings_round_trip(built):
+    speeches, index = built
+    expected = _brute_force(speeches)
+    assert sorted(index.keys()) == sorted(expected)
+    assert max(len(postings) for postings in expected.values()) > 4 * SKIP_INTERVAL
+
+    for term, postings in expected.items():
+        assert index.doc_freq(term) == len(postings)
+        doc_ids, tfs, positions = index.term_positions(term)
+        assert doc_ids.tolist() == sorted(postings)
+        assert tfs.tolist() == [len(postings[d]) for d in sorted(postings)]
+        assert positions.tolist() == [p for d in sorted(postings) for p in postings[d]]
+        assert index[term] == {d: len(p) for d, p in postings.items()}
+
+
+def test_skip_block_lookup_matches_postings(built):
+    speeches, index = built
+    expected = _brute_force(speeches)
+    rng = np.random.default_rng(8)
+    all_ids = np.arange(-1, len(speeches) * DOC_ID_STEP + 2)  # present and absent ids, before and after the list
+    for term, postings in expected.items():
+        for size in [1, 5, 300, len(all_ids)]:
+            doc_ids = np.sort(rng.choice(all_ids, size=size, replace=False))
+            assert index.term_lookup(term, doc_ids).tolist() == [len(postings.get(d, ())) for d in doc_ids.tolist()]
+    assert index.term_lookup("αγνωστ", np.array([0, DOC_ID_STEP])).tolist() == [0, 0]
+
+
+def _assert_same_index(got, expected):
+    assert list(got.keys()) == list(expected.keys())
+    for term in expected.keys():
+        for part, expected_part in zip(got.term_positions(term), expected.term_positions(term)):
+            assert part.tolist() == expected_part.tolist()
+    assert got.n_docs == expected.n_docs and got.avgdl == pytest.approx(expected.avgdl)
+    assert got.doc_length.tolist() == expected.doc_length.tolist()
+
+
+def test_added_and_merged_segments_match_full_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setattr(inverted_index, "MERGE_FACTOR", 3)
+    rng = random.Random(9)
+    batches = [_random_speeches(rng, n) for n in [400, 60, 70, 50, 300]]
+    corpus_path, index_path = str(tmp_path / "corpus"), str(tmp_path / "index")
+
+    _write_corpus(corpus_path, batches[0])
+    build_inverted_index(index_path, corpus_path, positions=True)
+    n_docs = len(batches[0])
+    for batch in batches[1:]:
+        _write_corpus(corpus_path, batch, first_doc=n_docs, append=True)
+        n_docs += len(batch)
+        assert add_segment(index_path, corpus_path)["end"] == n_docs
+    assert add_segment(index_path, corpus_path) is None  # nothing new
+    assert len(SegmentedIndex(index_path).segments) == len(batches)
+
+    full_corpus = str(tmp_path / "full_corpus")
+    _write_corpus(full_corpus, [tokens for batch in batches for tokens in batch])
+    build_inverted_index(str(tmp_path / "full"), full_corpus, positions=True)
+    full = SegmentedIndex(str(tmp_path / "full"))
+    _assert_same_index(SegmentedIndex(index_path), full)
+
+    # the three small segments share a tier and are merged; the large ones are left alone
+    assert merge_segments(index_path, corpus_path) == 1
+    merged = SegmentedIndex(index_path)
+    assert [(seg["start"], seg["end"]) for seg in merged.segment_info] == [(0, 400), (400, 580), (580, 880)]
+    assert sorted(os.listdir(index_path)) == sorted([seg["name"] for seg in merged.segment_info] + ["manifest.json"])
+    _assert_same_index(merged, full)
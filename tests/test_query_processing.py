@@ -0,0 +1,67 @@
+import pytest
+
+import query_processing
+from stem_cache import StemCache
+
+QUERIES = [
+    "Ο Πρόεδρος αγοράζει βιβλία",
+    "δημόσιο χρέος της χώρας",
+    "Κυβέρνηση και υπουργός Οικονομικών!",
+    "ΝΔ, ΠΑΣΟΚ 2004 ΣΥΡΙΖΑ",
+    "οι βουλευτές ψήφισαν το νομοσχέδιο",
+]
+
+
+def _fresh_cache(monkeypatch, tmp_path):
+    """A memory-only stem cache (no file at that path), so no stem comes from an earlier query."""
+    monkeypatch.setattr(query_processing, "_stem_cache", StemCache(str(tmp_path / "stems.db"), readonly=True))
+
+
+@pytest.fixture(autouse=True)
+def stem_cache(tmp_path, monkeypatch):
+    _fresh_cache(monkeypatch, tmp_path)
+
+
+@pytest.mark.parametrize("text", QUERIES)
+def test_fast_path_matches_full_pipeline(text, tmp_path, monkeypatch):
+    fast = query_processing.process_query(text)
+    _fresh_cache(monkeypatch, tmp_path)
+    assert fast == query_processing.process_query(text, fast=False)
+    assert fast
+
+
+def test_fast_path_does_not_load_the_full_model(monkeypatch):
+    def no_full_model():
+        raise AssertionError("el_core_news_sm loaded")
+
+    monkeypatch.setattr(query_processing, "get_nlp", no_full_model)
+    assert query_processing.process_query(QUERIES[0]) == ["προεδρ", "αγοραζ", "βιβλι"]
+
+
+def test_fast_path_falls_back_to_the_lemma(tmp_path, monkeypatch):
+    stem_query_word = query_processing.stem_query_word
+    monkeypatch.setattr(query_processing, "stem_query_word",
+                        lambda word, pos: "" if word == "βιβλία" else stem_query_word(word, pos))
+    get_nlp = query_processing.get_nlp
+    loads = []
+    monkeypatch.setattr(query_processing, "get_nlp", lambda: loads.append(1) or get_nlp())
+
+    fast = query_processing.process_query(QUERIES[0])
+    assert len(loads) == 1  # run once, for the token without a stem
+    assert query_processing.get_stem_cache().get("βιβλία") is None  # the lemma depends on context: never cached
+    _fresh_cache(monkeypatch, tmp_path)
+    assert fast == query_processing.process_query(QUERIES[0], fast=False)
+    assert fast[:2] == ["προεδρ", "αγοραζ"]
+
+
+@pytest.mark.parametrize("text, tokens, clauses", [
+    ('"δημόσιο χρέος" ανεργία', ["ανεργ"], [{"type": "phrase", "terms": ["δημος", "χρε"]}]),
+    ("ανεργία NEAR/5 νομοσχέδιο", [], [{"type": "near", "terms": ["ανεργ", "νομοσχεδ"], "k": 5}]),
+    ('Υπουργός "το δημόσιο χρέος της χώρας" βουλευτές NEAR/3 νομοσχέδιο',
+     ["υπουργ"], [{"type": "phrase", "terms": ["δημος", "χρε", "χωρ"]},
+                  {"type": "near", "terms": ["βουλευτ", "νομοσχεδ"], "k": 3}]),
+    ('"και το" ανεργία', ["ανεργ"], []),  # a phrase of stopwords only is dropped
+    ("ανεργία νομοσχέδιο", ["ανεργ", "νομοσχεδ"], []),
+])
+def test_parse_query_splits_phrases_and_near(text, tokens, clauses):
+    assert query_processing.parse_query(text) == (tokens, clauses)
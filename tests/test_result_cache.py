@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, artifact_version
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the cache module."""
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = ResultCache(max_items=3, ttl=60)
+    for key in "abc":
+        cache.put(key, 1, key.upper())
+    assert cache.get("a", 1) == "A"  # "b" is now the least recently used
+    cache.put("d", 1, "D")
+    assert cache.get("b", 1) is None
+    assert [cache.get(key, 1) for key in "acd"] == ["A", "C", "D"]
+
+    cache.put("c", 1, "C2")  # overwriting refreshes, does not evict
+    cache.put("e", 1, "E")
+    assert cache.get("a", 1) is None
+    assert cache.get("c", 1) == "C2"
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 2
+    assert stats["hits"] == 5 and stats["misses"] == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(max_items=10, ttl=60)
+    cache.put("old", 1, "value")
+    clock[0] += 30
+    cache.put("new", 1, "value")
+    assert cache.get("old", 1) == "value"  # a hit does not extend the TTL
+    clock[0] += 31
+    assert cache.get("old", 1) is None
+    assert cache.get("new", 1) == "value"
+    clock[0] += 30
+    assert cache.get("new", 1) is None
+    assert cache.stats()["expired"] == 2 and cache.stats()["entries"] == 0
+
+
+def test_new_artifact_version_drops_every_entry(clock, tmp_path):
+    path = str(tmp_path / "parliament.db")
+    with open(path, "w") as f:
+        f.write("v1")
+    version = artifact_version(path, str(tmp_path / "missing"))
+
+    cache = ResultCache()
+    cache.put("q1", version, [1, 2])
+    cache.put("q2", version, [3])
+    assert cache.get("q1", artifact_version(path, str(tmp_path / "missing"))) == [1, 2]
+
+    with open(path, "a") as f:
+        f.write(" rebuilt")
+    os.utime(path, ns=(0, 0))
+    new_version = artifact_version(path, str(tmp_path / "missing"))
+    assert new_version != version
+    assert cache.get("q2", new_version) is None
+    assert cache.get("q2", version) is None  # gone for good, not kept per version
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,290 @@
+import random
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import search_engine
+from corpus import CorpusWriter
+from inverted_index import build_inverted_index, build_sharded_index
+from metadata_index import DocMetadata
+from postings import SegmentedIndex, ShardedIndex
+
+# Zipf-like vocabulary: the first stems are in most speeches, the last ones in a few
+WORDS = ["βουλ", "κυβερνησ", "νομοσχεδ", "υπουργ", "πολιτ", "οικονομ", "δημοσ", "χρε", "ανεργ",
+         "συνταξ", "φορ", "αγροτ", "παιδει", "υγει", "εθν", "αμυν", "τουρισμ", "ναυτιλ", "ενεργει",
+         "μεταφορ", "δικαιοσυν", "περιβαλλον", "πολιτισμ", "αθλητισμ", "μεταναστ", "εξωτερ"]
+YEARS = [2001, 2002, 2003, 2004]
+MEMBERS = [f"member {i}" for i in range(8)]
+PARTIES = ["party A", "party B", "party C"]
+UNDATED_EVERY = 97  # speeches without a sitting date
+
+QUERIES = [
+    ["βουλ"],                        # in almost every speech: pruning matters
+    ["εξωτερ"],                      # rare
+    ["δημοσ", "χρε"],
+    ["βουλ", "κυβερνησ", "μεταναστ"],
+    ["βουλ", "κυβερνησ", "νομοσχεδ", "υπουργ"],  # only frequent terms: most lists are looked up, not decoded
+    ["εξωτερ", "αθλητισμ", "βουλ", "κυβερνησ"],
+    ["πολιτ"],                       # prefix of "πολιτισμ" too
+    ["αγνωστ"],                      # no match
+]
+FILTERS = [
+    {"years": None, "party_id": None, "member_id": None},
+    {"years": (2002, 2003), "party_id": None, "member_id": None},
+    {"years": None, "party_id": 1, "member_id": None},
+    {"years": None, "party_id": None, "member_id": 3},           # small filter: filter-driven MaxScore
+    {"years": (2004, 2004), "party_id": 2, "member_id": None},
+]
+
+
+@pytest.fixture(scope="module")
+def collection(tmp_path_factory):
+    """
+        2000 random speeches built into a corpus, a positional index, a year-sharded
+        index and a metadata DB with the repository's own builders. Every UNDATED_EVERY-th
+        speech has no sitting date (year-0 shard, year 0 in the DB) and mentions the
+        rare "εξωτερ" often, so it ranks high on unfiltered queries.
+    """
+    rng = random.Random(12)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    rows, speeches = [], []
+    for doc_id in range(2000):
+        tokens = rng.choices(WORDS, weights=weights, k=rng.randint(3, 60))
+        date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.choice(YEARS)}"
+        if doc_id % UNDATED_EVERY == 0:
+            tokens, date = tokens + ["εξωτερ"] * 3, ""
+        speeches.append(tokens)
+        member = rng.randrange(len(MEMBERS))
+        rows.append({"document_id": doc_id, "cleaned_speech": " ".join(tokens), "speech": " ".join(tokens),
+                     "member_name": MEMBERS[member], "political_party": PARTIES[member % len(PARTIES)],
+                     "sitting_date": date})
+    df = pd.DataFrame(rows)
+
+    root = tmp_path_factory.mktemp("collection")
+    corpus_path = str(root / "corpus")
+    writer = CorpusWriter(corpus_path)
+    writer.add_frame(df)
+    writer.close()
+    build_inverted_index(str(root / "index"), corpus_path, positions=True)
+    build_sharded_index(str(root / "shards"), corpus_path, positions=True)
+
+    db_path = str(root / "parliament.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE parties (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("CREATE TABLE members (id INTEGER PRIMARY KEY, full_name TEXT)")
+        conn.execute("CREATE TABLE speeches (doc_id INTEGER PRIMARY KEY, year INTEGER, party_id INTEGER, "
+                     "member_id INTEGER, sitting_date TEXT)")
+        conn.executemany("INSERT INTO parties VALUES (?, ?)", enumerate(PARTIES))
+        conn.executemany("INSERT INTO members VALUES (?, ?)", enumerate(MEMBERS))
+        conn.executemany("INSERT INTO speeches VALUES (?, ?, ?, ?, ?)",
+                         [(row["document_id"], int(row["sitting_date"][-4:] or 0), PARTIES.index(row["political_party"]),
+                           MEMBERS.index(row["member_name"]), row["sitting_date"]) for row in rows])
+
+    return {"speeches": speeches,
+            "index": SegmentedIndex(str(root / "index")),
+            "sharded": ShardedIndex(str(root / "shards")),
+            "metadata": DocMetadata(db_path)}
+
+
+def _exhaustive(index, metadata, tokens, filters, k):
+    """Every matching document scored in full (score_terms), then the top k."""
+    weighted_terms = search_engine.query_terms(index, tokens)
+    doc_ids, scores = search_engine.score_terms(index, weighted_terms, index.avgdl, metadata.filter_bitmap(filters))
+    return search_engine.top_k(doc_ids, scores, k)
+
+
+def _assert_same_ranking(got, expected):
+    """Equal scores, and equal documents apart from the choice among ties at the cut-off."""
+    assert [score for _, score in got] == pytest.approx([score for _, score in expected])
+    if not expected:
+        return
+    cutoff = expected[-1][1] + 1e-9
+    assert {doc for doc, score in got if score > cutoff} == {doc for doc, score in expected if score > cutoff}
+
+
+def _phrase_counts(speeches, terms):
+    counts = {}
+    for doc_id, tokens in enumerate(speeches):
+        n = sum(tokens[i:i + len(terms)] == terms for i in range(len(tokens) - len(terms) + 1))
+        if n:
+            counts[doc_id] = n
+    return counts
+
+
+def _near_counts(speeches, term_a, term_b, k):
+    counts = {}
+    for doc_id, tokens in enumerate(speeches):
+        positions_b = [q for q, token in enumerate(tokens) if token == term_b]
+        n = sum(any(abs(p - q) <= k and p != q for q in positions_b)
+                for p, token in enumerate(tokens) if token == term_a)
+        if n:
+            counts[doc_id] = n
+    return counts
+
+
+def _as_dict(matches):
+    doc_ids, counts = matches
+    assert np.all(np.diff(doc_ids) > 0)
+    return dict(zip(np.asarray(doc_ids).tolist(), np.asarray(counts).tolist()))
+
+
+@pytest.mark.parametrize("tokens", QUERIES)
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_maxscore_matches_exhaustive_bm25(collection, tokens, filters, k):
+    index, metadata = collection["index"], collection["metadata"]
+    got = search_engine.search(index, metadata, tokens, filters, k=k)
+    _assert_same_ranking(got, _exhaustive(index, metadata, tokens, filters, k))
+
+
+def test_top_k_orders_ties_by_doc_id():
+    doc_ids = np.array([9, 4, 7, 1, 3])
+    scores = np.array([1.0, 2.0, 2.0, 0.5, 2.0])
+    assert search_engine.top_k(doc_ids, scores, 2) == [(3, 2.0), (4, 2.0)]
+    assert search_engine.top_k(doc_ids, scores, 10) == [(3, 2.0), (4, 2.0), (7, 2.0), (9, 1.0), (1, 0.5)]
+
+
+def test_rank_position_matches_brute_force():
+    rng = np.random.default_rng(3)
+    doc_ids = rng.permutation(500)
+    scores = rng.integers(0, 20, 500).astype(np.float64) / 4  # many ties
+    ranked = search_engine.top_k(doc_ids, scores, 500)
+    docs = np.asarray([d for d, _ in ranked])
+    ranked_scores = np.asarray([s for _, s in ranked])
+    for position in [0, 1, 17, 250, 499]:
+        doc_id, score = ranked[position]
+        assert search_engine.rank_position(docs, ranked_scores, (score, doc_id)) == position + 1
+    # a cursor whose document left the ranking: the page starts after every result ahead of it
+    cursor = (ranked_scores[100], 10 ** 6)
+    expected = sum(1 for d, s in ranked if s > cursor[0] or (s == cursor[0] and d <= cursor[1]))
+    assert search_engine.rank_position(docs, ranked_scores, cursor) == expected
+
+
+@pytest.mark.parametrize("tokens", QUERIES)
+@pytest.mark.parametrize("filters", FILTERS)
+def test_sharded_search_matches_unsharded(collection, tokens, filters):
+    index, sharded, metadata = collection["index"], collection["sharded"], collection["metadata"]
+    got = search_engine.search_sharded(sharded, metadata, tokens, filters, k=10)
+    _assert_same_ranking(got, search_engine.search(index, metadata, tokens, filters, k=10))
+
+
+def test_unfiltered_sharded_search_reads_undated_speeches(collection):
+    sharded, metadata = collection["sharded"], collection["metadata"]
+    assert 0 in sharded.shards
+    unfiltered = {"years": None, "party_id": None, "member_id": None}
+    got = search_engine.search_sharded(sharded, metadata, ["εξωτερ"], unfiltered, k=10)
+    assert any(doc_id % UNDATED_EVERY == 0 for doc_id, _ in got)
+    in_range = dict(unfiltered, years=(2001, 2004))
+    got = search_engine.search_sharded(sharded, metadata, ["εξωτερ"], in_range, k=50)
+    assert not any(doc_id % UNDATED_EVERY == 0 for doc_id, _ in got)
+
+
+@pytest.mark.parametrize("clause", [
+    {"type": "phrase", "terms": ["δημοσ", "χρε"]},
+    {"type": "near", "terms": ["βουλ", "κυβερνησ"], "k": 2},
+])
+@pytest.mark.parametrize("filters", FILTERS[:3])
+def test_sharded_clause_search_matches_unsharded(collection, clause, filters):
+    index, sharded, metadata = collection["index"], collection["sharded"], collection["metadata"]
+    got = search_engine.search_sharded(sharded, metadata, ["υπουργ"], filters, k=10, clauses=[clause])
+    _assert_same_ranking(got, search_engine.search(index, metadata, ["υπουργ"], filters, k=10, clauses=[clause]))
+
+
+@pytest.mark.parametrize("terms", [["βουλ"], ["βουλ", "κυβερνησ"], ["δημοσ", "χρε"], ["βουλ", "βουλ"],
+                                   ["κυβερνησ", "νομοσχεδ", "υπουργ"]])
+def test_match_phrase_matches_brute_force(collection, terms):
+    got = _as_dict(search_engine.match_phrase(collection["index"], terms))
+    assert got == _phrase_counts(collection["speeches"], terms)
+
+
+@pytest.mark.parametrize("term_a, term_b, k", [("βουλ", "κυβερνησ", 1), ("βουλ", "κυβερνησ", 3),
+                                               ("κυβερνησ", "βουλ", 3), ("δημοσ", "χρε", 5),
+                                               ("βουλ", "βουλ", 2), ("ανεργ", "εξωτερ", 10)])
+def test_match_near_matches_brute_force(collection, term_a, term_b, k):
+    got = _as_dict(search_engine.match_near(collection["index"], term_a, term_b, k))
+    assert got == _near_counts(collection["speeches"], term_a, term_b, k)
+
+
+@pytest.mark.parametrize("clauses", [
+    [{"type": "phrase", "terms": ["δημοσ", "χρε"]}],
+    [{"type": "near", "terms": ["βουλ", "κυβερνησ"], "k": 2}],
+    [{"type": "phrase", "terms": ["βουλ", "κυβερνησ"]}, {"type": "near", "terms": ["υπουργ", "πολιτ"], "k": 3}],
+])
+@pytest.mark.parametrize("filters", FILTERS[:3])
+def test_clause_search_returns_only_clause_matches(collection, clauses, filters):
+    index, metadata, speeches = collection["index"], collection["metadata"], collection["speeches"]
+    expected = set(range(len(speeches)))
+    for clause in clauses:
+        if clause["type"] == "phrase":
+            expected &= set(_phrase_counts(speeches, clause["terms"]))
+        else:
+            expected &= set(_near_counts(speeches, *clause["terms"], clause["k"]))
+    candidates = np.asarray(sorted(expected), dtype=np.int64)
+    expected = set(candidates[metadata.filter_bitmap(filters).contains(candidates)].tolist())
+
+    got = search_engine.search(index, metadata, ["οικονομ"], filters, k=len(speeches), clauses=clauses)
+    assert {doc_id for doc_id, _ in got} == expected
+    assert expected  # the clauses do match something
+
+
+def test_clauses_fall_back_to_stems_without_positions():
+    class NoPositions:
+        has_positions = False
+
+    clauses = [{"type": "phrase", "terms": ["δημοσ", "χρε"]}, {"type": "near", "terms": ["βουλ", "υπουργ"], "k": 2}]
+    assert search_engine.positional_fallback(NoPositions(), ["οικονομ"], clauses) == \
+        (["οικονομ", "δημοσ", "χρε", "βουλ", "υπουργ"], [])
+
+
+@pytest.mark.parametrize("tokens", QUERIES)
+def test_match_set_is_every_possible_result(collection, tokens):
+    index, sharded, metadata, speeches = (collection["index"], collection["sharded"], collection["metadata"],
+                                          collection["speeches"])
+    expected = sorted(doc_id for doc_id, speech in enumerate(speeches)
+                      if any(word.startswith(token) for token in tokens for word in speech))
+    assert search_engine.match_set(index, tokens).tolist() == expected
+    assert search_engine.match_set(sharded, tokens).tolist() == expected
+
+    for filters in FILTERS:
+        facets = metadata.facet_counts(search_engine.match_set(index, tokens), filters)
+        assert facets["total"] == len(search_engine.search(index, metadata, tokens, filters, k=len(speeches)))
+
+
+def test_clause_matches_of_shards_add_up(collection):
+    clauses = [{"type": "phrase", "terms": ["βουλ", "κυβερνησ"]}, {"type": "near", "terms": ["δημοσ", "χρε"], "k": 4}]
+    matches, _ = search_engine.sharded_matches(collection["sharded"], clauses)
+    for c, clause in enumerate(clauses):
+        merged = {}
+        for year_matches in matches.values():
+            merged.update(_as_dict(year_matches[c]))
+        assert merged == _as_dict(search_engine.match_clause(collection["index"], clause))
+
+
+def test_shared_term_view_ranks_like_the_index(collection):
+    index, sharded, metadata = collection["index"], collection["sharded"], collection["metadata"]
+    clauses = [{"type": "phrase", "terms": ["δημοσ", "χρε"]}]
+    for target, search in [(index, search_engine.search), (sharded, search_engine.search_sharded)]:
+        view = search_engine.SharedTermView(target)
+        for tokens in QUERIES:
+            for filters in FILTERS:
+                assert search(view, metadata, tokens, filters, k=10) == search(target, metadata, tokens, filters, k=10)
+            assert search(view, metadata, tokens, FILTERS[0], k=10, clauses=clauses) == \
+                search(target, metadata, tokens, FILTERS[0], k=10, clauses=clauses)
+
+
+def test_shared_term_view_decodes_each_term_once(collection, monkeypatch):
+    index = collection["index"]
+    decoded = []
+    term_postings = type(index).term_postings
+    monkeypatch.setattr(type(index), "term_postings", lambda self, term: decoded.append(term) or term_postings(self, term))
+
+    view = search_engine.SharedTermView(index)
+    for _ in range(3):
+        for term in ["βουλ", "εξωτερ", "αγνωστ"]:
+            docs, tfs = view.term_postings(term)
+            assert docs.tolist() == term_postings(index, term)[0].tolist()
+            doc_ids = np.arange(0, 2000, 7)
+            assert view.term_lookup(term, doc_ids).tolist() == index.term_lookup(term, doc_ids).tolist()
+    assert decoded == ["βουλ", "εξωτερ", "αγνωστ"]
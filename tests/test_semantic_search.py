@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+import ann_index
+import semantic_search
+from ann_index import IVFPQIndex, build_ann_index
+from metadata_index import Bitmap
+from semantic_search import RRF_K, LSISearcher
+
+N_ROWS, DIM, N_TERMS = 3000, 30, 40
+UNFILTERED = {"years": None, "party_id": None, "member_id": None}
+
+
+@pytest.fixture
+def lsi(tmp_path, monkeypatch):
+    """
+        LSI artifacts of a random collection: unit-length speech rows drawn around 25
+        directions (so they cluster like real topics), doc_ids with gaps and a small
+        sorted keyword vocabulary.
+    """
+    rng = np.random.default_rng(21)
+    topics = rng.normal(size=(25, DIM))
+    docs = topics[rng.integers(0, 25, N_ROWS)] + 0.35 * rng.normal(size=(N_ROWS, DIM))
+    docs = (docs / np.linalg.norm(docs, axis=1, keepdims=True)).astype(np.float32)
+    terms = sorted(f"ορ{i:02d}" for i in range(N_TERMS))
+
+    files = {"LSI_DOCS_FILE": "lsi_docs.npy", "DOC_IDS_FILE": "doc_ids.npy", "LSI_TERMS_FILE": "lsi_terms.txt",
+             "LSI_TERM_TOPICS_FILE": "lsi_term_topics.npy", "LSI_TERM_IDF_FILE": "lsi_term_idf.npy"}
+    for name, filename in files.items():
+        monkeypatch.setattr(semantic_search, name, str(tmp_path / filename))
+    monkeypatch.setattr(ann_index, "LSI_DOCS_FILE", str(tmp_path / files["LSI_DOCS_FILE"]))
+    np.save(tmp_path / files["LSI_DOCS_FILE"], docs)
+    np.save(tmp_path / files["DOC_IDS_FILE"], np.arange(N_ROWS) * 3)
+    np.save(tmp_path / files["LSI_TERM_TOPICS_FILE"], rng.normal(size=(N_TERMS, DIM)).astype(np.float32))
+    np.save(tmp_path / files["LSI_TERM_IDF_FILE"], rng.uniform(0.5, 5.0, N_TERMS))
+    with open(tmp_path / files["LSI_TERMS_FILE"], "w", encoding="utf-8") as f:
+        f.write("".join(term + "\n" for term in terms))
+    return LSISearcher(), docs, terms, str(tmp_path / "ann")
+
+
+def _exact(docs, query, k):
+    scores = docs @ query
+    rows = np.lexsort((np.arange(len(docs)), -scores))[:k]
+    return rows, scores[rows]
+
+
+def test_ivfpq_recall_against_exact_cosine(lsi):
+    _, docs, _, path = lsi
+    build_ann_index(path, pq_m=8)  # 8 sub-quantizers of 4 dims: the 30-dim residuals are zero-padded to 32
+    index = IVFPQIndex(path)
+    rng = np.random.default_rng(3)
+    queries = docs[rng.choice(N_ROWS, 40, replace=False)] + 0.2 * rng.normal(size=(40, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    recalls = []
+    for query in queries:
+        exact_rows, exact_scores = _exact(docs, query, 10)
+        rows, scores = index.search(query, k=10)
+        assert np.all(np.diff(scores) <= 0)
+        assert scores == pytest.approx(docs[rows] @ query, abs=1e-5)  # reranked: exact cosines
+        recalls.append(len(set(rows.tolist()) & set(exact_rows.tolist())) / 10)
+        # probing every list and reranking every row is exhaustive
+        rows, scores = index.search(query, k=10, n_probe=index.meta["n_lists"], rerank=N_ROWS)
+        assert rows.tolist() == exact_rows.tolist()
+    assert np.mean(recalls) >= 0.9
+
+
+def test_ivfpq_excludes_the_query_row(lsi):
+    _, docs, _, path = lsi
+    build_ann_index(path, pq_m=8)
+    rows, _ = IVFPQIndex(path).search(docs[17], k=5, exclude=17)
+    assert 17 not in rows.tolist() and len(rows) == 5
+
+
+def test_search_matches_exact_cosine(lsi):
+    searcher, docs, terms, _ = lsi
+    tokens = [terms[3], terms[3], "ορ1"]  # a repeated keyword and a prefix of ορ10..ορ19
+    query = searcher.fold_query(tokens)
+    assert np.linalg.norm(query) == pytest.approx(1.0, abs=1e-5)
+
+    class EveryOtherSpeech:
+        def filter_mask(self, doc_ids, filters):
+            return Bitmap(np.arange(0, N_ROWS * 3, 6)).contains(doc_ids)
+
+    rows, scores = _exact(docs, query, 10)
+    got = searcher.search(tokens, None, UNFILTERED, k=10)
+    assert [doc_id for doc_id, _ in got] == (rows * 3).tolist()
+    assert [score for _, score in got] == pytest.approx(scores.tolist(), abs=1e-5)
+
+    even = np.arange(0, N_ROWS, 2)
+    rows, _ = _exact(docs[even], query, 10)
+    got = searcher.search(tokens, EveryOtherSpeech(), dict(UNFILTERED, party_id=0), k=10)
+    assert [doc_id for doc_id, _ in got] == (even[rows] * 3).tolist()
+
+
+def test_rerank_fuses_lexical_and_lsi_ranks(lsi):
+    searcher, docs, terms, _ = lsi
+    tokens = [terms[5], terms[22]]
+    query = searcher.fold_query(tokens)
+    rng = np.random.default_rng(5)
+    doc_ids = (rng.choice(N_ROWS, 50, replace=False) * 3).tolist() + [1, 4]  # the last two have no LSI vector
+    candidates = list(zip(doc_ids, sorted(rng.uniform(1, 20, len(doc_ids)), reverse=True)))
+
+    cosine = {doc_id: float(docs[doc_id // 3] @ query) if doc_id % 3 == 0 else -1.0 for doc_id in doc_ids}
+    lsi_order = sorted(doc_ids, key=lambda d: (-cosine[d], d))
+    rrf = {d: 1 / (RRF_K + 1 + rank) + 1 / (RRF_K + 1 + lsi_order.index(d)) for rank, d in enumerate(doc_ids)}
+    expected = sorted(rrf, key=lambda d: (-rrf[d], d))[:10]
+    got = searcher.rerank(candidates, tokens, k=10)
+    assert [doc_id for doc_id, _ in got] == expected
+    assert [score for _, score in got] == pytest.approx([rrf[d] for d in expected])
+
+    top = candidates[0][1]
+    weighted = {d: 0.7 * score / top + 0.3 * max(cosine[d], 0.0) for d, score in candidates}
+    got = searcher.rerank(candidates, tokens, k=len(candidates), fusion="weighted", weight=0.3)
+    assert [doc_id for doc_id, _ in got] == sorted(weighted, key=lambda d: (-weighted[d], d))
+    assert [score for _, score in got] == pytest.approx(sorted(weighted.values(), reverse=True))
+
+    assert searcher.rerank(candidates, ["αγνωστ"], k=5) == candidates[:5]  # nothing to fold: lexical order
+    with pytest.raises(ValueError):
+        searcher.rerank(candidates, tokens, fusion="max")
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+from stem_cache import StemCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_writer_persists_first_stem(tmp_path):
+    path = str(tmp_path / "stems.db")
+    cache = StemCache(path, max_items=2)
+    cache["βουλευτές"] = "βουλευτ"
+    cache["υπουργός"] = "υπουργ"
+    cache.close()
+
+    cache = StemCache(path, max_items=2)
+    cache["βουλευτές"] = "other"  # first write wins on disk
+    cache.close()
+    cache = StemCache(path)
+    assert cache.get("βουλευτές") == "βουλευτ"
+    assert cache.get("υπουργός") == "υπουργ"
+    assert cache.get("άγνωστο") is None
+    assert cache.stats()["disk_hits"] == 2 and cache.stats()["misses"] == 1
+    cache.close()
+
+
+def test_readonly_without_file_is_memory_only(tmp_path):
+    path = str(tmp_path / "stems.db")
+    cache = StemCache(path, readonly=True)
+    assert cache.get("βουλευτές") is None
+    cache["βουλευτές"] = "βουλευτ"
+    assert cache.get("βουλευτές") == "βουλευτ"
+    cache.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_readonly_reads_but_never_writes(tmp_path):
+    path = str(tmp_path / "stems.db")
+    writer = StemCache(path)
+    writer["βουλευτές"] = "βουλευτ"
+    writer.close()
+    size = os.path.getsize(path)
+
+    cache = StemCache(path, readonly=True)
+    assert cache.get("βουλευτές") == "βουλευτ"
+    cache["υπουργός"] = "υπουργ"
+    cache.flush()
+    cache.close()
+    assert os.path.getsize(path) == size  # (a WAL reader may still create the -shm / -wal side files)
+    assert StemCache(path, readonly=True).get("υπουργός") is None
+
+
+def test_importing_query_processing_creates_no_file(tmp_path):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]))
+    subprocess.run([sys.executable, "-c", "import query_processing"], cwd=tmp_path, env=env, check=True)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,70 @@
+import random
+
+import pandas as pd
+import pytest
+
+from tf_idf import build_tf_idf_weight_matrix, top_keywords_per_row, compute_tf_idf_keywords_grouped, \
+    compute_tf_idf_keywords_subset
+
+WORDS = ["αγροτ", "βουλ", "γεωργ", "δημοσ", "εθν", "ζητημ", "κυβερνησ", "λαο", "μετρ", "νομοσχεδ",
+         "οικονομ", "πολιτ", "συνταξ", "υπουργ", "φορ", "χρε"]
+
+
+@pytest.fixture
+def speeches():
+    """40 small speeches over 16 words: repeated tf / df values, so many scores tie."""
+    rng = random.Random(0)
+    rows = []
+    for doc_id in range(40):
+        speech = [rng.choice(WORDS[:rng.randint(3, len(WORDS))]) for _ in range(rng.randint(1, 12))]
+        rows.append({"cleaned_speech": " ".join(speech),
+                     "member_name": f"member {doc_id % 5}",
+                     "year": 2000 + doc_id % 3})
+    df = pd.DataFrame(rows)
+    inverse_index = {}
+    for doc_id, text in enumerate(df["cleaned_speech"]):
+        for word in text.split():
+            postings = inverse_index.setdefault(word, {})
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+    return inverse_index, df
+
+
+def _assert_same_keywords(got, expected, top_n):
+    """Equal scores, and equal words apart from the order (and choice, at the cut-off) of ties."""
+    assert [score for _, score in got] == pytest.approx([score for _, score in expected])
+    if not expected:
+        return
+    cutoff = expected[-1][1] if len(expected) == top_n else None
+
+    def above_cutoff(pairs):
+        return {(word, round(score, 9)) for word, score in pairs if cutoff is None or score > cutoff + 1e-9}
+
+    assert above_cutoff(got) == above_cutoff(expected)
+
+
+@pytest.mark.parametrize("top_n", [3, 100])
+def test_speech_keywords_match_subset(speeches, top_n):
+    inverse_index, df = speeches
+    weights, terms = build_tf_idf_weight_matrix(inverse_index, len(df), use_corpus=False)
+    keywords = top_keywords_per_row(weights, terms, top_n)
+
+    assert len(keywords) == len(df)
+    for doc_id, got in enumerate(keywords):
+        expected = compute_tf_idf_keywords_subset(inverse_index, df, [doc_id], top_n, return_scores=True)
+        _assert_same_keywords(got, expected, top_n)
+        # ties are ordered by word
+        assert got == sorted(got, key=lambda pair: (-pair[1], pair[0]))
+
+
+@pytest.mark.parametrize("top_n", [3, 100])
+def test_grouped_keywords_match_subset(speeches, top_n):
+    inverse_index, df = speeches
+    weights, terms = build_tf_idf_weight_matrix(inverse_index, len(df), use_corpus=False)
+    grouped = compute_tf_idf_keywords_grouped(weights, terms, df, ["member_name", "year"], top_n)
+
+    groups = df.groupby(["member_name", "year"], sort=True).groups
+    assert list(grouped) == list(groups)
+    for key, rows in groups.items():
+        expected = compute_tf_idf_keywords_subset(inverse_index, df, list(rows), top_n, return_scores=True)
+        _assert_same_keywords(grouped[key], expected, top_n)
+
@@ -1,7 +1,14 @@
 import math
+import numpy as np
 import pickle
 import pandas as pd
 import sqlite3
+from scipy.sparse import csr_matrix
+import os
+import shutil
+from corpus import Corpus, corpus_exists
+from postings import SegmentedIndex, index_exists, gather_groups
+from inverted_index import INDEX_DIR
 
 
 def load_inverse_index_and_docs():
@@ -9,7 +16,7 @@ def load_inverse_index_and_docs():
         Load the inverted index and the speeches dataframe.
 
         Returns:
-            inverse_index (dict):
+            inverse_index (dict or postings.SegmentedIndex):
                 word -> { doc_id: term_frequency, ... }
 
             df (pd.DataFrame):
@@ -23,13 +30,17 @@ def load_inverse_index_and_docs():
                 reverse mapping from dataframe index -> doc_id
 
         Steps:
-            - Load inverse index from pickle ("inverse_index.pkl").
+            - Open the memory-mapped index (INDEX_DIR) if it exists,
+              otherwise load the inverse index from pickle ("inverse_index.pkl").
             - Load speeches + metadata from SQLite.
             - Reindex DataFrame and build mapping dicts for consistency.
     """
-    # Load inverse index from pickle
-    with open("inverse_index.pkl", "rb") as f:
-        inverse_index = pickle.load(f)
+    # Load inverse index (memory-mapped index, or the legacy pickle)
+    if index_exists(INDEX_DIR):
+        inverse_index = SegmentedIndex(INDEX_DIR)
+    else:
+        with open("inverse_index.pkl", "rb") as f:
+            inverse_index = pickle.load(f)
 
     # Load dataframe from SQLite
     conn = sqlite3.connect("parliament.db")
@@ -53,6 +64,21 @@ def load_inverse_index_and_docs():
     return inverse_index, df, doc_id_to_index, index_to_doc_id
 
 
+def load_term_frequency_matrix():
+    """
+        Load the documents × terms term-frequency matrix from the columnar corpus.
+
+        Returns:
+            tf (scipy.sparse.csr_matrix): raw term counts, rows in document_id order
+            vocab (list[str]): column index -> stem
+            document_ids (np.ndarray): row index -> document_id
+
+        Built directly from the token-id arrays, so no CSV parsing or string splitting.
+    """
+    corpus = Corpus()
+    return corpus.term_frequency_matrix(), corpus.vocab, np.asarray(corpus.document_id)
+
+
 def compute_tf_idf_keywords_subset(inverse_index, df, doc_ids, top_n=10, return_scores=False):
     """
         Compute top TF-IDF keywords for a given set of documents.
@@ -110,3 +136,277 @@ def compute_tf_idf_keywords_subset(inverse_index, df, doc_ids, top_n=10, return_
         return sorted_words[:top_n]
     else:
         return [word for word, _ in sorted_words[:top_n]]
+
+
+KEYWORD_BLOCK_ROWS = 100000  # matrix rows ranked at a time by top_keywords_per_row
+GROUP_BLOCK_ROWS = 2000      # groups aggregated per sparse product by compute_tf_idf_keywords_grouped
+
+# Per-speech TF-IDF weight vectors on disk (CSR arrays, memory-mapped by KeywordSlicer)
+KEYWORD_WEIGHTS_DIR = "keyword_weights"
+WEIGHTS_INDPTR_FILE = "indptr.npy"    # int64 [N + 1], row d = entries indptr[d]:indptr[d + 1]
+WEIGHTS_INDICES_FILE = "indices.npy"  # int32 [nnz], term (column) of every entry
+WEIGHTS_DATA_FILE = "data.npy"        # float64 [nnz], TF-IDF weight of every entry
+WEIGHTS_TERMS_FILE = "terms.txt"      # one term per line, line number = column
+
+
+def _index_postings(inverse_index):
+    """(term, doc_ids, tfs) of every term of the index, in sorted term order."""
+    if isinstance(inverse_index, dict):
+        for word in sorted(inverse_index):
+            doc_freqs = inverse_index[word]
+            yield (word, np.fromiter(doc_freqs.keys(), dtype=np.int64, count=len(doc_freqs)),
+                   np.fromiter(doc_freqs.values(), dtype=np.int64, count=len(doc_freqs)))
+    else:
+        for word in inverse_index:
+            docs, tfs = inverse_index.term_postings(word)
+            yield word, np.asarray(docs, dtype=np.int64), np.asarray(tfs, dtype=np.int64)
+
+
+def build_tf_idf_weight_matrix(inverse_index, num_docs_total, use_corpus=None):
+    """
+        Build the documents × terms TF-IDF weight matrix once.
+
+        Args:
+            inverse_index (dict or postings.SegmentedIndex):
+                word -> { doc_id: term_frequency, ... }
+            num_docs_total (int):
+                N, the number of speeches (rows of the speeches dataframe)
+            use_corpus (bool):
+                read the counts from the columnar corpus (load_term_frequency_matrix)
+                instead of the index postings; default: if the corpus exists
+
+        Returns:
+            weights (scipy.sparse.csr_matrix): float64 [N × terms],
+                weights[d, t] = (1 + log(tf)) * log(1 + N / df(t)),
+                same weighting as compute_tf_idf_keywords_subset
+            terms (list[str]): column index -> word, sorted
+
+        Notes:
+            - Row d is the document with doc_id d, as in compute_tf_idf_keywords_subset
+              (which looks the dataframe row index up in the postings); documents with
+              doc_id >= N are dropped, but still count in df(t).
+            - The index is built from the corpus, so both sources give the same counts;
+              the corpus is read as flat token-id arrays instead of term by term.
+            - The logarithms are taken with math.log over the distinct tf / df values
+              only, so every weight is bit-for-bit the value the per-word loop computes.
+    """
+    if use_corpus is None:
+        use_corpus = corpus_exists()
+    if use_corpus:
+        return _corpus_weight_matrix(num_docs_total)
+
+    terms, dfs, columns, rows, tfs = [], [], [], [], []
+    for word, docs, term_tfs in _index_postings(inverse_index):
+        dfs.append(len(docs))
+        keep = docs < num_docs_total
+        columns.append(np.full(int(keep.sum()), len(terms), dtype=np.int32))
+        rows.append(docs[keep])
+        tfs.append(term_tfs[keep])
+        terms.append(word)
+
+    if not terms:
+        return csr_matrix((num_docs_total, 0), dtype=np.float64), terms
+    return _weight_matrix(np.concatenate(rows), np.concatenate(columns), np.concatenate(tfs), dfs,
+                          num_docs_total), terms
+
+
+def _corpus_weight_matrix(num_docs_total):
+    """build_tf_idf_weight_matrix from the corpus' term-frequency matrix (columns re-ordered by word)."""
+    tf, vocab, document_ids = load_term_frequency_matrix()
+    dfs = np.bincount(tf.indices, minlength=len(vocab))
+    present = [t for t in range(len(vocab)) if dfs[t] > 0]  # the index only has terms with postings
+    present.sort(key=vocab.__getitem__)
+    column_of = np.full(len(vocab), -1, dtype=np.int64)
+    column_of[present] = np.arange(len(present))
+
+    rows = np.repeat(document_ids.astype(np.int64), np.diff(tf.indptr))
+    keep = rows < num_docs_total
+    weights = _weight_matrix(rows[keep], column_of[tf.indices[keep]], tf.data[keep].astype(np.int64),
+                             dfs[present].tolist(), num_docs_total)
+    return weights, [vocab[t] for t in present]
+
+
+def _weight_matrix(rows, columns, tfs, dfs, num_docs_total):
+    """CSR matrix of (1 + log tf) * log(1 + N / df) at (rows, columns), logs via math.log per distinct value."""
+    idfs = np.asarray([math.log(1 + num_docs_total / df) for df in dfs], dtype=np.float64)
+    distinct_tfs, tf_codes = np.unique(tfs, return_inverse=True)
+    tf_weights = np.asarray([1 + math.log(tf) for tf in distinct_tfs.tolist()], dtype=np.float64)
+    data = tf_weights[tf_codes] * idfs[columns]
+    weights = csr_matrix((data, (rows, columns)), shape=(num_docs_total, len(dfs)))
+    weights.sort_indices()
+    return weights
+
+
+def top_keywords_per_row(matrix, terms, top_n=10):
+    """
+        Top-n (word, score) pairs of every row of a sparse score matrix.
+
+        Rows are ranked KEYWORD_BLOCK_ROWS at a time with one lexsort over the block's
+        non-zeros: by row, score descending, then word (columns are in word order),
+        so ties are broken deterministically by word. Zero-score entries are skipped.
+        On build_tf_idf_weight_matrix rows this gives, for every speech, the pairs of
+        compute_tf_idf_keywords_subset(inverse_index, df, [doc_id], top_n, return_scores=True),
+        except that equal scores come in word order (the per-word loop left them in
+        set iteration order, so it may also keep other words tied at the cut-off).
+
+        Returns:
+            list: one [(word, score), ...] list per row (empty for rows without terms)
+    """
+    matrix = csr_matrix(matrix)
+    matrix.sort_indices()
+    terms = np.asarray(terms, dtype=object)
+    results = []
+    for start in range(0, matrix.shape[0], KEYWORD_BLOCK_ROWS):
+        block = matrix[start:start + KEYWORD_BLOCK_ROWS]
+        counts = np.diff(block.indptr)
+        entry_rows = np.repeat(np.arange(block.shape[0]), counts)
+        order = np.lexsort((block.indices, -block.data, entry_rows))
+        rank = np.arange(len(order)) - np.repeat(block.indptr[:-1], counts)
+        keep = order[(rank < top_n) & (block.data[order] > 0)]
+        words = terms[block.indices[keep]].tolist()
+        scores = block.data[keep].tolist()
+        bounds = np.searchsorted(entry_rows[keep], np.arange(block.shape[0] + 1)).tolist()
+        for row in range(block.shape[0]):
+            lo, hi = bounds[row], bounds[row + 1]
+            results.append(list(zip(words[lo:hi], scores[lo:hi])))
+    return results
+
+
+def group_indicator_matrix(group_codes, n_groups):
+    """
+        Sparse groups × documents indicator matrix: entry (g, d) = 1 if document d
+        belongs to group g (group_codes[d] == g; negative codes belong to no group).
+        Multiplying it with the documents × terms weight matrix sums the weights of
+        every group's documents in one product.
+    """
+    group_codes = np.asarray(group_codes, dtype=np.int64)
+    docs = np.flatnonzero(group_codes >= 0)
+    indicator = csr_matrix((np.ones(len(docs), dtype=np.float64), (group_codes[docs], docs)),
+                           shape=(n_groups, len(group_codes)))
+    indicator.sort_indices()
+    return indicator
+
+
+def compute_tf_idf_keywords_grouped(weights, terms, df, by, top_n=10):
+    """
+        Top TF-IDF keywords of every group of speeches, for any grouping of df.
+
+        Args:
+            weights, terms: the output of build_tf_idf_weight_matrix (row = df row)
+            df (pd.DataFrame): speeches dataframe, one row per weights row
+            by (str or list[str]): grouping columns, as in df.groupby(by)
+            top_n (int): keywords per group
+
+        Returns:
+            dict: { group key: [(word, score), ...], ... } in df.groupby(by) order;
+            the same scores as compute_tf_idf_keywords_subset over each group's rows.
+
+        Notes:
+            - Every group is one row of a sparse indicator matrix (group_indicator_matrix);
+              indicator @ weights sums each group's document weights in document order,
+              like the per-word loop, so the scores are identical.
+            - Products are taken GROUP_BLOCK_ROWS groups at a time to bound memory.
+            - Adding a grouping (e.g. by party and month) is one call with other columns.
+    """
+    grouper = df.groupby(by, sort=True)
+    keys = grouper.size().index.tolist()
+    codes = grouper.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    indicator = group_indicator_matrix(codes, len(keys))
+
+    keywords = []
+    for start in range(0, len(keys), GROUP_BLOCK_ROWS):
+        totals = indicator[start:start + GROUP_BLOCK_ROWS] @ weights
+        keywords.extend(top_keywords_per_row(totals, terms, top_n))
+    return dict(zip(keys, keywords))
+
+
+def save_tf_idf_weight_matrix(weights, terms, path=KEYWORD_WEIGHTS_DIR):
+    """Write the output of build_tf_idf_weight_matrix to `path` (via path.partial, then renamed)."""
+    weights = csr_matrix(weights)
+    weights.sort_indices()
+    partial = path + ".partial"
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    np.save(os.path.join(partial, WEIGHTS_INDPTR_FILE), weights.indptr.astype(np.int64))
+    np.save(os.path.join(partial, WEIGHTS_INDICES_FILE), weights.indices.astype(np.int32))
+    np.save(os.path.join(partial, WEIGHTS_DATA_FILE), weights.data.astype(np.float64))
+    with open(os.path.join(partial, WEIGHTS_TERMS_FILE), "w", encoding="utf-8") as f:
+        f.write("".join(term + "\n" for term in terms))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(partial, path)
+
+
+def keyword_weights_exist(path=KEYWORD_WEIGHTS_DIR):
+    return os.path.isfile(os.path.join(path, WEIGHTS_TERMS_FILE))
+
+
+def build_keyword_weights(path=KEYWORD_WEIGHTS_DIR, db_path="parliament.db"):
+    """
+        Build and save the per-speech TF-IDF weight vectors without recomputing the
+        keyword tables (for databases whose Part 2 ran before the vectors were saved).
+        N is the number of speeches of load_inverse_index_and_docs().
+    """
+    if index_exists(INDEX_DIR):
+        inverse_index = SegmentedIndex(INDEX_DIR)
+    else:
+        with open("inverse_index.pkl", "rb") as f:
+            inverse_index = pickle.load(f)
+    with sqlite3.connect(db_path) as conn:
+        (num_docs_total,) = conn.execute("""
+            SELECT COUNT(*)
+            FROM speeches s
+            JOIN members m ON s.member_id = m.id
+            JOIN parties p ON s.party_id = p.id
+        """).fetchone()
+    weights, terms = build_tf_idf_weight_matrix(inverse_index, num_docs_total)
+    save_tf_idf_weight_matrix(weights, terms, path)
+
+
+class KeywordSlicer:
+    """
+        Top TF-IDF keywords of an arbitrary set of speeches, computed on demand.
+
+        The per-speech weight vectors (save_tf_idf_weight_matrix) are memory-mapped;
+        a slice gathers the entries of its rows and sums them per term with one
+        np.bincount, so the cost is linear in the slice's non-zeros (about 150 per
+        speech) and only those rows are read from disk.
+
+        The scores are the sums compute_tf_idf_keywords_grouped stores for
+        member-year / party-year groups, so a slice that equals such a group gets
+        the same keywords.
+    """
+
+    def __init__(self, path=KEYWORD_WEIGHTS_DIR):
+        self.indptr = np.load(os.path.join(path, WEIGHTS_INDPTR_FILE), mmap_mode="r")
+        self.indices = np.load(os.path.join(path, WEIGHTS_INDICES_FILE), mmap_mode="r")
+        self.data = np.load(os.path.join(path, WEIGHTS_DATA_FILE), mmap_mode="r")
+        with open(os.path.join(path, WEIGHTS_TERMS_FILE), encoding="utf-8") as f:
+            self.terms = f.read().split("\n")[:-1]
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def top_keywords(self, doc_ids, top_n=10):
+        """
+            Args:
+                doc_ids (np.ndarray): doc_ids of the slice, ascending
+                top_n (int): keywords returned
+
+            Returns:
+                list: [(word, score), ...], best first, ties broken by word
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        doc_ids = doc_ids[(doc_ids >= 0) & (doc_ids < len(self))]
+        starts = np.asarray(self.indptr[doc_ids])
+        lengths = np.asarray(self.indptr[doc_ids + 1]) - starts
+        if not lengths.sum():
+            return []
+        columns = gather_groups(self.indices, starts, lengths)
+        totals = np.bincount(columns, weights=gather_groups(self.data, starts, lengths), minlength=len(self.terms))
+
+        candidates = np.flatnonzero(totals)
+        if len(candidates) > top_n:
+            kth = -np.partition(-totals[candidates], top_n - 1)[top_n - 1]
+            candidates = candidates[totals[candidates] >= kth]  # keep ties with the n-th score
+        best = candidates[np.lexsort((candidates, -totals[candidates]))][:top_n]
+        return [(self.terms[i], float(totals[i])) for i in best.tolist()]